@@ -0,0 +1,142 @@
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+from schema import day_keys
+
+# Measures kept per cube cell, in order.
+CUBE_COLUMNS = ('Quantity Sold', 'Sale Price', 'Profit')
+
+# Batches up to this many rows (a bill, a single sale) are merged row by row; grouping them
+# through pandas costs more than it saves.
+SMALL_BATCH_ROWS = 64
+
+
+class RankedSet:
+    """Names kept sorted by a numeric value, so top-k and bottom-k reads are O(k).
+
+    Updating a name's value is a bisect removal plus a bisect insertion.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._sorted = []  # ascending (value, name)
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def add(self, name, delta):
+        """Adds `delta` to the name's value (starting from 0) and repositions it."""
+        old = self._values.get(name)
+        if old is not None:
+            del self._sorted[bisect_left(self._sorted, (old, name))]
+        new = (old or 0) + delta
+        self._values[name] = new
+        insort(self._sorted, (new, name))
+
+    def top(self, k):
+        """Returns the k highest (name, value) pairs, highest first."""
+        return [(name, value) for value, name in reversed(self._sorted[-k:])] if k else []
+
+    def bottom(self, k):
+        """Returns the k lowest (name, value) pairs, lowest first."""
+        return [(name, value) for value, name in self._sorted[:k]]
+
+
+class SalesCube:
+    """Pre-aggregated (date x product) sales cube for the Business Analysis page.
+
+    Each cell holds quantity sold, revenue and profit (paise). Per-product rankings and
+    per-date revenue are maintained alongside, so the page reads only as much as
+    it displays, however long the sales history is.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.daily_revenue = {}
+        self.quantity = RankedSet()
+        self.profit = RankedSet()
+
+    @property
+    def empty(self):
+        return not self.cells
+
+    @profiled('analytics.add_batch')
+    def add_batch(self, sales):
+        """Adds a batch of sale rows ({column: array}), touching each (date, product) cell once."""
+        if len(sales['Date']) <= SMALL_BATCH_ROWS:
+            self._add_rows(sales)
+            return
+        frame = pd.DataFrame({col: np.asarray(sales[col], dtype=np.int64) for col in CUBE_COLUMNS})
+        frame['Date'] = day_keys(sales['Date'])
+        frame['Product Name'] = np.asarray(sales['Product Name'], dtype=object)
+        self._add_grouped(frame.groupby(['Date', 'Product Name'], sort=False)[list(CUBE_COLUMNS)].sum())
+
+    def _add_rows(self, sales):
+        by_product = {}
+        columns = [np.asarray(sales[col], dtype=np.int64).tolist() for col in CUBE_COLUMNS]
+        for date, name, quantity, revenue, profit in zip(day_keys(sales['Date']).tolist(), sales['Product Name'], *columns):
+            cell = self.cells.get((date, name))
+            if cell is None:
+                cell = self.cells[(date, name)] = [0, 0, 0]
+            cell[0] += quantity
+            cell[1] += revenue
+            cell[2] += profit
+            self.daily_revenue[date] = self.daily_revenue.get(date, 0) + revenue
+            totals = by_product.setdefault(name, [0, 0])
+            totals[0] += quantity
+            totals[1] += profit
+        for name, (quantity, profit) in by_product.items():
+            self.quantity.add(name, quantity)
+            self.profit.add(name, profit)
+
+    def _add_grouped(self, grouped):
+        """Merges a frame indexed by (Date, Product Name) with the CUBE_COLUMNS measures."""
+        if not self.cells:
+            # A fresh cube (e.g. at start-up) takes the grouped cells as they are
+            self.cells = dict(zip(grouped.index.tolist(), grouped.to_numpy().astype(np.int64).tolist()))
+            daily = grouped['Sale Price'].groupby(level='Date').sum()
+            self.daily_revenue = dict(zip(daily.index.tolist(), daily.astype(np.int64).tolist()))
+        else:
+            for (date, name), (quantity, revenue, profit) in zip(grouped.index, grouped.to_numpy()):
+                cell = self.cells.get((date, name))
+                if cell is None:
+                    cell = self.cells[(date, name)] = [0, 0, 0]
+                cell[0] += int(quantity)
+                cell[1] += int(revenue)
+                cell[2] += int(profit)
+                self.daily_revenue[date] = self.daily_revenue.get(date, 0) + int(revenue)
+        by_product = grouped.groupby(level='Product Name').sum()
+        for name, (quantity, revenue, profit) in zip(by_product.index, by_product.to_numpy()):
+            self.quantity.add(name, int(quantity))
+            self.profit.add(name, int(profit))
+
+    @classmethod
+    def from_frame(cls, df_sales):
+        """Rebuilds the cube from sales rows or from per-(date, product) totals."""
+        cube = cls()
+        if not df_sales.empty:
+            cube.add_batch({col: df_sales[col].to_numpy() for col in df_sales.columns})
+        return cube
+
+    def top_sellers(self, k):
+        """Best sellers by quantity as (name, quantity sold)."""
+        return self.quantity.top(k)
+
+    def least_sellers(self, k):
+        """Least sold products (among those with sales) as (name, quantity sold)."""
+        return self.quantity.bottom(k)
+
+    def top_profit(self, k):
+        """Most profitable products as a DataFrame with 'Product Name' and 'Profit'."""
+        return pd.DataFrame(self.profit.top(k), columns=['Product Name', 'Profit'])
+
+    @profiled('analytics.revenue_by_date')
+    def revenue_by_date(self):
+        """Daily revenue as a DataFrame indexed by datetime, one row per date with sales."""
+        series = pd.Series(self.daily_revenue, name='Sale Price', dtype='int64').sort_index()
+        series.index = pd.to_datetime(series.index)
+        series.index.name = 'Date'
+        return series.to_frame()
@@ -1,7 +1,47 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
+import numpy as np
 import datetime
-import random
+import functools
+import os
+import tempfile
+import uuid
+
+from billing import BillDraft
+from bills import BILL_COLUMNS
+from invoice import InvoiceRenderer, export_invoices_zip, invoice_file_name
+from schema import to_paise, to_rupees
+from storage import StoreInUseError
+from forecast import LEAD_DAYS, SAFETY_DAYS, COVER_DAYS
+from jobs import CANCELLED, DONE, FAILED, shared_executor
+from registry import shared_registry
+from rollups import RESOLUTIONS
+from profiling import ROWS_SCANNED, count, current, finish_run, profiling_requested, start_run, timed
+from tables import paged_table
+from transfer import EXPORT_DATASETS, FORMATS, detect_format, export_data, import_stock
+
+# Products offered by a picker at once; the search box narrows them down.
+SEARCH_LIMIT = 20
+
+# Stock table: stored column -> displayed column, and the sortable columns by label
+STOCK_DISPLAY_COLUMNS = {
+    'Product Name': 'Product Name',
+    'Buy Price': 'Buy Price (₹)',
+    'Sell Price': 'Sell Price (₹)',
+    'Quantity': 'Available Stock',
+}
+STOCK_SORT_COLUMNS = {label: col for col, label in STOCK_DISPLAY_COLUMNS.items()}
+# Trend chart resolution labels, in the order of rollups.RESOLUTIONS
+TREND_RESOLUTIONS = ('Daily', 'Weekly', 'Monthly')
+BILL_ITEM_DISPLAY_COLUMNS = {'name': 'Product', 'qty': 'Qty', 'price': 'Unit Price (₹)', 'total': 'Total (₹)'}
+# Products listed by the low-stock panel, soonest stockout first
+LOW_STOCK_LIMIT = 50
+# Seconds between redraws of the live dashboard sections (metric boxes, low stock), so sales made at other
+# counters show up; each redraw is a cached read and does not count as the session using the shop
+LIVE_REFRESH_SECONDS = 5
+# Seconds between redraws of a running background job's progress bar
+JOB_POLL_SECONDS = 1
 
 # --- 1. CONFIGURATION AND INITIALIZATION ---
 
@@ -12,8 +52,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Optional per-rerun profiling (debug sidebar checkbox or SELLSATHI_PROFILE=1)
+if profiling_requested(st.session_state):
+    start_run(st.session_state.get('page', 'Registration') if st.session_state.get('logged_in') else 'Registration')
+
 # Custom CSS for aesthetic, square metric boxes with rounded corners (Blue & White theme)
-st.markdown("""
+with timed("css"):
+    st.markdown("""
 <style>
     /* Main app colors */
     :root {
@@ -80,55 +125,146 @@ if 'page' not in st.session_state:
     st.session_state.page = 'Dashboard'
 if 'user_data' not in st.session_state:
     st.session_state.user_data = {}
-if 'stock_data' not in st.session_state:
-    st.session_state.stock_data = pd.DataFrame(columns=['Product Name', 'Buy Price', 'Sell Price', 'Quantity', 'Sales Count'])
-if 'sales_data' not in st.session_state:
-    st.session_state.sales_data = pd.DataFrame(columns=['Date', 'Product Name', 'Quantity Sold', 'Sale Price', 'Buy Price', 'Profit'])
-if 'bill_history' not in st.session_state:
-    st.session_state.bill_history = []
-if 'bill_items' not in st.session_state:
-    st.session_state.bill_items = []
+if 'bill_draft' not in st.session_state:
+    st.session_state.bill_draft = BillDraft()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 
-# --- 2. CORE FUNCTIONS (DATA MANIPULATION) ---
+def current_shop():
+    """The logged-in business's shop, shared by all its sessions (reopened if it was evicted while this one was idle)."""
+    try:
+        return shared_registry().acquire(st.session_state.user_data['business_name'], st.session_state.session_id)
+    except StoreInUseError as e:
+        # e.g. a command-line import is writing to this business right now
+        st.error(str(e))
+        st.stop()
 
-def calculate_metrics(df_sales):
-    """Calculates sales and profit metrics for today and the current month."""
-    today = datetime.date.today()
-    
-    # Filter for today's sales
-    today_sales = df_sales[df_sales['Date'] == str(today)]
-    
-    # Filter for monthly sales
-    current_month = today.strftime('%Y-%m')
-    monthly_sales = df_sales[df_sales['Date'].str.startswith(current_month)]
-
-    metrics = {
-        'Today Sales': today_sales['Sale Price'].sum(),
-        'Today Profit': today_sales['Profit'].sum(),
-        'Today Expenditure': today_sales['Buy Price'].sum(), 
-        'Monthly Sales': monthly_sales['Sale Price'].sum(),
-        'Monthly Profit': monthly_sales['Profit'].sum(),
-        'Monthly Expenditure': monthly_sales['Buy Price'].sum(),
-    }
-    return metrics
+
+def live_shop():
+    """The logged-in business's shop for a section redrawn on a timer, or None if it is not loaded.
+
+    Unlike current_shop it neither opens the shop nor renews the session's
+    lease, so a page left open does not keep its business in memory (or its
+    store locked) once nobody uses it.
+    """
+    return shared_registry().peek(st.session_state.user_data['business_name'])
+
+
+def live_changed(label):
+    """Whether the shop's data changed since the timer section `label` was last drawn (and notes it has been now)."""
+    shop = live_shop()
+    versions = None if shop is None else dict(shop.cache.versions)
+    key = f"live_versions_{label}"
+    changed = st.session_state.get(key) != versions
+    st.session_state[key] = versions
+    return changed
+
+
+# --- 2. CORE FUNCTIONS (DATA MANIPULATION) ---
 
 def register_user(name, email, business_name, business_type):
-    """Saves user data and sets logged_in state."""
+    """Saves user data, opens the business's stored data and sets logged_in state."""
     st.session_state.user_data = {
         'name': name,
         'email': email,
         'business_name': business_name,
         'business_type': business_type
     }
+    current_shop()
     st.session_state.logged_in = True
     st.session_state.page = 'Dashboard'
     st.success("Registration successful! Redirecting to Dashboard.")
-    st.experimental_rerun()
+    st.rerun()
+
+
+def stock_order(shop, search_term, sort, ascending):
+    """Stock row positions matching the filter, in display order ('Default' = search rank or insertion order)."""
+    if search_term:
+        # Ranked matches from the search index; row ids are stock positions
+        positions = np.asarray(shop.search.search_ids(search_term, limit=None), dtype=np.int64)
+    else:
+        positions = np.arange(len(shop.stock))
+    count(ROWS_SCANNED, len(positions))
+    if sort != 'Default':
+        positions = positions[np.argsort(shop.stock.take(STOCK_SORT_COLUMNS[sort], positions), kind='stable')]
+    return positions if ascending else positions[::-1]
+
+
+def stock_page(shop, search_term, sort, ascending, page, page_size):
+    """One page of the stock inventory for display (prices in rupees); returns (DataFrame, matching rows)."""
+    order = shop.cache.get(('stock_order', search_term, sort, ascending), ('stock',),
+                           lambda: stock_order(shop, search_term, sort, ascending))
+    window = order[page * page_size:(page + 1) * page_size]
+    df_display = pd.DataFrame({col: shop.stock.take(col, window) for col in STOCK_DISPLAY_COLUMNS})
+    df_display[['Buy Price', 'Sell Price']] = to_rupees(df_display[['Buy Price', 'Sell Price']])
+    return df_display.rename(columns=STOCK_DISPLAY_COLUMNS), len(order)
+
+
+def bill_history_page(shop, page, page_size, customer=None, sort='Bill ID', ascending=False):
+    """One page of saved bills for display, totals in rupees; returns (DataFrame, matching bills)."""
+    history_df, total = shop.storage.bill_page(page, page_size, customer=customer, sort=sort, ascending=ascending)
+    history_df = history_df.assign(**{'Bill Total': to_rupees(history_df['Bill Total'])})
+    return history_df.rename(columns={'Bill Total': 'Total (₹)'}), total
+
+
+def bill_items_page(items, sort, ascending, page, page_size):
+    """One page of the bill being built, for display; returns (DataFrame, number of items)."""
+    bill_df = pd.DataFrame(items, columns=list(BILL_ITEM_DISPLAY_COLUMNS)).rename(columns=BILL_ITEM_DISPLAY_COLUMNS)
+    if sort != 'Default':
+        bill_df = bill_df.sort_values(sort, ascending=ascending, kind='stable')
+    elif not ascending:
+        bill_df = bill_df.iloc[::-1]
+    bill_df = bill_df.iloc[page * page_size:(page + 1) * page_size].copy()
+    bill_df[['Unit Price (₹)', 'Total (₹)']] = to_rupees(bill_df[['Unit Price (₹)', 'Total (₹)']])
+    return bill_df, len(items)
 
 
 # --- 3. PAGE FUNCTIONS ---
 
+def fragment(label, run_every=None):
+    """st.fragment that also profiles the section's own reruns.
+
+    A fragment rerun executes only the decorated function, not this script,
+    so it gets its own profile, labelled `page.label` and appended to
+    $SELLSATHI_PROFILE_LOG; inside a full rerun it is timed as one span.
+    A timer rerun (`run_every`) is profiled only if the shop's data changed
+    since the section was last drawn.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            changed = run_every is None or live_changed(label)
+            if current() is not None or not changed or not profiling_requested(st.session_state):
+                with timed(f"fragment.{label}"):
+                    return func(*args, **kwargs)
+            start_run(f"{st.session_state.page}.{label}")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish_run()
+        return st.fragment(run, run_every=run_every)
+    return decorate
+
+
+def rerun_fragment():
+    """Reruns only the calling fragment; falls back to a full rerun when the fragment is being drawn by one."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+
+def product_picker(shop, label, key, limit=SEARCH_LIMIT):
+    """Server-side typeahead: a search box plus a selectbox of the top-ranked matching products."""
+    query = st.text_input(label, placeholder="Type to search products...", key=f"{key}_query")
+    matches = shop.cache.get(('search', query, limit), ('stock',), lambda: shop.search.search(query, limit))
+    if not matches:
+        st.caption("No matching products.")
+        return None
+    return st.selectbox("Matching products", options=matches, key=f"{key}_select", label_visibility="collapsed")
+
+
 def RegistrationPage():
     """Renders the initial registration form."""
     st.title("SellSathi")
@@ -160,65 +296,84 @@ def DashboardPage():
     user = st.session_state.user_data
     st.header(f"Welcome, {user.get('business_name', 'Your Business')}!")
     st.subheader("Performance Overview")
+    dashboard_metrics()
+
+    st.markdown("---")
+    low_stock_panel()
+    
+    # Add Sales Feature (using a popover for small form)
+    st.subheader("Record New Sale")
+    
+    if current_shop().stock.empty:
+        st.warning("Please add some products to your Stock first to record a sale.")
+        return
+    add_sale_form()
+
 
-    metrics = calculate_metrics(st.session_state.sales_data)
+@fragment('metrics', run_every=LIVE_REFRESH_SECONDS)
+def dashboard_metrics():
+    """Today's and this month's metric boxes; redrawn on a timer, so sales from any counter show up."""
+    shop = live_shop()
+    if shop is None:
+        st.caption("Live figures are paused while the app is idle; they come back with your next action.")
+        return
+    today = datetime.date.today()
+    metrics = shop.cache.get(('metrics', today), ('sales',), lambda: shop.metrics.metrics(today))
     
     # Row 1 for Today's Metrics
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.markdown(f"""<div class="metric-box color-1"><h3>Today Sales</h3><p>₹{metrics['Today Sales']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-1"><h3>Today Sales</h3><p>₹{to_rupees(metrics['Today Sales']):.2f}</p></div>""", unsafe_allow_html=True)
     with col2:
-        st.markdown(f"""<div class="metric-box color-2"><h3>Today Profit</h3><p>₹{metrics['Today Profit']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-2"><h3>Today Profit</h3><p>₹{to_rupees(metrics['Today Profit']):.2f}</p></div>""", unsafe_allow_html=True)
     with col3:
-        st.markdown(f"""<div class="metric-box color-3"><h3>Today Expenditure</h3><p>₹{metrics['Today Expenditure']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-3"><h3>Today Expenditure</h3><p>₹{to_rupees(metrics['Today Expenditure']):.2f}</p></div>""", unsafe_allow_html=True)
 
     # Row 2 for Monthly Metrics
     col4, col5, col6 = st.columns(3)
     
     with col4:
-        st.markdown(f"""<div class="metric-box color-1"><h3>Monthly Sales</h3><p>₹{metrics['Monthly Sales']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-1"><h3>Monthly Sales</h3><p>₹{to_rupees(metrics['Monthly Sales']):.2f}</p></div>""", unsafe_allow_html=True)
     with col5:
-        st.markdown(f"""<div class="metric-box color-2"><h3>Monthly Profit</h3><p>₹{metrics['Monthly Profit']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-2"><h3>Monthly Profit</h3><p>₹{to_rupees(metrics['Monthly Profit']):.2f}</p></div>""", unsafe_allow_html=True)
     with col6:
-        st.markdown(f"""<div class="metric-box color-3"><h3>Monthly Expenditure</h3><p>₹{metrics['Monthly Expenditure']:.2f}</p></div>""", unsafe_allow_html=True)
+        st.markdown(f"""<div class="metric-box color-3"><h3>Monthly Expenditure</h3><p>₹{to_rupees(metrics['Monthly Expenditure']):.2f}</p></div>""", unsafe_allow_html=True)
 
-    st.markdown("---")
-    
-    # Add Sales Feature (using a popover for small form)
-    st.subheader("Record New Sale")
-    
-    stock_names = st.session_state.stock_data['Product Name'].tolist()
-    
-    if not stock_names:
-        st.warning("Please add some products to your Stock first to record a sale.")
-        return
+
+@fragment('add_sale')
+def add_sale_form():
+    """The Add Sales expander; picking a product or confirming a sale reruns only this section."""
+    shop = current_shop()
+    stock = shop.stock
 
     # Use st.expander as a compact form
     with st.expander("➕ Add Sales"):
-        with st.form("add_sales_form", clear_on_submit=True):
-            # 1. Search/Select Product
-            selected_product_name = st.selectbox(
-                "Search Product (Select from Stock)",
-                options=[''] + stock_names,
-                key="sale_product_select_input"
-            )
+        # 1. Search/Select Product (outside the form so the prefill follows the selection)
+        selected_product_name = product_picker(shop, "Search Product (Select from Stock)", key="sale_product")
+        
+        if selected_product_name:
+            product_row = stock.row(selected_product_name)
+            # Units held for bills still open at other counters cannot be sold here
+            quantity_available = shop.reservations.available(selected_product_name)
             
-            if selected_product_name:
-                product_row = st.session_state.stock_data[st.session_state.stock_data['Product Name'] == selected_product_name].iloc[0]
-                
+            if quantity_available < 1:
+                st.warning(f"'{selected_product_name}' is out of stock.")
+                return
+
+            with st.form("add_sales_form", clear_on_submit=True):
                 # Pre-fill/Edit Prices
                 col_p1, col_p2 = st.columns(2)
                 with col_p1:
-                    buy_price = st.number_input(f"Buy Price (from stock: ₹{product_row['Buy Price']:.2f})", 
-                                                value=product_row['Buy Price'], min_value=0.01, key="sale_buy_price")
+                    buy_price = st.number_input(f"Buy Price (from stock: ₹{to_rupees(product_row['Buy Price']):.2f})", 
+                                                value=float(to_rupees(product_row['Buy Price'])), min_value=0.01, key=f"sale_buy_price_{selected_product_name}")
                 with col_p2:
-                    sale_price = st.number_input(f"Selling Price (from stock: ₹{product_row['Sell Price']:.2f})", 
-                                                 value=product_row['Sell Price'], min_value=0.01, key="sale_sell_price")
+                    sale_price = st.number_input(f"Selling Price (from stock: ₹{to_rupees(product_row['Sell Price']):.2f})", 
+                                                 value=float(to_rupees(product_row['Sell Price'])), min_value=0.01, key=f"sale_sell_price_{selected_product_name}")
                 
                 # Quantity and Stock Check
-                quantity_available = product_row['Quantity']
-                st.info(f"Quantity in Stock: {quantity_available}")
+                held = product_row['Quantity'] - quantity_available
+                st.info(f"Quantity in Stock: {quantity_available}" + (f" ({held} more held for open bills)" if held else ""))
                 quantity_sold = st.number_input("Quantity Sold", min_value=1, max_value=int(quantity_available), value=1, step=1, key="sale_qty")
                 
                 # CONFIRM SUBMIT BUTTON IS HERE
@@ -228,10 +383,11 @@ def DashboardPage():
                     if quantity_sold > quantity_available:
                         st.error("Error: Quantity sold exceeds stock availability!")
                     else:
-                        # Calculation logic
+                        # Calculation logic (in paise)
+                        sale_price, buy_price = to_paise(sale_price), to_paise(buy_price)
                         profit = (sale_price - buy_price) * quantity_sold
                         
-                        # 1. Update Sales Data
+                        # Record the sale (also decrements stock)
                         new_sale = {
                             'Date': str(datetime.date.today()),
                             'Product Name': selected_product_name,
@@ -240,21 +396,21 @@ def DashboardPage():
                             'Buy Price': buy_price * quantity_sold,
                             'Profit': profit
                         }
-                        st.session_state.sales_data = pd.concat([st.session_state.sales_data, pd.DataFrame([new_sale])], ignore_index=True)
-
-                        # 2. Update Stock Data
-                        stock_index = st.session_state.stock_data[st.session_state.stock_data['Product Name'] == selected_product_name].index[0]
-                        st.session_state.stock_data.loc[stock_index, 'Quantity'] -= quantity_sold
-                        st.session_state.stock_data.loc[stock_index, 'Sales Count'] = st.session_state.stock_data.loc[stock_index, 'Sales Count'] + quantity_sold
-                        
-                        st.success(f"Sale confirmed! {quantity_sold} x {selected_product_name} sold. Profit: ₹{profit:.2f}")
-                        st.experimental_rerun() 
-            else:
-                st.warning("Please select a product.")
+                        try:
+                            shop.record_sale(new_sale)
+                        except (KeyError, ValueError) as e:
+                            st.error(f"Sale not recorded: {e}")
+                        else:
+                            # A toast survives the rerun that refreshes the available quantity
+                            st.toast(f"Sale confirmed! {quantity_sold} x {selected_product_name} sold. Profit: ₹{to_rupees(profit):.2f}")
+                            rerun_fragment()
+        else:
+            st.warning("Please select a product.")
 
 def StockPage():
     """Renders the stock management and product addition page."""
     user = st.session_state.user_data
+    shop = current_shop()
     st.header(f"{user.get('business_name', 'Your Business')} - Stock Management")
 
     st.subheader("➕ Add New Stock / Product")
@@ -269,51 +425,65 @@ def StockPage():
                 sell_price = st.number_input("Sell Price (per unit)", min_value=0.01, format="%.2f", key="stock_sell_price")
             with col_s3:
                 quantity = st.number_input("Stock Quantity", min_value=1, step=1, key="stock_quantity")
-                st.form_submit_button()
+            confirm_add = st.form_submit_button("Add Product")
             if confirm_add:
                 if product_name and buy_price > 0 and sell_price > 0 and quantity > 0:
                     new_product = {
                         'Product Name': product_name,
-                        'Buy Price': buy_price,
-                        'Sell Price': sell_price,
+                        'Buy Price': to_paise(buy_price),
+                        'Sell Price': to_paise(sell_price),
                         'Quantity': quantity,
                         'Sales Count': 0 
                     }
                     # Check if product already exists
-                    if product_name in st.session_state.stock_data['Product Name'].tolist():
+                    if product_name in shop.stock:
                         st.error(f"Product '{product_name}' already exists. Please update quantity or rename.")
                     else:
-                        st.session_state.stock_data = pd.concat([st.session_state.stock_data, pd.DataFrame([new_product])], ignore_index=True)
+                        shop.add_product(new_product)
                         st.success(f"Product '{product_name}' added to stock!")
-                        st.experimental_rerun() 
+                        st.rerun()
                 else:
                     st.error("Please ensure all fields are filled correctly (prices and quantity must be positive).")
 
+    with st.expander("📥 Bulk Import (CSV / Parquet)"):
+        st.caption("Columns: Product Name, Buy Price, Sell Price, Quantity (optional: Sales Count). Existing product names are skipped.")
+        import_file = st.file_uploader("Stock file", type=['csv', 'parquet'], key="stock_import_file")
+        if import_file is not None and st.button("Import Products", key="stock_import_btn"):
+            try:
+                report = import_stock(shop, import_file, detect_format(import_file.name))
+            except (ValueError, ImportError) as e:
+                st.error(f"Import stopped: {e}")
+            else:
+                st.success(f"Imported {report.added} products.")
+                if report.rejected:
+                    st.warning(f"{len(report.rejected)} rows were skipped:")
+                    st.dataframe(report.rejected_frame().head(1000), width='stretch', hide_index=True)
 
     st.markdown("---")
     st.subheader("Current Stock Inventory")
 
-    if st.session_state.stock_data.empty:
+    if shop.stock.empty:
         st.info("Your stock is empty. Please add products using the form above.")
         return
 
-    # Filter
-    search_term = st.text_input("Filter Stock by Product Name", placeholder="Search for product...")
-    
-    df_display = st.session_state.stock_data.copy()
+    low_stock_panel()
+    stock_inventory()
     
-    if search_term:
-        df_display = df_display[df_display['Product Name'].str.contains(search_term, case=False, na=False)]
-
-    # Display table
-    st.dataframe(df_display[['Product Name', 'Buy Price', 'Sell Price', 'Quantity']].rename(columns={
-        'Product Name': 'Product Name',
-        'Buy Price': 'Buy Price (₹)',
-        'Sell Price': 'Sell Price (₹)',
-        'Quantity': 'Available Stock'
-    }), use_container_width=True, hide_index=True)
+    st.caption("Note: Stock, sales and bills are saved to this business's local database.")
+
+
+@fragment('stock_inventory')
+def stock_inventory():
+    """The filter box and the inventory table; filtering, sorting and paging rerun only this section."""
+    shop = current_shop()
+    search_term = st.text_input("Filter Stock by Product Name", placeholder="Search for product...")
     
-    st.caption("Note: Changes made in the stock are temporary in this demo (uses session state).")
+    # Display table: only the visible page is built and sent
+    matches = paged_table("stock_table",
+                          lambda sort, ascending, page, page_size: stock_page(shop, search_term, sort, ascending, page, page_size),
+                          ['Default'] + list(STOCK_SORT_COLUMNS), signature=search_term)
+    if not matches:
+        st.info(f"No products match '{search_term}'.")
 
 
 def BillPage():
@@ -321,14 +491,72 @@ def BillPage():
     st.header("Billing & Invoice Generator")
     user = st.session_state.user_data
     business_name = user.get('business_name', 'SellSathi Business')
+    shop = current_shop()
     
     st.subheader("Generate New Bill")
     
-    stock_names = st.session_state.stock_data['Product Name'].tolist()
-    
-    if not stock_names:
+    if shop.stock.empty:
         st.warning("Please add some products to your Stock first to create a bill.")
         return
+    bill_editor(business_name, user.get('business_type'))
+
+    last_invoice = st.session_state.get('last_invoice')
+    if last_invoice:
+        st.markdown("---")
+        st.markdown(last_invoice['markdown'])
+        st.download_button(
+            label="Download Invoice (PDF)",
+            data=last_invoice['pdf'],
+            file_name=last_invoice['file_name'],
+            mime="application/pdf",
+            key="invoice_download"
+        )
+        
+    st.markdown("---")
+    st.subheader("Bill History")
+    col_h1, col_h2 = st.columns([3, 1])
+    customer_filter = col_h1.text_input("Customer", placeholder="All customers", key="history_customer").strip() or None
+    lookup_id = col_h2.number_input("Open Bill ID", min_value=0, step=1, key="history_bill_id")
+
+    # Only the requested page is read from storage
+    def fetch_history(sort, ascending, page, page_size):
+        return shop.cache.get(('bill_page', customer_filter, sort, ascending, page, page_size), ('bills',),
+                              lambda: bill_history_page(shop, page, page_size, customer_filter, sort, ascending))
+
+    total = paged_table("bill_history", fetch_history, BILL_COLUMNS, default_sort='Bill ID',
+                        default_ascending=False, signature=customer_filter)
+    if not total:
+        if customer_filter:
+            st.info(f"No bills for '{customer_filter}'.")
+        else:
+            st.info("No bills saved yet.")
+            return
+
+    if lookup_id:
+        bill = shop.storage.bill(lookup_id)
+        if bill is None:
+            st.warning(f"No bill with ID {lookup_id}.")
+        else:
+            st.markdown(f"**Bill {bill['bill_id']}** · {bill['date']} · {bill['customer']} · ₹{to_rupees(bill['total']):.2f}")
+            items_df = pd.DataFrame(bill['items'], columns=['name', 'qty', 'price', 'total'])
+            items_df[['price', 'total']] = to_rupees(items_df[['price', 'total']])
+            st.dataframe(items_df.rename(columns={'name': 'Product', 'qty': 'Qty', 'price': 'Unit Price (₹)', 'total': 'Total (₹)'}),
+                         width='stretch', hide_index=True)
+
+    with st.expander("📦 Export Invoices (PDF, ZIP)"):
+        invoice_export_panel(shop, InvoiceRenderer(business_name, user.get('business_type')))
+
+
+@fragment('bill_editor')
+def bill_editor(business_name, business_type):
+    """The bill being built: customer, line items and the save form. Adding an item reruns only this section."""
+    shop = current_shop()
+    stock = shop.stock
+    bill_draft = st.session_state.bill_draft
+    # Items on the open bill hold their stock under this session's id; keep the holds alive while the bill is open
+    owner = st.session_state.session_id
+    if bill_draft.items:
+        shop.reservations.renew(owner)
 
     # Removed the unnecessary st.form block around customer details to prevent 'missing submit button' warning
     st.text_input("Business Name (Auto-filled)", value=business_name, disabled=True)
@@ -340,46 +568,39 @@ def BillPage():
     # Item Addition Logic (Uses regular button)
     col_i1, col_i2, col_i3, col_i4 = st.columns([4, 2, 1, 1])
     
-    new_product = col_i1.selectbox("Select Product", options=['-- Add Product --'] + stock_names, key="new_product_select")
+    with col_i1:
+        new_product = product_picker(shop, "Select Product", key="new_product")
     new_qty = col_i2.number_input("Quantity", min_value=1, value=1, key="new_qty_input")
     
     # Get prices for selected product
-    item_price = 0.0
-    if new_product in stock_names:
-        product_row = st.session_state.stock_data[st.session_state.stock_data['Product Name'] == new_product].iloc[0]
-        item_price = product_row['Sell Price']
-        col_i3.metric(label="Unit Price (₹)", value=f"₹{item_price:.2f}")
+    item_price = 0
+    if new_product in stock:
+        item_price = int(stock.get(stock.position(new_product), 'Sell Price'))
+        col_i3.metric(label="Unit Price (₹)", value=f"₹{to_rupees(item_price):.2f}")
 
     if col_i4.button("Add Item", key="add_item_btn"):
-        if new_product != '-- Add Product --':
-            # Check for quantity against stock
-            quantity_available = st.session_state.stock_data[st.session_state.stock_data['Product Name'] == new_product]['Quantity'].iloc[0]
-            
-            qty_already_added = sum(item['qty'] for item in st.session_state.bill_items if item['name'] == new_product)
-            
-            if new_qty + qty_already_added > quantity_available:
-                st.error(f"Cannot add: Adding {new_qty} units exceeds stock availability ({quantity_available} total available).")
+        if new_product is not None:
+            # Reserve the units, so no other counter can sell them while this bill is open
+            try:
+                shop.reservations.reserve(owner, new_product, new_qty)
+            except (KeyError, ValueError) as e:
+                st.error(f"Cannot add {new_qty} units: {e}")
             else:
-                st.session_state.bill_items.append({
-                    'name': new_product,
-                    'qty': new_qty,
-                    'price': item_price,
-                    'total': new_qty * item_price
-                })
+                bill_draft.add(new_product, new_qty, item_price)
                 # Re-run is used to clear the selectbox/qty for a smoother flow.
-                st.experimental_rerun()
+                rerun_fragment()
         else:
             st.warning("Please select a valid product to add.")
 
     
     # Display current bill items
-    if st.session_state.bill_items:
-        bill_df = pd.DataFrame(st.session_state.bill_items)
-        bill_df = bill_df.rename(columns={'name': 'Product', 'qty': 'Qty', 'price': 'Unit Price (₹)', 'total': 'Total (₹)'})
-        st.dataframe(bill_df, use_container_width=True, hide_index=True)
+    if bill_draft.items:
+        paged_table("bill_items",
+                    lambda sort, ascending, page, page_size: bill_items_page(bill_draft.items, sort, ascending, page, page_size),
+                    ['Default'] + list(BILL_ITEM_DISPLAY_COLUMNS.values()), signature=len(bill_draft))
         
-        grand_total = bill_df['Total (₹)'].sum()
-        st.success(f"**Grand Total:** ₹{grand_total:.2f}")
+        grand_total = bill_draft.total
+        st.success(f"**Grand Total:** ₹{to_rupees(grand_total):.2f}")
 
         # Form 2: Final Bill Submission (with submit button)
         with st.form("final_bill_submission_form"):
@@ -393,126 +614,131 @@ def BillPage():
                     # Use st.form_submit_button's return value to check if submitted
                     st.error("Please ensure the customer's name is entered.")
                 else:
-                    # 1. Prepare Bill Content (Simulate PDF/Text Output)
-                    bill_content = f"""
-## SellSathi Invoice - {business_name}
-
-**Invoice Date:** {selling_date}
-**Customer Name:** {customer_name}
-**Business Type:** {user.get('business_type')}
-
----
-
-| Product | Quantity | Unit Price (₹) | Total (₹) |
-| :--- | :---: | :---: | :---: |
-"""
-                    for item in st.session_state.bill_items:
-                        bill_content += f"| {item['name']} | {item['qty']} | {item['price']:.2f} | {item['total']:.2f} |\n"
-                    
-                    bill_content += f"\n---"
-                    bill_content += f"\n**GRAND TOTAL: ₹{grand_total:.2f}**"
-                    bill_content += "\n\n*Thank you for your business!*"
-
-                    st.markdown(bill_content)
-                    
-                    # 2. Save to History and Update Stock (Assuming the sale is finalized here)
+                    # 1. Save to History and Update Stock as one all-or-nothing batch
                     bill_record = {
-                        'bill_id': random.randint(1000, 9999),
                         'date': str(selling_date),
                         'customer': customer_name,
                         'total': grand_total,
-                        'items': st.session_state.bill_items 
+                        'items': bill_draft.items
                     }
-                    st.session_state.bill_history.append(bill_record)
-                    
-                    # Update stock based on bill items
-                    for item in st.session_state.bill_items:
-                        product_name = item['name']
-                        quantity_sold = item['qty']
-                        
-                        stock_index = st.session_state.stock_data[st.session_state.stock_data['Product Name'] == product_name].index[0]
-                        st.session_state.stock_data.loc[stock_index, 'Quantity'] -= quantity_sold
-                        st.session_state.stock_data.loc[stock_index, 'Sales Count'] = st.session_state.stock_data.loc[stock_index, 'Sales Count'] + quantity_sold
-
-
-                    # 3. Provide Download Button
-                    st.download_button(
-                        label="Download Invoice (Text/PDF Mock)",
-                        data=bill_content,
-                        file_name=f"invoice_{selling_date}_{bill_record['bill_id']}.txt",
-                        mime="text/plain"
-                    )
+                    try:
+                        shop.finalize_bill(bill_record, owner)
+                    except (KeyError, ValueError) as e:
+                        st.error(f"Bill not saved, nothing was changed: {e}")
+                    else:
+                        # 2. Render the invoice once; it is shown (and downloadable) outside the form
+                        renderer = InvoiceRenderer(business_name, business_type)
+                        st.session_state.last_invoice = {
+                            'file_name': invoice_file_name(bill_record),
+                            'markdown': renderer.markdown(bill_record),
+                            'pdf': renderer.pdf(bill_record),
+                        }
 
-                    # 4. Clear temporary bill items
-                    st.session_state.bill_items = []
-                    st.success("Bill saved to history and stock updated.")
-                    st.experimental_rerun() 
+                        # 3. Clear temporary bill items
+                        st.session_state.bill_draft = BillDraft()
+                        st.success("Bill saved to history and stock updated.")
+                        # The whole page reruns, so the invoice and the bill history show the new bill
+                        st.rerun()
 
     else:
         st.info("No items added to the current bill. Please add products above.")
-        
-    st.markdown("---")
-    st.subheader("Bill History")
-    if st.session_state.bill_history:
-        history_df = pd.DataFrame([{'Bill ID': h['bill_id'], 'Date': h['date'], 'Customer': h['customer'], 'Total (₹)': h['total']} for h in st.session_state.bill_history])
-        st.dataframe(history_df, use_container_width=True, hide_index=True)
-    else:
-        st.info("No bills saved yet.")
 
 
 def AnalysisPage():
     """Renders business analysis and insights."""
     st.header("Business Analysis")
+    shop = current_shop()
+    
+    cube = shop.analytics
+
+    with st.expander("♻️ Rebuild Analytics"):
+        st.caption("Recomputes the dashboard metrics, rankings and trend rollups from stored sales. "
+                   "Stock is not reloaded; command-line ingests and imports only run while the app "
+                   "does not have this business open. Runs in the background.")
+        if st.button("Rebuild", key="rebuild_btn"):
+            start_job("rebuild_job", "Analytics rebuild", run_rebuild, shop)
+        if job_status("rebuild_job"):
+            st.success("Analytics rebuilt.")
+            cube = shop.analytics
     
-    if st.session_state.sales_data.empty:
+    if cube.empty:
         st.info("No sales data available yet. Please record some sales to see the analysis.")
         return
 
-    # Calculate total sales by product
-    product_sales = st.session_state.sales_data.groupby('Product Name')['Quantity Sold'].sum().reset_index()
-    product_sales = product_sales.sort_values(by='Quantity Sold', ascending=False)
-    
+    # Everything below reads the pre-aggregated cube, so cost follows what is shown
     st.subheader("Top Performing Products (by Quantity Sold)")
     
     col_l1, col_l2 = st.columns(2)
     
     with col_l1:
         st.markdown("#### Most Selling Products (Top 3)")
-        top_sellers = product_sales.head(3)
-        if not top_sellers.empty:
-            for index, row in top_sellers.iterrows():
-                st.success(f"🥇 **{row['Product Name']}** - {row['Quantity Sold']} units sold")
+        top_sellers = cube.top_sellers(3)
+        if top_sellers:
+            for name, quantity_sold in top_sellers:
+                st.success(f"🥇 **{name}** - {quantity_sold} units sold")
         else:
             st.info("Not enough data to determine top sellers.")
 
     with col_l2:
         st.markdown("#### Least Selling Products (Bottom 3)")
-        least_sellers = product_sales.tail(3).sort_values(by='Quantity Sold', ascending=True)
-        if not least_sellers.empty:
-            for index, row in least_sellers.iterrows():
-                st.warning(f"📉 **{row['Product Name']}** - {row['Quantity Sold']} units sold")
+        least_sellers = cube.least_sellers(3)
+        if least_sellers:
+            for name, quantity_sold in least_sellers:
+                st.warning(f"📉 **{name}** - {quantity_sold} units sold")
         else:
             st.info("Not enough data to determine least sellers.")
             
     st.markdown("---")
     st.subheader("Sales Trend Chart")
-    
-    # Group sales data by date
-    daily_sales = st.session_state.sales_data.groupby('Date')['Sale Price'].sum().reset_index()
-    daily_sales['Date'] = pd.to_datetime(daily_sales['Date'])
-    daily_sales = daily_sales.set_index('Date')
-    
-    st.line_chart(daily_sales)
-    st.caption("Daily Sales Revenue Over Time.")
+    sales_trend_chart(shop)
 
     st.markdown("---")
     st.subheader("Profit Distribution (Top 10 Products)")
     
-    profit_by_product = st.session_state.sales_data.groupby('Product Name')['Profit'].sum().nlargest(10).reset_index()
-    st.bar_chart(profit_by_product, x='Product Name', y='Profit')
+    top_profit = shop.cache.get(('top_profit', 10), ('sales',), lambda: cube.top_profit(10))
+    st.bar_chart(top_profit.assign(Profit=to_rupees(top_profit['Profit'])), x='Product Name', y='Profit')
     st.caption("Total Profit generated by the top 10 products.")
 
 
+def sales_trend_chart(shop):
+    """Plots revenue, profit and expenditure from the rollups at a resolution suited to the chosen range."""
+    first, last = shop.rollups.bounds()
+    col_r1, col_r2 = st.columns([3, 1])
+    date_range = col_r1.date_input("Date range", value=(first, last), key="trend_range")
+    resolution = col_r2.selectbox("Resolution", ('Auto',) + TREND_RESOLUTIONS, key="trend_resolution")
+    start, end = (date_range[0], date_range[-1]) if date_range else (first, last)
+
+    if resolution == 'Auto':
+        resolution = TREND_RESOLUTIONS[RESOLUTIONS.index(shop.rollups.pick_resolution(start, end))]
+    period = RESOLUTIONS[TREND_RESOLUTIONS.index(resolution)]
+    trend = shop.cache.get(('trend', start, end, period), ('sales',),
+                           lambda: to_rupees(shop.rollups.series(start, end, period)))
+    if trend.empty:
+        st.info("No sales in this date range.")
+        return
+    st.line_chart(trend)
+    st.caption(f"{resolution} revenue, profit and expenditure (₹), {len(trend)} points.")
+
+
+@fragment('low_stock', run_every=LIVE_REFRESH_SECONDS)
+def low_stock_panel():
+    """Lists products expected to run out before a reorder could arrive, with a suggested reorder quantity."""
+    shop = live_shop()
+    if shop is None or shop.stock.empty:
+        return
+    today = datetime.date.today()
+    low = shop.cache.get(('low_stock', today, LOW_STOCK_LIMIT), ('stock', 'sales'),
+                         lambda: shop.velocity.low_stock(today, limit=LOW_STOCK_LIMIT))
+    st.subheader("⚠️ Low Stock")
+    if low.empty:
+        st.success(f"No product is expected to run out within {LEAD_DAYS + SAFETY_DAYS} days.")
+        return
+    st.dataframe(low.round({'Units / Day': 2, 'Days Left': 1}), width='stretch', hide_index=True)
+    st.caption(f"Products selling fast enough to run out within {LEAD_DAYS + SAFETY_DAYS} days "
+               f"({LEAD_DAYS} days delivery + {SAFETY_DAYS} days margin). Reorder Qty covers "
+               f"{LEAD_DAYS + COVER_DAYS} days of sales at the recent rate.")
+
+
 def AboutPage():
     """Renders the About SellSathi page."""
     st.header("About SellSathi")
@@ -534,6 +760,116 @@ def AboutPage():
     """)
 
 
+# --- BACKGROUND JOBS ---
+# Long exports and rebuilds run on the shared job executor; the session only keeps the job id.
+
+def start_job(key, label, func, *args):
+    """Submits `func(job, *args)` and remembers its id under `key`, replacing (and cleaning up) the previous job."""
+    executor = shared_executor()
+    if st.session_state.get(key) is not None:
+        executor.forget(st.session_state[key])
+    try:
+        job = executor.submit(label, func, *args, owner=st.session_state.session_id)
+    except RuntimeError as e:
+        st.error(str(e))
+        return
+    st.session_state[key] = job.id
+
+
+def job_status(key):
+    """Shows the progress or outcome of the job under `key`; returns its result once it is done."""
+    job = shared_executor().get(st.session_state.get(key))
+    if job is None:
+        return None
+    if not job.finished:
+        job_progress(key)
+        return None
+    if job.status == FAILED:
+        st.error(f"{job.label} failed: {job.error}")
+    elif job.status == CANCELLED:
+        st.info(f"{job.label} was cancelled.")
+    return job.result if job.status == DONE else None
+
+
+@fragment('job_progress', run_every=JOB_POLL_SECONDS)
+def job_progress(key):
+    """Redraws a running job's progress every JOB_POLL_SECONDS.
+
+    Once the job ends the whole page reruns to show its outcome; that run does
+    not draw this fragment again, which stops the polling.
+    """
+    job = shared_executor().get(st.session_state.get(key))
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.progress, text=f"{job.label}: {job.message}")
+    if st.button("Cancel", key=f"{key}_cancel"):
+        job.cancel()
+        rerun_fragment()
+
+
+def download_result(result, key):
+    """Offers a finished export's file for download."""
+    if not result['count']:
+        st.info(result['empty'])
+    elif os.path.exists(result['path']):
+        with open(result['path'], 'rb') as f:
+            st.download_button(result['label'], data=f, file_name=result['file_name'], mime=result.get('mime'), key=key)
+
+
+def run_export(job, shop, dataset, fmt, start, end):
+    with tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False) as export_file:
+        path = export_file.name
+    job.files.append(path)
+    rows = export_data(shop, dataset, path, fmt, start, end,
+                       progress=lambda rows: job.update(message=f"{rows:,} rows written"))
+    return {'path': path, 'count': rows, 'label': f"Download {rows} rows", 'file_name': f"{dataset}_{start}_{end}.{fmt}",
+            'empty': "Nothing to export for this selection."}
+
+
+def run_invoice_export(job, shop, renderer, start, end):
+    total = shop.storage.bill_page(0, 1, start=start, end=end)[1]
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as export_file:
+        path = export_file.name
+    job.files.append(path)
+    count = export_invoices_zip(shop, renderer, path, start, end,
+                                progress=lambda count: job.update(count, total, f"{count:,} of {total:,} invoices"))
+    return {'path': path, 'count': count, 'label': f"Download {count} invoices", 'file_name': f"invoices_{start}_{end}.zip",
+            'mime': "application/zip", 'empty': "No bills in this date range."}
+
+
+def run_rebuild(job, shop):
+    shop.rebuild_aggregates(progress=lambda step, steps: job.update(step, steps, f"Step {step} of {steps}"))
+    return True
+
+
+def export_panel(shop):
+    """Renders the data export controls; the file is streamed to disk by a background job, then offered for download."""
+    dataset = st.selectbox("Data", EXPORT_DATASETS, format_func=str.title, key="export_dataset")
+    fmt = st.selectbox("Format", FORMATS, key="export_format")
+    today = datetime.date.today()
+    date_range = st.date_input("Date range (sales & bills)", value=(today.replace(day=1), today), key="export_range")
+    
+    if st.button("Prepare Export", key="export_btn"):
+        start, end = (date_range[0], date_range[-1]) if date_range else (None, None)
+        start_job("export_job", f"{dataset.title()} export", run_export, shop, dataset, fmt, start, end)
+    result = job_status("export_job")
+    if result:
+        download_result(result, "export_download")
+
+
+def invoice_export_panel(shop, renderer):
+    """Renders the batch invoice export; a background job streams the PDFs into a ZIP on disk, one bill at a time."""
+    today = datetime.date.today()
+    date_range = st.date_input("Bill dates", value=(today.replace(day=1), today), key="invoice_export_range")
+
+    if st.button("Prepare Invoices", key="invoice_export_btn"):
+        start, end = (date_range[0], date_range[-1]) if date_range else (None, None)
+        start_job("invoice_job", "Invoice export", run_invoice_export, shop, renderer, start, end)
+    result = job_status("invoice_job")
+    if result:
+        download_result(result, "invoice_export_download")
+
+
 # --- 4. MAIN APPLICATION FLOW ---
 
 def main_app():
@@ -548,31 +884,62 @@ def main_app():
             ('Dashboard', 'Stock', 'Bill', 'Business Analysis', 'About')
         )
         
+        with st.expander("📤 Export Data"):
+            export_panel(current_shop())
+
         # Simple Logout (Resets session state)
         if st.button("Logout"):
             st.session_state.logged_in = False
-            # Reset all session state variables upon logout
-            keys_to_reset = ['user_data', 'stock_data', 'sales_data', 'bill_history', 'bill_items']
+            # Data is already saved; drop any open bill's stock holds, give up this session's lease and reset session state
+            current_shop().reservations.release(st.session_state.session_id)
+            for job in shared_executor().jobs(st.session_state.session_id):
+                shared_executor().forget(job.id)
+            shared_registry().release(st.session_state.user_data['business_name'], st.session_state.session_id)
+            keys_to_reset = ['user_data', 'bill_draft', 'last_invoice', 'export_job', 'invoice_job', 'rebuild_job']
             for key in keys_to_reset:
                 if key in st.session_state:
                     del st.session_state[key]
-            st.experimental_rerun()
+            st.rerun()
             
 
     # Render selected page
-    if st.session_state.page == 'Dashboard':
-        DashboardPage()
-    elif st.session_state.page == 'Stock':
-        StockPage()
-    elif st.session_state.page == 'Bill':
-        BillPage()
-    elif st.session_state.page == 'Business Analysis':
-        AnalysisPage()
-    elif st.session_state.page == 'About':
-        AboutPage()
+    with timed(f"page.{st.session_state.page}"):
+        if st.session_state.page == 'Dashboard':
+            DashboardPage()
+        elif st.session_state.page == 'Stock':
+            StockPage()
+        elif st.session_state.page == 'Bill':
+            BillPage()
+        elif st.session_state.page == 'Business Analysis':
+            AnalysisPage()
+        elif st.session_state.page == 'About':
+            AboutPage()
+
+
+def debug_panel(record):
+    """Renders the profile of the run that just finished in the sidebar."""
+    with st.sidebar.expander("🛠 Profiling (this run)", expanded=True):
+        st.caption(f"{record['label']} · {record['total_ms']:.1f} ms total")
+        timings = pd.DataFrame([{'Span': name, 'Calls': t['calls'], 'ms': t['ms']} for name, t in record['timings'].items()])
+        st.dataframe(timings, width='stretch', hide_index=True)
+        st.write(record['counters'])
+        memory = pd.DataFrame(list(record['session_bytes'].items()), columns=['Session key', 'Bytes'])
+        st.dataframe(memory, width='stretch', hide_index=True)
+        st.caption("Shops loaded in this process")
+        st.dataframe(pd.DataFrame(shared_registry().stats()), width='stretch', hide_index=True)
+
 
 # Check login status and display appropriate view
-if st.session_state.logged_in:
-    main_app()
-else:
-    RegistrationPage()
+try:
+    if st.session_state.logged_in:
+        main_app()
+    else:
+        RegistrationPage()
+
+    st.sidebar.checkbox("Debug: profile reruns", key="debug_profile",
+                        help="Times pages and data operations; also appended to $SELLSATHI_PROFILE_LOG if set.")
+finally:
+    # Runs that end in st.rerun() (a sale, a saved bill) raise out of the page; they are logged too
+    profile_record = finish_run(st.session_state)
+if profile_record and st.session_state.get('debug_profile'):
+    debug_panel(profile_record)
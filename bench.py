@@ -0,0 +1,376 @@
+"""Headless benchmarks for the shop's core operations.
+
+    python bench.py run --sizes 1k,100k,1M --out after.json
+    python bench.py compare before.json after.json
+    python bench.py stress --counters 1,4,16
+
+Each size is the number of sales rows generated; products, days and bills
+scale with it. Latency is the median wall time over a few repeats; peak
+memory is measured with tracemalloc in a separate call so it does not
+distort the timings.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ingest import ingest_chunks
+from metrics import calculate_metrics
+from analytics import SalesCube
+from forecast import SalesVelocity
+from journal import JournalStorage
+from shop import Shop
+from storage import MemoryStorage, SQLiteStorage
+
+DEFAULT_SIZES = '1k,100k,1M'
+DEFAULT_REPEATS = 5
+# Relative slowdown reported as a regression by `compare`.
+DEFAULT_THRESHOLD = 0.10
+# Starting stock per product in the checkout stress test: enough that no run sells out.
+STRESS_UNITS = 10 ** 8
+
+SEARCH_QUERIES = ('a', 'pr', 'prod 12', 'widget')
+WORDS = ('Widget', 'Gadget', 'Sprocket', 'Pen', 'Notebook', 'Bottle', 'Cable', 'Lamp', 'Soap', 'Rice')
+
+
+def parse_size(text):
+    """'1k' -> 1000, '100k' -> 100000, '1M' -> 1000000."""
+    text = text.strip()
+    scale = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale != 1 else text) * scale)
+
+
+# --- SYNTHETIC DATA ---
+
+def synthetic_products(count, rng):
+    """Product columns with realistic-looking names and paise prices; stock is deep enough for any run."""
+    words = np.array(WORDS, dtype=object)
+    names = [f"{words[i % len(words)]} {words[(i // len(words)) % len(words)]} Prod {i}" for i in range(count)]
+    buy = rng.integers(500, 500000, count)
+    return {
+        'Product Name': np.array(names, dtype=object),
+        'Buy Price': buy,
+        'Sell Price': buy + rng.integers(100, 100000, count),
+        'Quantity': np.full(count, 1_000_000_000, dtype=np.int32),
+        'Sales Count': np.zeros(count, dtype=np.int64),
+    }
+
+
+def synthetic_sales(shop, count, days, rng, first_day):
+    """Sale rows for `count` random (product, day) pairs, priced from stock."""
+    positions = rng.integers(0, len(shop.stock), count)
+    quantities = rng.integers(1, 10, count)
+    sell = shop.stock.take('Sell Price', positions) * quantities
+    buy = shop.stock.take('Buy Price', positions) * quantities
+    return {
+        'Date': np.datetime64(first_day, 'D') + rng.integers(0, days, count),
+        'Product Name': shop.stock.take('Product Name', positions),
+        'Quantity Sold': quantities,
+        'Sale Price': sell,
+        'Buy Price': buy,
+        'Profit': sell - buy,
+    }
+
+
+def synthetic_log(shop, count, rng):
+    """A raw POS sale log chunk (names and quantities only, as strings) for the ingestion path."""
+    positions = rng.integers(0, len(shop.stock), count)
+    return pd.DataFrame({'Product Name': shop.stock.take('Product Name', positions),
+                         'Quantity Sold': rng.integers(1, 10, count).astype(str)})
+
+
+def synthetic_bill(shop, lines, rng, date):
+    positions = rng.choice(len(shop.stock), size=min(lines, len(shop.stock)), replace=False)
+    items = []
+    for pos in positions:
+        qty = int(rng.integers(1, 5))
+        price = int(shop.stock.get(pos, 'Sell Price'))
+        items.append({'name': shop.stock.get(pos, 'Product Name'), 'qty': qty, 'price': price, 'total': qty * price})
+    return {'date': str(date), 'customer': f"Customer {int(rng.integers(0, 500))}",
+            'total': sum(item['total'] for item in items), 'items': items}
+
+
+def build_shop(storage, sales_rows, seed=0, days=None, batch_rows=100000):
+    """Fills `storage` with products, `sales_rows` sales over `days` days and a proportional number of bills."""
+    rng = np.random.default_rng(seed)
+    days = days or min(365, max(30, sales_rows // 1000))
+    first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+    shop = Shop(storage)
+    shop.add_products(synthetic_products(max(100, sales_rows // 20), rng))
+    for start in range(0, sales_rows, batch_rows):
+        shop.record_sales(synthetic_sales(shop, min(batch_rows, sales_rows - start), days, rng, first_day))
+    for _ in range(max(10, min(sales_rows // 100, 2000))):
+        lines = int(rng.choice([1, 3, 10, 40]))
+        shop.finalize_bill(synthetic_bill(shop, lines, rng, first_day + datetime.timedelta(days=int(rng.integers(0, days)))))
+    return shop
+
+
+# --- BENCHMARKS ---
+
+def benchmarks(shop, rng):
+    """(name, zero-argument callable) pairs; write benchmarks add to the shop on every call."""
+    today = datetime.date.today()
+    month_start = today.replace(day=1)
+    sales_frame = shop.storage.sales_frame()
+    yield 'metrics.full_scan', lambda: calculate_metrics(shop.storage.sales_frame(), today)
+    yield 'metrics.aggregated', lambda: shop.metrics.metrics(today)
+    yield 'sales.read_month', lambda: shop.storage.sales_frame(start=month_start, end=today)
+    yield 'analysis.cube_rebuild', lambda: SalesCube.from_frame(shop.storage.daily_product_totals())
+    yield 'analysis.groupby_scan', lambda: (sales_frame.groupby('Product Name', observed=True)['Quantity Sold'].sum().nlargest(3),
+                                            sales_frame.groupby('Date')['Sale Price'].sum())
+    yield 'analysis.cube_read', lambda: (shop.analytics.top_sellers(3), shop.analytics.least_sellers(3),
+                                         shop.analytics.top_profit(10), shop.analytics.revenue_by_date())
+    first, last = shop.rollups.bounds()
+    yield 'analysis.trend_auto', lambda: shop.rollups.series(first, last)
+    yield 'analysis.trend_daily_scan', lambda: shop.storage.sales_frame(columns=['Date', 'Sale Price']).groupby('Date')['Sale Price'].sum()
+    for query in SEARCH_QUERIES:
+        yield f'stock.search[{query}]', lambda query=query: shop.search.search_ids(query, limit=None)
+    yield 'stock.sort_by_price', lambda: np.argsort(shop.stock.column('Sell Price'), kind='stable')
+    yield 'stock.low_stock', lambda: shop.velocity.low_stock(today, limit=50)
+    yield 'stock.velocity_rebuild', lambda: SalesVelocity.from_frame(shop.stock, shop.storage.daily_product_totals(), today)
+    yield 'bills.page', lambda: shop.storage.bill_page(0, 25)
+    yield 'bills.page_by_customer', lambda: shop.storage.bill_page(0, 25, customer='Customer 7')
+    yield 'sale.record_one', lambda: shop.record_sales(synthetic_sales(shop, 1, 1, rng, today))
+    yield 'sale.record_batch_1000', lambda: shop.record_sales(synthetic_sales(shop, 1000, 1, rng, today))
+    yield 'sale.ingest_log_10k', lambda: ingest_chunks(shop, [synthetic_log(shop, 10000, rng)])
+    for lines in (5, 50, 500):
+        yield f'bill.finalize_{lines}_lines', lambda lines=lines: shop.finalize_bill(synthetic_bill(shop, lines, rng, today))
+    if shop.storage.durable:
+        yield 'shop.cold_start', lambda: Shop(reopen_storage(shop.storage)).close()
+
+
+def measure(func, repeats):
+    """Returns (median ms, min ms, peak traced KiB)."""
+    func()  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), min(times), peak / 1024
+
+
+def open_bench_storage(kind, directory):
+    if kind == 'memory':
+        return MemoryStorage()
+    if kind == 'journal':
+        return JournalStorage(os.path.join(directory, f"bench_{time.time_ns()}.journal"))
+    return SQLiteStorage(os.path.join(directory, f"bench_{time.time_ns()}.sqlite3"))
+
+
+def reopen_storage(storage):
+    """A second storage on a durable backend's files, opened as a restarted server would open it."""
+    if isinstance(storage, JournalStorage):
+        return JournalStorage(storage.directory, storage.snapshot_events)
+    return SQLiteStorage(storage.path)
+
+
+def run(sizes, repeats=DEFAULT_REPEATS, storage='memory', seed=0, only=None, log=print):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            start = time.perf_counter()
+            shop = build_shop(open_bench_storage(storage, directory), size, seed)
+            log(f"[{size:,} sales] built in {time.perf_counter() - start:.1f}s "
+                f"({len(shop.stock):,} products, {shop.storage.bill_page(0, 1)[1]:,} bills)")
+            rng = np.random.default_rng(seed + 1)
+            for name, func in benchmarks(shop, rng):
+                if only and only not in name:
+                    continue
+                median, fastest, peak = measure(func, repeats)
+                results[f"{size}:{name}"] = {'size': size, 'name': name, 'ms': round(median, 4),
+                                             'min_ms': round(fastest, 4), 'peak_kib': round(peak, 1)}
+                log(f"  {name:<28} {median:>10.3f} ms  (min {fastest:.3f})  peak {peak:>10.1f} KiB")
+            shop.close()
+    return {
+        'meta': {'created': datetime.datetime.now().isoformat(timespec='seconds'), 'storage': storage,
+                 'repeats': repeats, 'seed': seed, 'python': platform.python_version(), 'machine': platform.machine()},
+        'results': results,
+    }
+
+
+# --- CHECKOUT STRESS ---
+
+def stress_checkouts(storage, counters, products=50, units=STRESS_UNITS, seconds=2.0, think_ms=1.0, seed=0):
+    """Runs `counters` threads building and finalizing bills against the same stock.
+
+    Each counter reserves every item before adding it and finalizes the bill
+    with its holds, as BillPage does; every fourth checkout is a direct
+    dashboard sale instead. `think_ms` is the pause per item (the cashier
+    scanning). By default every product has enough `units` that checkouts
+    commit, so throughput measures real writes; a small `units` (e.g. 200)
+    tests contention for scarce stock instead. Returns throughput and
+    rejection counts, plus whether the stock afterwards matches the sales
+    exactly (nothing oversold).
+    """
+    shop = Shop(storage)
+    catalog = synthetic_products(products, np.random.default_rng(seed))
+    catalog['Quantity'] = np.full(products, units, dtype=np.int32)
+    shop.add_products(catalog)
+    names = catalog['Product Name']
+    totals = {'bills': 0, 'sales': 0, 'items': 0, 'rejected': 0, 'failed': 0}
+    totals_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def counter(index):
+        rng = np.random.default_rng(seed + 100 + index)
+        owner = f"counter-{index}"
+        done = dict.fromkeys(totals, 0)
+        checkout = 0
+        while time.perf_counter() < deadline:
+            checkout += 1
+            if checkout % 4 == 0:
+                name, qty = names[int(rng.integers(products))], int(rng.integers(1, 4))
+                pos = shop.stock.position(name)
+                sale = {'Date': str(datetime.date.today()), 'Product Name': name, 'Quantity Sold': qty,
+                        'Sale Price': qty * int(shop.stock.get(pos, 'Sell Price')),
+                        'Buy Price': qty * int(shop.stock.get(pos, 'Buy Price')), 'Profit': 0}
+                sale['Profit'] = sale['Sale Price'] - sale['Buy Price']
+                try:
+                    shop.record_sale(sale)
+                    done['sales'] += 1
+                except ValueError:
+                    done['rejected'] += 1
+                continue
+            items = []
+            for _ in range(int(rng.integers(1, 6))):
+                name, qty = names[int(rng.integers(products))], int(rng.integers(1, 4))
+                try:
+                    shop.reservations.reserve(owner, name, qty)
+                except ValueError:
+                    done['rejected'] += 1
+                    continue
+                price = int(shop.stock.get(shop.stock.position(name), 'Sell Price'))
+                items.append({'name': name, 'qty': qty, 'price': price, 'total': qty * price})
+                time.sleep(think_ms / 1000)
+            if not items:
+                continue
+            bill = {'date': str(datetime.date.today()), 'customer': owner,
+                    'total': sum(item['total'] for item in items), 'items': items}
+            try:
+                shop.finalize_bill(bill, owner)
+                done['bills'] += 1
+                done['items'] += len(items)
+            except ValueError:
+                done['failed'] += 1
+                shop.reservations.release(owner)
+        with totals_lock:
+            for key, value in done.items():
+                totals[key] += value
+
+    threads = [threading.Thread(target=counter, args=(i,)) for i in range(counters)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    sold = shop.storage.sales_frame().groupby('Product Name', observed=True)['Quantity Sold'].sum()
+    stock = shop.stock.frame().set_index('Product Name')
+    consistent = bool((stock['Quantity'] >= 0).all()
+                      and (stock['Quantity'] + stock['Sales Count'] == units).all()
+                      and (sold.reindex(stock.index, fill_value=0) == stock['Sales Count']).all())
+    shop.close()
+    return dict(totals, counters=counters, seconds=round(elapsed, 3),
+                checkouts_per_s=round((totals['bills'] + totals['sales']) / elapsed, 1), consistent=consistent)
+
+
+def stress(counter_counts, storage='memory', seconds=2.0, think_ms=1.0, seed=0, units=STRESS_UNITS, log=print):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for counters in counter_counts:
+            result = stress_checkouts(open_bench_storage(storage, directory), counters, units=units, seconds=seconds,
+                                      think_ms=think_ms, seed=seed)
+            results.append(result)
+            log(f"  {counters:>3} counters  {result['checkouts_per_s']:>9.1f} checkouts/s  "
+                f"{result['bills']:>6} bills  {result['sales']:>6} sales  {result['rejected']:>6} rejected  "
+                f"{result['failed']:>4} failed  {'ok' if result['consistent'] else 'OVERSOLD'}")
+    return results
+
+
+def compare(before, after, threshold=DEFAULT_THRESHOLD):
+    """Returns (report lines, regressed benchmark keys) comparing median latencies of two runs."""
+    lines = [f"{'benchmark':<40} {'before ms':>12} {'after ms':>12} {'change':>9}"]
+    regressions = []
+    for key in sorted(set(before['results']) | set(after['results']), key=lambda k: (int(k.split(':')[0]), k)):
+        old, new = before['results'].get(key), after['results'].get(key)
+        if old is None or new is None:
+            lines.append(f"{key:<40} {'-' if old is None else old['ms']:>12} {'-' if new is None else new['ms']:>12}")
+            continue
+        change = (new['ms'] - old['ms']) / old['ms'] if old['ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        lines.append(f"{key:<40} {old['ms']:>12.3f} {new['ms']:>12.3f} {change:>+8.1%}{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SellSathi headless benchmarks.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="Generate synthetic shops and time the core operations.")
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Sales rows per shop, e.g. 1k,100k,1M.")
+    run_parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    run_parser.add_argument('--storage', choices=('memory', 'sqlite', 'journal'), default='memory')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--only', help="Run only benchmarks whose name contains this text.")
+    run_parser.add_argument('--out', help="Write the results as JSON to this file.")
+    compare_parser = commands.add_parser('compare', help="Compare two result files.")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="Relative slowdown counted as a regression (default 0.10).")
+    stress_parser = commands.add_parser('stress', help="Concurrent checkouts against shared stock (checks for overselling).")
+    stress_parser.add_argument('--counters', default='1,2,4,8,16', help="Thread counts to run, e.g. 1,4,16.")
+    stress_parser.add_argument('--seconds', type=float, default=2.0)
+    stress_parser.add_argument('--think-ms', type=float, default=1.0, help="Pause per scanned item.")
+    stress_parser.add_argument('--units', type=int, default=STRESS_UNITS,
+                               help="Starting stock per product; e.g. 200 to make counters compete for scarce stock.")
+    stress_parser.add_argument('--storage', choices=('memory', 'sqlite', 'journal'), default='memory')
+    stress_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'stress':
+        results = stress([int(n) for n in args.counters.split(',')], args.storage, args.seconds, args.think_ms, args.seed,
+                         args.units)
+        return 0 if all(result['consistent'] for result in results) else 1
+
+    if args.command == 'run':
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.repeats, args.storage, args.seed, args.only)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    lines, regressions = compare(before, after, args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+class BillDraft:
+    """The bill currently being built: its line items plus a running quantity per product.
+
+    Stock for the items is held by the shop's reservations until the bill is
+    finalized; the per-product totals are what this bill holds of each product.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.quantities = {}
+        self.total = 0  # paise
+
+    def __len__(self):
+        return len(self.items)
+
+    def quantity(self, name):
+        """Units of `name` already on the bill."""
+        return self.quantities.get(name, 0)
+
+    def add(self, name, qty, price):
+        """Appends a line item."""
+        self.items.append({'name': name, 'qty': qty, 'price': price, 'total': qty * price})
+        self.quantities[name] = self.quantities.get(name, 0) + qty
+        self.total += qty * price
@@ -0,0 +1,174 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+import pandas as pd
+
+from ledger import Ledger
+from profiling import ROWS_SCANNED, count
+from schema import BILL_ITEM_SCHEMA, BILL_SCHEMA, day_keys
+
+# Header columns returned by history queries, and the per-line columns of exports.
+BILL_COLUMNS = ['Bill ID', 'Date', 'Customer', 'Bill Total']
+BILL_LINE_COLUMNS = BILL_COLUMNS + list(BILL_ITEM_SCHEMA)
+
+BILL_PAGE_SIZE = 25
+
+
+class BillHistory:
+    """In-memory bill store: columnar headers, items kept separately, and lookup indexes.
+
+    Bill IDs come from a monotonic allocator, so headers are stored in ID order
+    and an ID lookup is a bisect. Customers map to the (ascending) positions of
+    their bills and dates are kept in a sorted list, so a customer's bills or a
+    date range are found in O(log n) plus the size of the answer.
+    """
+
+    def __init__(self):
+        self.headers = Ledger(BILL_SCHEMA)
+        self.items = Ledger(BILL_ITEM_SCHEMA)
+        self._ids = []
+        self._by_customer = {}
+        self._by_date = []  # sorted (date key, position)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def next_id(self):
+        return self._ids[-1] + 1 if self._ids else 1
+
+    def add(self, bill_record):
+        """Stores a bill (header fields plus `items`), assigning `bill_record['bill_id']` if it is missing."""
+        bill_id = bill_record.get('bill_id')
+        if bill_id is None:
+            bill_id = bill_record['bill_id'] = self.next_id()
+        elif self._ids and bill_id <= self._ids[-1]:
+            raise ValueError(f"Bill ID {bill_id} is not greater than the last bill ID {self._ids[-1]}.")
+        items = bill_record['items']
+        pos = len(self._ids)
+        self.items.extend({
+            'Product': [item['name'] for item in items],
+            'Qty': [item['qty'] for item in items],
+            'Unit Price': [item['price'] for item in items],
+            'Line Total': [item['total'] for item in items],
+        })
+        self.headers.append({
+            'Bill ID': bill_id,
+            'Date': bill_record['date'],
+            'Customer': bill_record['customer'],
+            'Bill Total': bill_record['total'],
+            'First Item': len(self.items) - len(items),
+            'Item Count': len(items),
+        })
+        self._ids.append(int(bill_id))
+        self._by_customer.setdefault(bill_record['customer'], []).append(pos)
+        insort(self._by_date, (str(day_keys([bill_record['date']])[0]), pos))
+        return bill_id
+
+    def load(self, headers, items, item_categories):
+        """Fills an empty history from stored header and item columns (see Ledger.load) and rebuilds the indexes."""
+        self.headers.load(headers)
+        self.items.load(items, item_categories)
+        self._ids = self.headers.column('Bill ID').tolist()
+        for pos, customer in enumerate(self.headers.column('Customer').tolist()):
+            self._by_customer.setdefault(customer, []).append(pos)
+        self._by_date = sorted(zip(day_keys(self.headers.column('Date')).tolist(), range(len(self._ids))))
+
+    # --- Lookups ---
+
+    def position(self, bill_id):
+        pos = bisect_left(self._ids, bill_id)
+        return pos if pos < len(self._ids) and self._ids[pos] == bill_id else None
+
+    def get(self, bill_id):
+        """Returns the bill with its items, or None."""
+        pos = self.position(bill_id)
+        if pos is None:
+            return None
+        header = {col: self.headers.get(pos, col) for col in BILL_SCHEMA}
+        return {
+            'bill_id': int(header['Bill ID']),
+            'date': str(day_keys([header['Date']])[0]),
+            'customer': header['Customer'],
+            'total': int(header['Bill Total']),
+            'items': self.bill_items(bill_id),
+        }
+
+    def bill_items(self, bill_id):
+        pos = self.position(bill_id)
+        if pos is None:
+            return []
+        start = int(self.headers.get(pos, 'First Item'))
+        rows = np.arange(start, start + int(self.headers.get(pos, 'Item Count')))
+        columns = [self.items.take(col, rows).tolist() for col in BILL_ITEM_SCHEMA]
+        return [{'name': name, 'qty': qty, 'price': price, 'total': total} for name, qty, price, total in zip(*columns)]
+
+    def positions(self, customer=None, start=None, end=None):
+        """Positions (ascending, i.e. oldest bill first) of the bills matching the filters."""
+        if customer is not None:
+            positions = np.asarray(self._by_customer.get(customer, []), dtype=np.int64)
+            if start is not None or end is not None:
+                dates = day_keys(self.headers.take('Date', positions))
+                keep = np.ones(len(positions), dtype=bool)
+                if start is not None:
+                    keep &= dates >= str(start)
+                if end is not None:
+                    keep &= dates <= str(end)
+                positions = positions[keep]
+            return positions
+        if start is None and end is None:
+            return np.arange(len(self._ids))
+        lo = bisect_left(self._by_date, (str(start),)) if start is not None else 0
+        hi = bisect_right(self._by_date, (str(end), len(self._ids))) if end is not None else len(self._by_date)
+        return np.sort(np.fromiter((pos for _, pos in self._by_date[lo:hi]), dtype=np.int64, count=hi - lo))
+
+    def count(self, customer=None, start=None, end=None):
+        if customer is None and start is None and end is None:
+            return len(self._ids)
+        return len(self.positions(customer, start, end))
+
+    def frame(self, positions):
+        """Bill headers at `positions` as a DataFrame of BILL_COLUMNS (dates as 'YYYY-MM-DD')."""
+        df = pd.DataFrame({col: self.headers.take(col, positions) for col in BILL_COLUMNS})
+        df['Date'] = day_keys(df['Date'].to_numpy())
+        return df
+
+    def page(self, page=0, page_size=BILL_PAGE_SIZE, customer=None, start=None, end=None, sort='Bill ID', ascending=False):
+        """Returns (one page of bill headers sorted by `sort`, total matching bills); newest first by default."""
+        if sort == 'Bill ID' and customer is None and start is None and end is None:
+            # Positions are already in ID order, so the page is computed without touching other bills
+            total = len(self._ids)
+            lo, hi = page * page_size, min((page + 1) * page_size, total)
+            positions = np.arange(lo, hi) if ascending else total - 1 - np.arange(lo, hi)
+            return self.frame(positions[positions >= 0]), total
+        matches = self.positions(customer, start, end)
+        count(ROWS_SCANNED, len(matches))
+        if sort != 'Bill ID':
+            # A stable sort keeps ties in ID order (matches are ascending IDs)
+            matches = matches[np.argsort(self.headers.take(sort, matches), kind='stable')]
+        if not ascending:
+            matches = matches[::-1]
+        return self.frame(matches[page * page_size:(page + 1) * page_size]), len(matches)
+
+    def iter_lines(self, start=None, end=None, chunk_rows=50000):
+        """Yields one row per bill line (header columns repeated) for bills within [start, end], oldest first."""
+        positions = self.positions(start=start, end=end)
+        firsts = self.headers.take('First Item', positions)
+        counts = self.headers.take('Item Count', positions).astype(np.int64)
+        # Bills are cut at chunk boundaries only, so a chunk may exceed chunk_rows by one bill
+        line_ends = np.cumsum(counts)
+        offset = 0
+        while offset < len(positions):
+            base = line_ends[offset - 1] if offset else 0
+            stop = max(int(np.searchsorted(line_ends, base + chunk_rows, side='right')), offset + 1)
+            chunk_counts = counts[offset:stop]
+            rows = np.repeat(firsts[offset:stop] - np.cumsum(chunk_counts) + chunk_counts, chunk_counts) + np.arange(chunk_counts.sum())
+            header = self.frame(positions[offset:stop]).loc[np.repeat(np.arange(stop - offset), chunk_counts)].reset_index(drop=True)
+            for col in BILL_ITEM_SCHEMA:
+                header[col] = self.items.take(col, rows)
+            yield header
+            offset = stop
+
+    def history(self):
+        """All bill headers as dicts (bill_id, date, customer, total), oldest first."""
+        df = self.frame(np.arange(len(self._ids)))
+        return [{'bill_id': int(r[0]), 'date': r[1], 'customer': r[2], 'total': int(r[3])} for r in df.itertuples(index=False)]
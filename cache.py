@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from profiling import count
+
+# Datasets a cached result can depend on. Each has its own version counter.
+DATASETS = ('stock', 'sales', 'bills')
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def estimate_size(value):
+    """Rough memory footprint of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class VersionedCache:
+    """LRU cache of derived results, invalidated by per-dataset version counters.
+
+    Each write bumps the versions of the datasets it touched. A cached entry
+    records the versions of the datasets it was computed from and is reused
+    only while they are unchanged, so a sale does not throw away results that
+    depend on bills alone. Entries are evicted least-recently-used first once
+    `max_entries` or `max_bytes` is exceeded. A shop (and so its cache) may be
+    shared by several sessions; bookkeeping is locked, computing is not.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.versions = dict.fromkeys(DATASETS, 0)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (datasets, versions, value, size)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bump(self, *datasets):
+        """Marks datasets as changed and drops the entries that depend on them."""
+        with self._lock:
+            for dataset in datasets:
+                self.versions[dataset] += 1
+            stale = [key for key, (deps, _, _, _) in self._entries.items() if not set(deps).isdisjoint(datasets)]
+            for key in stale:
+                self._drop(key)
+
+    def get(self, key, datasets, compute):
+        """Returns the cached result for `key`, calling `compute()` if it is missing or stale.
+
+        `datasets` lists what the result is derived from; `key` must capture
+        every other input (query text, limits, dates, ...).
+        """
+        with self._lock:
+            versions = tuple(self.versions[dataset] for dataset in datasets)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                count('cache_hits')
+                return entry[2]
+            self.misses += 1
+        count('cache_misses')
+        value = compute()
+        self.put(key, datasets, value, versions)
+        return value
+
+    def put(self, key, datasets, value, versions=None):
+        size = estimate_size(value)
+        with self._lock:
+            if versions is None:
+                versions = tuple(self.versions[dataset] for dataset in datasets)
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (tuple(datasets), versions, value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self.nbytes -= self._entries.pop(key)[3]
+
+    def clear(self):
+        """Drops every entry and bumps all versions (e.g. on logout)."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            for dataset in self.versions:
+                self.versions[dataset] += 1
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def cache_from_env():
+    """Builds a cache sized by SELLSATHI_CACHE_ENTRIES and SELLSATHI_CACHE_MB (if set)."""
+    max_entries = int(os.environ.get('SELLSATHI_CACHE_ENTRIES', DEFAULT_MAX_ENTRIES))
+    max_mb = os.environ.get('SELLSATHI_CACHE_MB')
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    return VersionedCache(max_entries, max_bytes)
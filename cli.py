@@ -0,0 +1,124 @@
+"""Command-line access to a shop's data without the Streamlit UI.
+
+    python cli.py ingest "My Shop" pos_log.csv --rejects rejected.csv
+    python cli.py import "My Shop" products.parquet
+    python cli.py export "My Shop" sales sales.csv --start 2024-01-01
+    python cli.py audit "My Shop" --at 2024-06-30T21:00 --dest stock_then.csv
+
+The storage backend and data directory come from SELLSATHI_STORAGE and
+SELLSATHI_DATA_DIR, as for the app. `ingest` and `import` open the store for
+writing and refuse to run while a running app has the business loaded (the
+app would keep selling from its in-memory stock); the app lets go of a
+business once no session has used it for SELLSATHI_LEASE_TTL seconds.
+`export` reads the store's last committed state without locking it, so it
+runs alongside the app. `audit` reads the journal of the 'journal' backend
+and never writes to it; it reaches back before the oldest kept snapshot only
+if the journal keeps its full history (SELLSATHI_JOURNAL_KEEP_HISTORY=1).
+"""
+import argparse
+import datetime
+import sys
+import time
+
+from ingest import INGEST_CHUNK_ROWS, ingest_file
+from journal import EVENT_NAMES, describe_event, journal_path, read_events, state_at
+from shop import Shop, open_shop
+from storage import StoreInUseError
+from transfer import EXPORT_DATASETS, FORMATS, IMPORT_CHUNK_ROWS, detect_format, export_data, import_stock
+
+
+def _print_report(report, action, seconds, rejects=None):
+    rate = report.added / seconds if seconds else 0
+    print(f"{action} {report.added:,} rows in {seconds:.2f}s ({rate:,.0f} rows/s); {len(report.rejected):,} rejected.")
+    if report.rejected:
+        rejected = report.rejected_frame()
+        if rejects:
+            rejected.to_csv(rejects, index=False)
+            print(f"Rejected rows written to {rejects}.")
+        else:
+            print(rejected.head(20).to_string(index=False))
+
+
+def audit(args):
+    directory = journal_path(args.business)
+    if args.events:
+        for seq, when, kind, payload in read_events(directory):
+            moment = datetime.datetime.fromtimestamp(when).isoformat(timespec='seconds')
+            print(f"{seq:>8}  {moment}  {EVENT_NAMES.get(kind, kind):<8}  {describe_event(kind, payload)}")
+        return 0
+    until = datetime.datetime.fromisoformat(args.at).timestamp() if args.at else None
+    start = time.perf_counter()
+    try:
+        storage, applied = state_at(directory, args.seq, until)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Rebuilt the state after {applied:,} events in {time.perf_counter() - start:.2f}s: "
+          f"{len(storage.stock):,} products, {len(storage.sales):,} sales rows, {len(storage.bills):,} bills.")
+    if args.dest:
+        shop = Shop(storage)
+        rows = export_data(shop, args.dataset, args.dest, detect_format(args.dest))
+        print(f"Exported {rows:,} {args.dataset} rows to {args.dest}.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SellSathi data tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help="Replay a sale log (CSV, Parquet or JSON Lines) into a shop.")
+    ingest_parser.add_argument('business')
+    ingest_parser.add_argument('source')
+    ingest_parser.add_argument('--format', choices=FORMATS + ('jsonl',), help="Defaults to the file extension.")
+    ingest_parser.add_argument('--chunk-rows', type=int, default=INGEST_CHUNK_ROWS)
+    ingest_parser.add_argument('--rejects', help="Write rejected rows to this CSV file.")
+
+    import_parser = commands.add_parser('import', help="Bulk-import products from CSV or Parquet.")
+    import_parser.add_argument('business')
+    import_parser.add_argument('source')
+    import_parser.add_argument('--chunk-rows', type=int, default=IMPORT_CHUNK_ROWS)
+    import_parser.add_argument('--rejects', help="Write rejected rows to this CSV file.")
+
+    export_parser = commands.add_parser('export', help="Export stock, sales or bills to CSV or Parquet.")
+    export_parser.add_argument('business')
+    export_parser.add_argument('dataset', choices=EXPORT_DATASETS)
+    export_parser.add_argument('dest')
+    export_parser.add_argument('--start', help="First date (YYYY-MM-DD) for sales and bills.")
+    export_parser.add_argument('--end', help="Last date (YYYY-MM-DD) for sales and bills.")
+
+    audit_parser = commands.add_parser('audit', help="Rebuild a journaled shop as it was at an earlier point.")
+    audit_parser.add_argument('business')
+    audit_parser.add_argument('--dataset', choices=EXPORT_DATASETS, default='stock')
+    audit_parser.add_argument('--dest', help="Export the dataset as it was then to this CSV or Parquet file.")
+    point = audit_parser.add_mutually_exclusive_group()
+    point.add_argument('--seq', type=int, help="State after this many events.")
+    point.add_argument('--at', help="State at this local time (YYYY-MM-DDTHH:MM[:SS]).")
+    audit_parser.add_argument('--events', action='store_true', help="List the journal's events instead.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'audit':
+        return audit(args)
+
+    try:
+        shop = open_shop(args.business, read_only=args.command == 'export')
+    except (StoreInUseError, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        start = time.perf_counter()
+        if args.command == 'ingest':
+            report = ingest_file(shop, args.source, args.format, args.chunk_rows)
+            _print_report(report, "Ingested", time.perf_counter() - start, args.rejects)
+        elif args.command == 'import':
+            report = import_stock(shop, args.source, detect_format(args.source), args.chunk_rows)
+            _print_report(report, "Imported", time.perf_counter() - start, args.rejects)
+        else:
+            rows = export_data(shop, args.dataset, args.dest, detect_format(args.dest), args.start, args.end)
+            print(f"Exported {rows:,} {args.dataset} rows to {args.dest} in {time.perf_counter() - start:.2f}s.")
+    finally:
+        shop.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
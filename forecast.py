@@ -0,0 +1,119 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+from schema import to_days
+
+# Days of sales kept per product. Velocity averages the rate over the last
+# SHORT_WINDOW_DAYS with the rate over the whole window, so a recent change in
+# demand shows up quickly without one busy day dominating.
+WINDOW_DAYS = 28
+SHORT_WINDOW_DAYS = 7
+# Days a reorder takes to arrive, extra days of sales kept in hand, and days of
+# sales a reorder should cover once it arrives.
+LEAD_DAYS = 7
+SAFETY_DAYS = 3
+COVER_DAYS = 14
+
+FORECAST_COLUMNS = ['Product Name', 'Quantity', 'Units / Day', 'Days Left', 'Reorder Qty']
+
+
+class SalesVelocity:
+    """Units sold per product over the last WINDOW_DAYS days, as a (product x day) ring of counts.
+
+    Rows are stock positions. Column `day % window` holds that day's units
+    until a later day reuses (and clears) it, and `days` records which day
+    each column holds. Sales are added as they are recorded; a forecast for
+    the whole catalogue is a masked sum over the day axis plus a few
+    element-wise operations, with no per-product Python work.
+    """
+
+    def __init__(self, stock, window=WINDOW_DAYS):
+        self.stock = stock
+        self.window = window
+        self.units = np.zeros((0, window), dtype=np.int64)
+        self.days = np.full(window, np.iinfo(np.int64).min, dtype=np.int64)
+
+    def _ensure_rows(self, count):
+        if count > len(self.units):
+            grown = np.zeros((max(count, 2 * len(self.units)), self.window), dtype=np.int64)
+            grown[:len(self.units)] = self.units
+            self.units = grown
+
+    def _add(self, positions, days, quantities, today=None):
+        self._ensure_rows(len(self.stock))
+        # A future date (e.g. a mistyped sale date) would take over a column still holding a day in the window
+        current = days <= _day(today)
+        positions, days, quantities = positions[current], days[current], quantities[current]
+        for day in np.unique(days).tolist():
+            slot = day % self.window
+            if day < self.days[slot]:
+                continue  # older than the window
+            if day > self.days[slot]:
+                self.units[:, slot] = 0
+                self.days[slot] = day
+            rows = days == day
+            np.add.at(self.units[:, slot], positions[rows], quantities[rows])
+
+    @profiled('forecast.add_batch')
+    def add_batch(self, sales):
+        """Adds a batch of sale rows ({column: array}) of products in stock."""
+        self._add(self.stock.positions(sales['Product Name']), to_days(sales['Date']).astype(np.int64),
+                  np.asarray(sales['Quantity Sold'], dtype=np.int64))
+
+    @classmethod
+    def from_frame(cls, stock, df_sales, today=None):
+        """Builds the ring from sales rows or per-(date, product) totals; only the last window's days are read."""
+        velocity = cls(stock)
+        if df_sales.empty:
+            return velocity
+        days = to_days(df_sales['Date'].to_numpy()).astype(np.int64)
+        recent = days > _day(today) - velocity.window
+        # Names are looked up once each, not once per row
+        codes, names = pd.factorize(df_sales['Product Name'].to_numpy()[recent])
+        positions = stock.lookup(np.asarray(names, dtype=object))[codes]
+        known = positions >= 0
+        velocity._add(positions[known], days[recent][known],
+                      df_sales['Quantity Sold'].to_numpy()[recent][known].astype(np.int64), today)
+        return velocity
+
+    def units_sold(self, days, today=None, count=None):
+        """Units sold per stock position (the first `count`, default all) over the `days` days up to `today`."""
+        today = _day(today)
+        sold = np.zeros(len(self.stock) if count is None else count, dtype=np.int64)
+        # Read without the shop's lock: the ring may be swapped for a larger one meanwhile, but is never resized here
+        units = self.units
+        rows = min(len(units), len(sold))
+        columns = np.flatnonzero((self.days > today - days) & (self.days <= today))
+        sold[:rows] = units[:rows, columns].sum(axis=1)
+        return sold
+
+    @profiled('forecast.forecast')
+    def forecast(self, today=None, lead_days=LEAD_DAYS, cover_days=COVER_DAYS):
+        """Velocity, days until stockout and suggested reorder quantity for every product (FORECAST_COLUMNS).
+
+        A reorder brings stock up to `lead_days + cover_days` days of sales.
+        Products that are not selling have infinite days left and no reorder.
+        """
+        count = len(self.stock)
+        rate = (self.units_sold(SHORT_WINDOW_DAYS, today, count) / SHORT_WINDOW_DAYS
+                + self.units_sold(self.window, today, count) / self.window) / 2
+        quantity = self.stock.column('Quantity')[:count].astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.where(rate > 0, np.maximum(quantity, 0) / rate, np.inf)
+        reorder = np.maximum(np.ceil(rate * (lead_days + cover_days)) - quantity, 0).astype(np.int64)
+        return pd.DataFrame(dict(zip(FORECAST_COLUMNS, (self.stock.column('Product Name')[:count], quantity, rate, days_left, reorder))))
+
+    def low_stock(self, today=None, lead_days=LEAD_DAYS, safety_days=SAFETY_DAYS, cover_days=COVER_DAYS, limit=None):
+        """Selling products that run out within `lead_days + safety_days`, soonest first."""
+        df = self.forecast(today, lead_days, cover_days)
+        df = df[df['Days Left'] <= lead_days + safety_days]
+        df = df.iloc[np.argsort(df['Days Left'].to_numpy(), kind='stable')]
+        return (df if limit is None else df.head(limit)).reset_index(drop=True)
+
+
+def _day(value=None):
+    """A date (today if None) as a day number."""
+    return int(to_days([value or datetime.date.today()]).astype(np.int64)[0])
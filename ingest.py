@@ -0,0 +1,170 @@
+import datetime
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from schema import SALES_SCHEMA, STOCK_SCHEMA, coerce_column
+from transfer import FORMATS, ImportReport, read_chunks
+
+# Columns of a sale log. Prices are per unit in rupees and default to the
+# product's stock prices when missing; a missing date means today.
+SALE_LOG_COLUMNS = ['Date', 'Product Name', 'Quantity Sold', 'Sale Price', 'Buy Price']
+REQUIRED_SALE_COLUMNS = ['Product Name', 'Quantity Sold']
+
+# Sale rows validated and committed per batch.
+INGEST_CHUNK_ROWS = 20000
+
+LOG_FORMATS = FORMATS + ('jsonl',)
+
+
+def detect_log_format(file_name):
+    """Returns 'csv', 'parquet' or 'jsonl' from a file name's extension."""
+    fmt = str(file_name).rsplit('.', 1)[-1].lower()
+    if fmt == 'ndjson':
+        return 'jsonl'
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unsupported file type '.{fmt}'. Use .csv, .parquet or .jsonl.")
+    return fmt
+
+
+def read_sale_chunks(source, fmt, chunk_rows=INGEST_CHUNK_ROWS):
+    """Yields raw DataFrames of sale log rows from a CSV, Parquet or JSON Lines source."""
+    if fmt == 'jsonl':
+        for chunk in pd.read_json(source, lines=True, dtype=False, chunksize=chunk_rows):
+            yield chunk[[col for col in chunk.columns if col in SALE_LOG_COLUMNS]]
+    else:
+        yield from read_chunks(source, fmt, SALE_LOG_COLUMNS, chunk_rows)
+
+
+def _unit_prices(chunk, col, stock_prices):
+    """Per-unit paise prices from a rupee column, falling back to the stock price where blank."""
+    if col not in chunk:
+        return pd.Series(stock_prices, index=chunk.index, dtype=np.float64)
+    raw = chunk[col]
+    blank = raw.isna() | (raw.astype(str).str.strip() == '')
+    prices = (pd.to_numeric(raw, errors='coerce') * 100).round()
+    return prices.mask(blank, pd.Series(stock_prices, index=chunk.index, dtype=np.float64))
+
+
+def _sequential_stock_check(positions, quantities, available, candidates):
+    """Marks rows that would take a product below zero, in log order.
+
+    Only products whose cumulative demand overflows reach this loop; a row that
+    does not fit is rejected and later, smaller sales of the same product may
+    still go through, exactly as if the sales had been entered one by one.
+    """
+    short = np.zeros(len(positions), dtype=bool)
+    for pos in np.unique(positions[candidates]):
+        rows = np.flatnonzero(positions == pos)
+        remaining = int(available[rows[0]])
+        for row in rows:
+            if quantities[row] <= remaining:
+                remaining -= int(quantities[row])
+            else:
+                short[row] = True
+    return short
+
+
+def _validate_sales_chunk(chunk, first_row, stock, reservations, today, report):
+    """Validates a raw chunk against free stock and prices it; returns the valid rows as a sales batch."""
+    missing = [col for col in REQUIRED_SALE_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Sale log is missing columns: {', '.join(missing)}")
+    rows = np.arange(first_row, first_row + len(chunk))
+    names = chunk['Product Name'].fillna('').astype(str).str.strip()
+    positions = stock.lookup(names)
+    known = positions >= 0
+    safe = np.where(known, positions, 0)
+    quantity = pd.to_numeric(chunk['Quantity Sold'], errors='coerce')
+    sell = _unit_prices(chunk, 'Sale Price', stock.take('Sell Price', safe) if len(stock) else np.zeros(len(chunk)))
+    buy = _unit_prices(chunk, 'Buy Price', stock.take('Buy Price', safe) if len(stock) else np.zeros(len(chunk)))
+    if 'Date' in chunk:
+        raw_dates = chunk['Date']
+        blank = raw_dates.isna() | (raw_dates.astype(str).str.strip() == '')
+        dates = pd.to_datetime(raw_dates.mask(blank, str(today)), errors='coerce', format='mixed')
+    else:
+        dates = pd.Series(pd.Timestamp(today), index=chunk.index)
+
+    checks = [
+        (pd.Series(~known, index=chunk.index), "product not in stock"),
+        (~((quantity >= 1) & (quantity % 1 == 0) & (quantity <= np.iinfo(STOCK_SCHEMA['Quantity']).max)),
+         "quantity sold must be a whole number >= 1"),
+        (~(sell > 0), "sale price must be at least 0.01"),
+        (~(buy > 0), "buy price must be at least 0.01"),
+        (dates.isna(), "invalid date"),
+    ]
+    valid = pd.Series(True, index=chunk.index)
+    for failed, reason in checks:
+        failed &= valid
+        report.reject(rows[failed.to_numpy()], names[failed], reason)
+        valid &= ~failed
+
+    keep = valid.to_numpy()
+    positions, names, quantity = positions[keep], names[keep], quantity[keep].to_numpy().astype(np.int64)
+    sell, buy, dates = sell[keep].to_numpy().astype(np.int64), buy[keep].to_numpy().astype(np.int64), dates[keep]
+
+    # Stock check in log order: a running total per product against what is on hand and not held for open bills
+    available = stock.take('Quantity', positions).astype(np.int64) - reservations.held_units(positions)
+    demand = pd.Series(quantity).groupby(positions).cumsum().to_numpy()
+    overflow = demand > available
+    if overflow.any():
+        short = _sequential_stock_check(positions, quantity, available, overflow)
+        report.reject(rows[keep][short], names[short], "not enough stock")
+        ok = ~short
+        positions, names, quantity, sell, buy, dates = positions[ok], names[ok], quantity[ok], sell[ok], buy[ok], dates[ok]
+
+    # Same totals as the dashboard's sale form: line amounts are unit price x quantity
+    sale_total, buy_total = sell * quantity, buy * quantity
+    sales = {
+        'Date': dates.to_numpy().astype(SALES_SCHEMA['Date']),
+        'Product Name': names.to_numpy(dtype=object),
+        'Quantity Sold': quantity,
+        'Sale Price': sale_total,
+        'Buy Price': buy_total,
+        'Profit': sale_total - buy_total,
+    }
+    return {col: coerce_column(values, SALES_SCHEMA[col]) for col, values in sales.items()}
+
+
+def ingest_chunks(shop, chunks, today=None):
+    """Validates and records sale chunks (raw DataFrames), one vectorized batch per chunk.
+
+    Rows for unknown products, bad quantities, prices or dates, and sales
+    that exceed the stock left after earlier rows (less any units held for
+    open bills), are reported instead of recorded; everything else in a chunk
+    is committed together.
+    """
+    today = today or datetime.date.today()
+    report = ImportReport()
+    first_row = 1
+    for chunk in chunks:
+        # Every product's stripe is held across validation and write so sessions selling concurrently cannot overdraw stock
+        with shop.reservations.locked():
+            sales = _validate_sales_chunk(chunk.reset_index(drop=True), first_row, shop.stock, shop.reservations,
+                                          today, report)
+            if len(sales['Product Name']):
+                shop.record_sales(sales)
+        report.added += len(sales['Product Name'])
+        first_row += len(chunk)
+    return report
+
+
+def ingest_file(shop, source, fmt=None, chunk_rows=INGEST_CHUNK_ROWS, today=None):
+    """Replays a sale log file (CSV, Parquet or JSON Lines) into the shop without holding it in memory."""
+    fmt = fmt or detect_log_format(source)
+    return ingest_chunks(shop, read_sale_chunks(source, fmt, chunk_rows), today)
+
+
+def ingest_records(shop, records, chunk_rows=INGEST_CHUNK_ROWS, today=None):
+    """Ingests an iterable (or stream) of sale dicts keyed by SALE_LOG_COLUMNS, `chunk_rows` at a time."""
+    records = iter(records)
+
+    def chunks():
+        while True:
+            batch = list(itertools.islice(records, chunk_rows))
+            if not batch:
+                return
+            yield pd.DataFrame.from_records(batch)
+
+    return ingest_chunks(shop, chunks(), today)
@@ -0,0 +1,418 @@
+import hashlib
+import os
+import threading
+import unicodedata
+import zipfile
+import zlib
+from io import BytesIO
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+try:
+    import uharfbuzz
+except ImportError:  # optional: without it every character is drawn as its own glyph, unshaped
+    uharfbuzz = None
+
+from schema import to_rupees
+
+# --- PAGE LAYOUT (PDF points, A4) ---
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 50
+LINE_HEIGHT = 14
+TABLE_FONT_SIZE = 9
+# Item rows per page; the first page also carries the header block
+ROWS_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT) - 4
+FIRST_PAGE_ROWS = ROWS_PER_PAGE - 8
+# Right edges of the Qty, Unit Price and Total columns; product names are cut to NAME_WIDTH
+QTY_RIGHT, PRICE_RIGHT, TOTAL_RIGHT = 360, 450, PAGE_WIDTH - MARGIN
+NAME_WIDTH = 250
+
+# --- FONTS ---
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+# Each character is drawn in the first of these fonts that has it: Noto Sans for Latin text and ₹,
+# Shobhika for Devanagari (override with SELLSATHI_INVOICE_FONTS, files separated by os.pathsep).
+INVOICE_FONTS = [os.path.join(FONT_DIR, 'NotoSans-Regular.ttf'), os.path.join(FONT_DIR, 'Shobhika-Regular.otf')]
+# Characters every embedded font subset starts with, so most bills need no new subset
+SEED_TEXT = ''.join(map(chr, range(0x20, 0x7f))) + '₹…'
+# Laid-out strings kept per renderer (product names and amounts repeat across bills)
+LAYOUT_CACHE_SIZE = 20000
+
+MARKDOWN_HEADER = """
+## SellSathi Invoice - {business_name}
+
+**Invoice Date:** {date}
+**Customer Name:** {customer}
+**Business Type:** {business_type}
+
+---
+
+| Product | Quantity | Unit Price (₹) | Total (₹) |
+| :--- | :---: | :---: | :---: |
+"""
+MARKDOWN_ROW = "| {name} | {qty} | {price:.2f} | {total:.2f} |\n"
+MARKDOWN_FOOTER = "\n---\n**GRAND TOTAL: ₹{total:.2f}**\n\n*Thank you for your business!*"
+
+
+def _money(paise):
+    return f"{to_rupees(paise):,.2f}"
+
+
+def invoice_file_name(bill, ext='pdf'):
+    return f"invoice_{bill['date']}_{bill['bill_id']}.{ext}"
+
+
+class InvoiceFont:
+    """A TrueType or OpenType (CFF) font read once per process, measured in 1/1000 em.
+
+    PDF readers only ship fonts for Latin-1, so invoices embed their own: each
+    PDF carries a subset of this font holding the glyphs it draws.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        font = TTFont(BytesIO(self.data), lazy=True)
+        self.cff = 'CFF ' in font
+        scale = 1000 / font['head'].unitsPerEm
+        order = font.getGlyphOrder()
+        ids = {name: gid for gid, name in enumerate(order)}
+        metrics = font['hmtx'].metrics
+        self.widths = [round(metrics[name][0] * scale) for name in order]
+        self.glyphs = {code: ids[name] for code, name in font.getBestCmap().items()}
+        head, os2 = font['head'], font['OS/2']
+        self.bbox = ' '.join(str(round(v * scale)) for v in (head.xMin, head.yMin, head.xMax, head.yMax))
+        self.ascent = round(os2.sTypoAscender * scale)
+        self.descent = round(os2.sTypoDescender * scale)
+        self.cap_height = round(getattr(os2, 'sCapHeight', os2.sTypoAscender) * scale)
+        self.name = font['name'].getDebugName(6) or os.path.splitext(os.path.basename(path))[0]
+        self.scale = scale
+        self._shaper = uharfbuzz.Font(uharfbuzz.Face(self.data)) if uharfbuzz else None
+
+    def shape(self, text):
+        """(glyph id, advance, x offset, y offset, text) per glyph; `text` is what the glyph stands for, often ''.
+
+        A glyph stands for the character it is the nominal glyph of; characters
+        of a cluster drawn by no nominal glyph (conjuncts, ligatures) go to the
+        cluster's first other glyph.
+        """
+        if self._shaper is None:
+            gids = [self.glyphs.get(ord(char), 0) for char in text]
+            return [(gid, self.widths[gid], 0, 0, char) for gid, char in zip(gids, text)]
+        buffer = uharfbuzz.Buffer()
+        buffer.add_str(text)
+        buffer.guess_segment_properties()
+        uharfbuzz.shape(self._shaper, buffer, {})
+        infos, positions = buffer.glyph_infos, buffer.glyph_positions
+        starts = sorted({info.cluster for info in infos}) + [len(text)]
+        ends = dict(zip(starts, starts[1:]))
+        texts = [''] * len(infos)
+        first = 0
+        while first < len(infos):
+            cluster = infos[first].cluster
+            last = first
+            while last < len(infos) and infos[last].cluster == cluster:
+                last += 1
+            left = list(text[cluster:ends[cluster]])
+            for i in range(first, last):
+                for char in left:
+                    if self.glyphs.get(ord(char)) == infos[i].codepoint:
+                        texts[i] = char
+                        left.remove(char)
+                        break
+            if left:
+                spare = next((i for i in range(first, last) if not texts[i]), first)
+                texts[spare] += ''.join(left)
+            first = last
+        return [(info.codepoint, round(position.x_advance * self.scale), round(position.x_offset * self.scale),
+                 round(position.y_offset * self.scale), chars)
+                for info, position, chars in zip(infos, positions, texts)]
+
+    def embed(self, gids, unicode):
+        """The font objects' variable parts for a subset holding `gids` ({gid: text} maps them back to text)."""
+        gids = sorted(gids | {0})
+        font = TTFont(BytesIO(self.data))
+        options = subset.Options()
+        options.retain_gids = True  # content streams use the full font's glyph ids
+        options.notdef_outline = True
+        options.hinting = False
+        options.layout_features = []
+        options.drop_tables += ['TTFA']
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=gids)
+        subsetter.subset(font)
+        out = BytesIO()
+        font.save(out)
+        program = out.getvalue()
+        tag = ''.join(chr(65 + b % 26) for b in hashlib.sha1(repr(gids).encode('ascii')).digest()[:6])
+        return {
+            'name': f"{tag}+{self.name}",
+            'widths': ' '.join(f"{gid} [{self.widths[gid]}]" for gid in gids),
+            'program': zlib.compress(program),
+            'length': len(program),
+            'to_unicode': zlib.compress(_to_unicode_cmap(unicode, gids).encode('ascii')),
+        }
+
+    def pdf_objects(self, number, embedded):
+        """The Type0 font, CID font, descriptor, font program and ToUnicode objects, numbered from `number`."""
+        name = embedded['name']
+        if self.cff:
+            kind, file_key, file_entries = 'CIDFontType0', 'FontFile3', " /Subtype /OpenType"
+        else:
+            kind, file_key, file_entries = 'CIDFontType2', 'FontFile2', f" /Length1 {embedded['length']}"
+        return [
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{name} /Encoding /Identity-H "
+            f"/DescendantFonts [{number + 1} 0 R] /ToUnicode {number + 4} 0 R >>".encode('ascii'),
+            f"<< /Type /Font /Subtype /{kind} /BaseFont /{name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {number + 2} 0 R /DW 0 /W [{embedded['widths']}]"
+            f"{'' if self.cff else ' /CIDToGIDMap /Identity'} >>".encode('ascii'),
+            f"<< /Type /FontDescriptor /FontName /{name} /Flags 4 /FontBBox [{self.bbox}] /ItalicAngle 0 "
+            f"/Ascent {self.ascent} /Descent {self.descent} /CapHeight {self.cap_height} /StemV 80 "
+            f"/{file_key} {number + 3} 0 R >>".encode('ascii'),
+            _stream(embedded['program'], f" /Filter /FlateDecode{file_entries}"),
+            _stream(embedded['to_unicode'], " /Filter /FlateDecode"),
+        ]
+
+
+def _to_unicode_cmap(unicode, gids):
+    """A ToUnicode CMap mapping each glyph id that starts a cluster back to the cluster's text."""
+    entries = [f"<{gid:04X}> <{unicode[gid].encode('utf-16-be').hex().upper()}>" for gid in gids if unicode.get(gid)]
+    blocks = [f"{len(chunk)} beginbfchar\n" + '\n'.join(chunk) + "\nendbfchar"
+              for chunk in (entries[i:i + 100] for i in range(0, len(entries), 100))]
+    return ("/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+            "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+            + '\n'.join(blocks) + "\nendcmap\nCMapName currentdict /CMapResource defineresource pop\nend\nend\n")
+
+
+class InvoiceRenderer:
+    """Renders saved bills as Markdown (for the page) or as PDF documents.
+
+    The PDF writer is a small built-in one: with per-document font subsetting,
+    the PDF libraries tried render tens of invoices per second, not hundreds.
+    Text is laid out with embedded Unicode fonts (INVOICE_FONTS), shaped by
+    HarfBuzz when `uharfbuzz` is installed. Laid-out strings are cached, and
+    each font's subset is grown only when a bill draws a glyph it lacks, so
+    rendering a bill is mostly string joins.
+    """
+
+    def __init__(self, business_name, business_type=None, fonts=None):
+        self.business_name = business_name
+        self.business_type = business_type or '-'
+        self.fonts = shared_invoice_fonts() if fonts is None else fonts
+        self._layouts = {}
+        self._unicode = [{} for _ in self.fonts]  # per font: glyph id -> text it starts
+        self._embedded = {}  # font index -> (glyph ids, embed() result)
+        self._seed = [set() for _ in self.fonts]
+        for index, gids in self._layout(SEED_TEXT, 10)[2]:
+            self._seed[index] |= gids
+
+    # --- MARKDOWN ---
+
+    def markdown(self, bill):
+        parts = [MARKDOWN_HEADER.format(business_name=self.business_name, date=bill['date'],
+                                        customer=bill['customer'], business_type=self.business_type)]
+        parts.extend(MARKDOWN_ROW.format(name=item['name'], qty=item['qty'], price=to_rupees(item['price']),
+                                         total=to_rupees(item['total'])) for item in bill['items'])
+        parts.append(MARKDOWN_FOOTER.format(total=to_rupees(bill['total'])))
+        return ''.join(parts)
+
+    # --- TEXT LAYOUT ---
+
+    def _font_index(self, char):
+        code = ord(char)
+        for index, font in enumerate(self.fonts):
+            if code in font.glyphs:
+                return index
+        return 0
+
+    def _runs(self, text):
+        """Splits text into [font index, text] runs; marks, spaces and joiners stay in the current run."""
+        runs = []
+        for char in text:
+            if runs and (unicodedata.category(char)[0] in 'MZ' or char in '\u200c\u200d'):
+                index = runs[-1][0]
+            else:
+                index = self._font_index(char)
+            if runs and runs[-1][0] == index:
+                runs[-1][1] += char
+            else:
+                runs.append([index, char])
+        return runs
+
+    def _layout(self, text, size):
+        """(width in points, text-showing operators, [(font index, glyph ids)]) for `text`, cached."""
+        key = (text, size)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            return layout
+        width, ops, uses = 0, [], []
+        for index, run in self._runs(text):
+            font, unicode, gids = self.fonts[index], self._unicode[index], set()
+            parts, carry = ['['], 0
+            for gid, advance, dx, dy, chars in font.shape(run):
+                if carry - dx:
+                    parts.append(str(carry - dx))
+                if dy:
+                    parts.append(f"] TJ {dy * size / 1000:.2f} Ts [<{gid:04X}>] TJ 0 Ts [")
+                else:
+                    parts.append(f"<{gid:04X}>")
+                # TJ moves by the glyph's /W width; the difference makes up the shaped advance
+                carry = font.widths[gid] - advance + dx
+                width += advance
+                gids.add(gid)
+                if chars:
+                    unicode.setdefault(gid, chars)
+            parts.append(']')
+            ops.append(f"/F{index + 1} {size} Tf {' '.join(parts)} TJ")
+            uses.append((index, gids))
+        if len(self._layouts) >= LAYOUT_CACHE_SIZE:
+            self._layouts.clear()
+        layout = self._layouts[key] = (width * size / 1000, ' '.join(ops), uses)
+        return layout
+
+    def _fit(self, text, size, max_width):
+        """The layout of `text`, cut short with '…' if it is wider than `max_width`."""
+        layout = self._layout(text, size)
+        cut = len(text)
+        while layout[0] > max_width and cut > 0:
+            cut -= 1
+            layout = self._layout(text[:cut].rstrip() + '…', size)
+        return layout
+
+    def _draw(self, ops, used, text, x, y, size, right=False, max_width=None):
+        width, text_ops, uses = self._fit(text, size, max_width) if max_width else self._layout(text, size)
+        ops.append(f"1 0 0 1 {x - width if right else x:.2f} {y:.2f} Tm {text_ops}")
+        for index, gids in uses:
+            used.setdefault(index, set()).update(gids)
+
+    # --- PDF ---
+
+    def _header(self, ops, used, bill):
+        top = PAGE_HEIGHT - MARGIN
+        self._draw(ops, used, 'SellSathi Invoice - ' + self.business_name, MARGIN, top, 16)
+        for line, text in enumerate((f"Invoice No: {bill['bill_id']}", f"Invoice Date: {bill['date']}",
+                                     f"Customer Name: {bill['customer']}", f"Business Type: {self.business_type}")):
+            self._draw(ops, used, text, MARGIN, top - (2 + line) * LINE_HEIGHT, 10)
+        return top - 7 * LINE_HEIGHT
+
+    def _table(self, ops, lines, used, items, top, total=None):
+        size = TABLE_FONT_SIZE
+        self._draw(ops, used, 'Product', MARGIN, top, size)
+        self._draw(ops, used, 'Qty', QTY_RIGHT, top, size, right=True)
+        self._draw(ops, used, 'Unit Price (₹)', PRICE_RIGHT, top, size, right=True)
+        self._draw(ops, used, 'Total (₹)', TOTAL_RIGHT, top, size, right=True)
+        lines.append(f"{MARGIN} {top - 5} m {TOTAL_RIGHT} {top - 5} l S")
+        y = top - 1.5 * LINE_HEIGHT
+        for item in items:
+            self._draw(ops, used, item['name'], MARGIN, y, size, max_width=NAME_WIDTH)
+            self._draw(ops, used, str(item['qty']), QTY_RIGHT, y, size, right=True)
+            self._draw(ops, used, _money(item['price']), PRICE_RIGHT, y, size, right=True)
+            self._draw(ops, used, _money(item['total']), TOTAL_RIGHT, y, size, right=True)
+            y -= LINE_HEIGHT
+        if total is not None:
+            lines.append(f"{MARGIN} {y + LINE_HEIGHT - 5} m {TOTAL_RIGHT} {y + LINE_HEIGHT - 5} l S")
+            self._draw(ops, used, f"GRAND TOTAL: ₹{_money(total)}", TOTAL_RIGHT, y - 0.5 * LINE_HEIGHT, 11, right=True)
+            self._draw(ops, used, 'Thank you for your business!', MARGIN, y - 2 * LINE_HEIGHT, 10)
+
+    def _font_objects(self, used):
+        """(resource name, font, embedded subset) for each font drawn; a font's subset grows when a bill needs new glyphs."""
+        fonts = []
+        for index in sorted(used):
+            gids = used[index]
+            cached = self._embedded.get(index)
+            if cached is None or not gids <= cached[0]:
+                gids = gids | (cached[0] if cached else self._seed[index])
+                cached = self._embedded[index] = (gids, self.fonts[index].embed(gids, self._unicode[index]))
+            fonts.append((f"F{index + 1}", self.fonts[index], cached[1]))
+        return fonts
+
+    def pdf(self, bill):
+        """Returns the invoice for `bill` (header fields plus `items`, amounts in paise) as PDF bytes."""
+        items, pages, used = bill['items'], [], {}
+        first, rest = items[:FIRST_PAGE_ROWS], items[FIRST_PAGE_ROWS:]
+        ops, lines = [], []
+        top = self._header(ops, used, bill)
+        self._table(ops, lines, used, first, top, None if rest else bill['total'])
+        pages.append((ops, lines))
+        while rest:
+            chunk, rest = rest[:ROWS_PER_PAGE], rest[ROWS_PER_PAGE:]
+            ops, lines = [], []
+            self._table(ops, lines, used, chunk, PAGE_HEIGHT - MARGIN, None if rest else bill['total'])
+            pages.append((ops, lines))
+        streams = ["BT\n" + '\n'.join(ops) + "\nET\n0.5 w\n" + '\n'.join(lines) for ops, lines in pages]
+        return write_pdf(streams, self._font_objects(used))
+
+
+def _stream(data, entries=''):
+    return b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(data), entries.encode('ascii'), data)
+
+
+def write_pdf(page_streams, fonts):
+    """Assembles a PDF from one content stream per page and (resource name, InvoiceFont, embedded subset) fonts."""
+    count = len(page_streams)
+    first_page = 3 + 5 * len(fonts)
+    kids = ' '.join(f"{first_page + 2 * i} 0 R" for i in range(count))
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {count} >>".encode('ascii')]
+    resources = []
+    for i, (resource, font, embedded) in enumerate(fonts):
+        resources.append(f"/{resource} {3 + 5 * i} 0 R")
+        objects.extend(font.pdf_objects(3 + 5 * i, embedded))
+    resources = ' '.join(resources)
+    for i, stream in enumerate(page_streams):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                       f"/Resources << /Font << {resources} >> >> /Contents {first_page + 2 * i + 1} 0 R >>".encode('ascii'))
+        objects.append(_stream(stream.encode('ascii')))
+
+    out = bytearray(b"%PDF-1.6\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('ascii')
+    out += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('ascii')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('ascii')
+    return bytes(out)
+
+
+def invoice_fonts_from_env():
+    """Reads the fonts listed in SELLSATHI_INVOICE_FONTS (os.pathsep-separated), or INVOICE_FONTS."""
+    paths = os.environ.get('SELLSATHI_INVOICE_FONTS')
+    return [InvoiceFont(path) for path in (paths.split(os.pathsep) if paths else INVOICE_FONTS)]
+
+
+_shared_fonts = None
+_shared_fonts_lock = threading.Lock()
+
+
+def shared_invoice_fonts():
+    """The process-wide invoice fonts, read on first use."""
+    global _shared_fonts
+    with _shared_fonts_lock:
+        if _shared_fonts is None:
+            _shared_fonts = invoice_fonts_from_env()
+        return _shared_fonts
+
+
+# Invoices written between progress reports during a batch export.
+PROGRESS_EVERY = 100
+
+
+def export_invoices_zip(shop, renderer, dest, start=None, end=None, progress=None):
+    """Streams one PDF per bill dated within [start, end] into a ZIP at `dest`; returns the count.
+
+    Bills are read and rendered one at a time, so memory does not grow with
+    the number of invoices. `progress(invoices written)` is called every
+    PROGRESS_EVERY invoices.
+    """
+    count = 0
+    with zipfile.ZipFile(dest, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for bill in shop.storage.iter_bills(start, end):
+            archive.writestr(invoice_file_name(bill), renderer.pdf(bill))
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+    return count
@@ -0,0 +1,178 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+# Jobs allowed to wait for a worker; submitting beyond this is refused rather than queued without bound.
+DEFAULT_QUEUE = 8
+# Finished jobs kept for their sessions to pick up; the oldest are forgotten (and their files removed) first.
+MAX_FINISHED = 64
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by `Job.update` once the job has been cancelled."""
+
+
+class Job:
+    """One background task: its state, progress, and result or error.
+
+    The task receives its Job and reports through `update`, which is also
+    where cancellation takes effect, so a task stops at its next progress
+    report. Files listed in `files` are removed when the job is forgotten.
+    """
+
+    def __init__(self, job_id, label, owner=None):
+        self.id = job_id
+        self.label = label
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = 'Waiting to start'
+        self.result = None
+        self.error = None
+        self.files = []
+        self.submitted = time.time()
+        self.finished_at = None
+        self.forgotten = False
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Asks the job to stop; a queued job never starts, a running one stops at its next `update`."""
+        self._cancel.set()
+
+    def update(self, done=None, total=None, message=None):
+        """Reports progress (`done` of `total`, if known). Raises JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        if done is not None and total:
+            self.progress = min(1.0, done / total)
+        if message is not None:
+            self.message = message
+
+
+class JobExecutor:
+    """Bounded pool of worker threads for long exports, PDF batches and aggregate rebuilds.
+
+    Threads (rather than processes) are used because jobs work on the shared
+    in-memory shops; the heavy parts (SQLite reads, zlib, pandas) release the
+    GIL for much of their time. At most `workers` jobs run at once and
+    `queue` more may wait, so a burst of clicks cannot pile up unbounded work.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue=DEFAULT_QUEUE):
+        self.workers = workers
+        self.queue = queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sellsathi-job')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, label, func, *args, owner=None, **kwargs):
+        """Runs `func(job, *args, **kwargs)` in the background and returns its Job at once.
+
+        The function's return value becomes `job.result`. Raises RuntimeError
+        if the executor is already full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RuntimeError("Too many background jobs are running; try again when one finishes.")
+        with self._lock:
+            job = Job(next(self._ids), label, owner)
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        try:
+            if job.cancelled:
+                job.status = CANCELLED
+                return
+            job.status = RUNNING
+            job.message = 'Running'
+            job.result = func(job, *args, **kwargs)
+            job.progress = 1.0
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._slots.release()
+            self._prune()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        """Jobs (optionally only `owner`'s), oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def forget(self, job_id):
+        """Cancels the job if it is still going and drops it; finished jobs' files are removed."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.cancel()
+            job.forgotten = True
+            if not job.finished:
+                return  # removed by _prune once it stops
+            del self._jobs[job_id]
+        _remove_files(job)
+
+    def _prune(self):
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.finished]
+            stale = [job for job in finished if job.forgotten] + finished[:max(0, len(finished) - MAX_FINISHED)]
+            stale = [self._jobs.pop(job.id) for job in stale if job.id in self._jobs]
+        for job in stale:
+            _remove_files(job)
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._pool.shutdown(wait=True)
+
+
+def _remove_files(job):
+    for path in job.files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def executor_from_env():
+    """Builds an executor sized by SELLSATHI_JOB_WORKERS and SELLSATHI_JOB_QUEUE, if set."""
+    return JobExecutor(int(os.environ.get('SELLSATHI_JOB_WORKERS', DEFAULT_WORKERS)),
+                       int(os.environ.get('SELLSATHI_JOB_QUEUE', DEFAULT_QUEUE)))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_executor():
+    """The process-wide executor, built from the environment on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = executor_from_env()
+        return _shared
@@ -0,0 +1,563 @@
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from schema import day_keys, to_days
+from storage import TOTAL_COLUMNS, MemoryStorage, business_slug
+
+# Events between snapshots (override with SELLSATHI_SNAPSHOT_EVENTS). A cold start
+# replays at most about this many events on top of the latest snapshot.
+DEFAULT_SNAPSHOT_EVENTS = 1000
+# Complete snapshots kept on disk; older ones are deleted once a newer one is written,
+# along with the journal segments the oldest kept snapshot already covers, unless
+# the full history is kept for audits (SELLSATHI_JOURNAL_KEEP_HISTORY=1).
+KEEP_SNAPSHOTS = 2
+SNAPSHOT_VERSION = 1
+
+# Totals kept with each snapshot: (key columns, summed columns). Product names are
+# sales category codes, which never change once assigned.
+TOTALS = {
+    'daily_totals': (['Date'], TOTAL_COLUMNS),
+    'product_totals': (['Date', 'Product Name'], ['Quantity Sold', 'Sale Price', 'Profit']),
+}
+
+# --- EVENT FORMAT ---
+# Each record is a header (event type, payload length, CRC-32 of the payload,
+# wall-clock time) followed by the payload. Products are referred to by their
+# stock row position, which never changes once a product is added.
+
+PRODUCTS, SALES, BILL = 1, 2, 3
+EVENT_NAMES = {PRODUCTS: 'products', SALES: 'sales', BILL: 'bill'}
+
+RECORD_HEADER = struct.Struct('<BIId')
+COUNT = struct.Struct('<I')
+BILL_HEADER = struct.Struct('<qiqII')  # bill id, day, total, item count, sale row count
+
+PRODUCT_ROW = np.dtype([('buy', '<i8'), ('sell', '<i8'), ('quantity', '<i4'), ('sold', '<i8')])
+SALE_ROW = np.dtype([('day', '<i4'), ('product', '<i4'), ('quantity', '<i4'),
+                     ('sale', '<i8'), ('buy', '<i8'), ('profit', '<i8')])
+ITEM_ROW = np.dtype([('product', '<i4'), ('qty', '<i4'), ('price', '<i8'), ('total', '<i8')])
+
+
+def encode_products(products):
+    names = [str(name).encode('utf-8') for name in products['Product Name']]
+    rows = np.empty(len(names), PRODUCT_ROW)
+    rows['buy'] = products['Buy Price']
+    rows['sell'] = products['Sell Price']
+    rows['quantity'] = products['Quantity']
+    rows['sold'] = products['Sales Count']
+    lengths = np.fromiter(map(len, names), dtype='<i4', count=len(names))
+    return COUNT.pack(len(names)) + rows.tobytes() + lengths.tobytes() + b''.join(names)
+
+
+def decode_products(payload):
+    count = COUNT.unpack_from(payload)[0]
+    offset = COUNT.size
+    rows = np.frombuffer(payload, PRODUCT_ROW, count, offset)
+    offset += rows.nbytes
+    lengths = np.frombuffer(payload, '<i4', count, offset)
+    offset += lengths.nbytes
+    ends = offset + np.cumsum(lengths)
+    names = [payload[end - length:end].decode('utf-8') for end, length in zip(ends.tolist(), lengths.tolist())]
+    return {'Product Name': np.array(names, dtype=object), 'Buy Price': rows['buy'], 'Sell Price': rows['sell'],
+            'Quantity': rows['quantity'], 'Sales Count': rows['sold']}
+
+
+def _sale_rows(sales, stock):
+    rows = np.empty(len(sales['Product Name']), SALE_ROW)
+    rows['day'] = to_days(sales['Date']).astype(np.int64)
+    rows['product'] = stock.positions(sales['Product Name'])
+    rows['quantity'] = sales['Quantity Sold']
+    rows['sale'] = sales['Sale Price']
+    rows['buy'] = sales['Buy Price']
+    rows['profit'] = sales['Profit']
+    return rows
+
+
+def _sales_from_rows(rows, stock):
+    """(sale columns, stock position per row) of decoded sale rows."""
+    positions = rows['product'].astype(np.int64)
+    return {'Date': rows['day'].astype(np.int64).astype('datetime64[D]'),
+            'Product Name': stock.take('Product Name', positions), 'Quantity Sold': rows['quantity'],
+            'Sale Price': rows['sale'], 'Buy Price': rows['buy'], 'Profit': rows['profit']}, positions
+
+
+def encode_sales(sales, stock):
+    return _sale_rows(sales, stock).tobytes()
+
+
+def decode_sales(payload, stock):
+    return _sales_from_rows(np.frombuffer(payload, SALE_ROW), stock)
+
+
+def encode_bill(bill_record, sales, stock):
+    items = bill_record['items']
+    item_rows = np.empty(len(items), ITEM_ROW)
+    item_rows['product'] = stock.positions([item['name'] for item in items])
+    item_rows['qty'] = [item['qty'] for item in items]
+    item_rows['price'] = [item['price'] for item in items]
+    item_rows['total'] = [item['total'] for item in items]
+    sale_rows = _sale_rows(sales, stock)
+    header = BILL_HEADER.pack(int(bill_record['bill_id']), int(to_days([bill_record['date']]).astype(np.int64)[0]),
+                              int(bill_record['total']), len(item_rows), len(sale_rows))
+    return header + item_rows.tobytes() + sale_rows.tobytes() + str(bill_record['customer']).encode('utf-8')
+
+
+def decode_bill(payload, stock):
+    """(bill record, sale columns, stock position per sale row) of a bill event."""
+    bill_id, day, total, item_count, sale_count = BILL_HEADER.unpack_from(payload)
+    offset = BILL_HEADER.size
+    item_rows = np.frombuffer(payload, ITEM_ROW, item_count, offset)
+    offset += item_rows.nbytes
+    sale_rows = np.frombuffer(payload, SALE_ROW, sale_count, offset)
+    offset += sale_rows.nbytes
+    names = stock.take('Product Name', item_rows['product'].astype(np.int64))
+    bill_record = {
+        'bill_id': bill_id,
+        'date': str(day_keys(np.array([day], dtype='datetime64[D]'))[0]),
+        'customer': payload[offset:].decode('utf-8'),
+        'total': total,
+        'items': [{'name': name, 'qty': qty, 'price': price, 'total': line_total} for name, qty, price, line_total in zip(
+            names, item_rows['qty'].tolist(), item_rows['price'].tolist(), item_rows['total'].tolist())],
+    }
+    return (bill_record,) + _sales_from_rows(sale_rows, stock)
+
+
+def apply_event(storage, kind, payload):
+    """Applies one journal event to a MemoryStorage's stock, sales and bills (no validation, nothing logged)."""
+    if kind == PRODUCTS:
+        storage.stock.extend(decode_products(payload))
+        return
+    if kind == SALES:
+        sales, positions = decode_sales(payload, storage.stock)
+    elif kind == BILL:
+        bill_record, sales, positions = decode_bill(payload, storage.stock)
+        storage.bills.add(bill_record)
+    else:
+        raise ValueError(f"Unknown journal event type {kind}.")
+    storage.sales.extend(sales)
+    unique, inverse = np.unique(positions, return_inverse=True)
+    storage._apply_stock_updates(unique, np.bincount(inverse, weights=sales['Quantity Sold']).astype(np.int64))
+
+
+def describe_event(kind, payload):
+    """A one-line summary of an event, for audits."""
+    if kind == PRODUCTS:
+        return f"{COUNT.unpack_from(payload)[0]} product(s) added"
+    if kind == SALES:
+        return f"{len(payload) // SALE_ROW.itemsize} sale row(s)"
+    bill_id, day, total, item_count, _ = BILL_HEADER.unpack_from(payload)
+    return f"bill {bill_id} ({item_count} item(s), {total} paise)"
+
+
+# --- SEGMENTS ---
+# The journal is split into segment files named after the sequence number of
+# their first event; a new segment starts at every snapshot. Segments are never
+# rewritten; whole segments older than the oldest kept snapshot are deleted
+# unless the complete history is kept for audits.
+
+def segment_path(directory, first_seq):
+    return os.path.join(directory, f"events-{first_seq:012d}.log")
+
+
+def list_segments(directory):
+    """[(first event sequence number, path)] in order."""
+    names = sorted(name for name in os.listdir(directory) if name.startswith('events-') and name.endswith('.log'))
+    return [(int(name[7:-4]), os.path.join(directory, name)) for name in names]
+
+
+def prune_segments(directory, seq):
+    """Deletes the segments whose events all come before event `seq`; returns how many were deleted."""
+    segments = list_segments(directory)
+    covered = [path for (_, path), (following, _) in zip(segments, segments[1:]) if following <= seq]
+    for path in covered:
+        os.remove(path)
+    return len(covered)
+
+
+def read_records(path):
+    """Yields (end offset, time, event type, payload) for each intact record of a segment.
+
+    Reading stops at the first truncated or corrupt record: a write that was
+    cut short by a crash is never applied.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, length, crc, when = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset = start + length
+        yield offset, when, kind, payload
+
+
+def read_events(directory, start=0):
+    """Yields (sequence number, time, event type, payload) for every event from `start` on."""
+    segments = list_segments(directory)
+    first = max([i for i, (seq, _) in enumerate(segments) if seq <= start], default=0)
+    for seq, path in segments[first:]:
+        for _, when, kind, payload in read_records(path):
+            if seq >= start:
+                yield seq, when, kind, payload
+            seq += 1
+
+
+# --- SNAPSHOTS ---
+# A snapshot is a directory of .npy column files (loaded memory-mapped) plus
+# meta.json, holding the state after its first `seq` events: stock, sales,
+# bills, and the per-day and per-(day, product) totals the aggregates are built from.
+
+def snapshot_path(directory, seq):
+    return os.path.join(directory, f"snapshot-{seq:012d}")
+
+
+def list_snapshots(directory):
+    """Metadata of the complete snapshots, oldest first (each with its `path`)."""
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('snapshot-') and not name.endswith('.tmp') and os.path.exists(os.path.join(path, 'meta.json')):
+            with open(os.path.join(path, 'meta.json')) as f:
+                snapshots.append(dict(json.load(f), path=path))
+    return snapshots
+
+
+def _file_name(table, col, suffix=''):
+    return f"{table}.{col.lower().replace(' ', '_')}{suffix}.npy"
+
+
+def _table_arrays(table, ledger):
+    """{file name: array} of a ledger's columns (codes plus category values); text is saved as fixed-width unicode."""
+    arrays = {}
+    for col in ledger.columns:
+        codes = ledger.codes(col)
+        arrays[_file_name(table, col)] = codes.astype(str) if codes.dtype == object else codes
+        if col in ledger.categories:
+            arrays[_file_name(table, col, '.values')] = np.array(ledger.categories[col].values, dtype=str)
+    return arrays
+
+
+def capture(storage, seq, when, totals=None):
+    """The arrays and metadata of a snapshot of `storage` (copied, so writes may continue while it is saved).
+
+    `totals` are {table: {column: array}} per TOTALS, saved as they are.
+    """
+    arrays = _table_arrays('stock', storage.stock)
+    arrays.update(_table_arrays('sales', storage.sales))
+    arrays.update(_table_arrays('bills', storage.bills.headers))
+    arrays.update(_table_arrays('bill_items', storage.bills.items))
+    for table, columns in (totals or {}).items():
+        arrays.update({_file_name(table, col): values for col, values in columns.items()})
+    meta = {'version': SNAPSHOT_VERSION, 'seq': seq, 'time': when, 'created': time.time(),
+            'stock': len(storage.stock), 'sales': len(storage.sales), 'bills': len(storage.bills)}
+    return arrays, meta
+
+
+def write_snapshot(directory, arrays, meta, fsync=False, keep_history=False):
+    """Writes a snapshot under a temporary name, renames it into place, then drops the oldest ones
+    and, unless `keep_history`, the journal segments the oldest kept one covers."""
+    path = snapshot_path(directory, meta['seq'])
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, values in arrays.items():
+        with open(os.path.join(tmp, name), 'wb') as f:
+            np.save(f, values, allow_pickle=False)
+            if fsync:
+                os.fsync(f.fileno())
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+    for snapshot in list_snapshots(directory)[:-KEEP_SNAPSHOTS]:
+        shutil.rmtree(snapshot['path'], ignore_errors=True)
+    if not keep_history:
+        prune_segments(directory, list_snapshots(directory)[0]['seq'])
+
+
+def _load_array(path, rows, dtype):
+    # Empty files cannot be memory-mapped; text columns are copied into object arrays
+    values = np.load(path, mmap_mode='r' if rows else None, allow_pickle=False)
+    return values.astype(object) if dtype is object else values
+
+
+def _load_table(path, table, ledger, rows):
+    codes = {col: _load_array(os.path.join(path, _file_name(table, col)), rows, ledger.schema[col]) for col in ledger.columns}
+    categories = {col: np.load(os.path.join(path, _file_name(table, col, '.values'))).tolist() for col in ledger.categories}
+    return codes, categories
+
+
+def _load_totals(path):
+    return {table: {col: np.load(os.path.join(path, _file_name(table, col))) for col in keys + list(columns)}
+            for table, (keys, columns) in TOTALS.items()}
+
+
+def load_snapshot(storage, snapshot):
+    """Loads a snapshot into an empty MemoryStorage; sales and bills stay memory-mapped until read."""
+    path = snapshot['path']
+    stock, _ = _load_table(path, 'stock', storage.stock, snapshot['stock'])
+    storage.stock.extend(stock)
+    storage.sales.load(*_load_table(path, 'sales', storage.sales, snapshot['sales']))
+    headers, _ = _load_table(path, 'bills', storage.bills.headers, snapshot['bills'])
+    items, item_categories = _load_table(path, 'bill_items', storage.bills.items, snapshot['bills'])
+    storage.bills.load(headers, items, item_categories)
+    return snapshot['seq']
+
+
+def state_at(directory, seq=None, until=None):
+    """Rebuilds a business as it was after its first `seq` events, or at wall-clock time `until`.
+
+    Starts from the newest snapshot at or before that point and replays the
+    journal from there. Returns (MemoryStorage, number of events applied).
+    Raises ValueError if the events needed were pruned (see write_snapshot).
+    """
+    storage = MemoryStorage()
+    kept = list_snapshots(directory)
+    snapshots = [snapshot for snapshot in kept
+                 if (seq is None or snapshot['seq'] <= seq) and (until is None or snapshot['time'] <= until)]
+    applied = load_snapshot(storage, snapshots[-1]) if snapshots else 0
+    segments = list_segments(directory)
+    if segments and segments[0][0] > applied:
+        raise ValueError(f"The journal in {directory} no longer holds events before {segments[0][0]}; the earliest "
+                         f"state it can rebuild is after {kept[0]['seq'] if kept else segments[0][0]} events "
+                         f"(set SELLSATHI_JOURNAL_KEEP_HISTORY=1 to keep the full history).")
+    for event_seq, when, kind, payload in read_events(directory, applied):
+        if (seq is not None and event_seq >= seq) or (until is not None and when > until):
+            break
+        apply_event(storage, kind, payload)
+        applied = event_seq + 1
+    return storage, applied
+
+
+class JournalStorage(MemoryStorage):
+    """Durable backend that keeps everything in memory and logs every write as a binary event.
+
+    Each product batch, sale batch and finalized bill is appended to the
+    journal before it is applied (and cut off again if applying fails), so the
+    in-memory state can always be rebuilt by replaying it. Every
+    `snapshot_events` events the state is captured and written in the
+    background as memory-mapped column files, and the journal continues in a
+    new segment. Opening loads the newest snapshot (sales and
+    bills are paged in from disk only when read) and replays only the events
+    after it, so start-up time does not grow with the length of the history.
+    The per-day totals the shop's aggregates start from are part of the
+    snapshot, so they are not recomputed from every sale either. Segments the
+    oldest kept snapshot covers are deleted unless `keep_history` is set.
+    """
+
+    durable = True
+
+    def __init__(self, directory, snapshot_events=DEFAULT_SNAPSHOT_EVENTS, fsync=False, keep_history=False):
+        super().__init__()
+        self.directory = directory
+        self.snapshot_events = snapshot_events
+        self.fsync = fsync
+        self.keep_history = keep_history
+        self.snapshot_error = None
+        self._snapshot_thread = None
+        os.makedirs(directory, exist_ok=True)
+        snapshots = list_snapshots(directory)
+        self.seq = self._snapshot_seq = load_snapshot(self, snapshots[-1]) if snapshots else 0
+        self.last_event_time = snapshots[-1]['time'] if snapshots else None
+        # Totals of the sales up to row `_base_rows`; totals are read as these plus the sales after them
+        self._base_rows = len(self.sales)
+        self._base = _load_totals(snapshots[-1]['path']) if snapshots else None
+        self._open_journal()
+
+    def _open_journal(self):
+        """Replays the events after the loaded snapshot and opens the last segment for appending."""
+        segments = list_segments(self.directory)
+        segments = segments[max([i for i, (first, _) in enumerate(segments) if first <= self.seq], default=0):]
+        end = 0
+        for first, path in segments:
+            if first > self.seq:
+                raise ValueError(f"Journal in {self.directory} is missing events {self.seq} to {first - 1}.")
+            seq, end = first, 0
+            for end, when, kind, payload in read_records(path):
+                if seq >= self.seq:
+                    apply_event(self, kind, payload)
+                    self.seq, self.last_event_time = seq + 1, when
+                seq += 1
+        if segments:
+            self._segment = segments[-1][0]
+            self._file = open(segments[-1][1], 'ab')
+            self._file.truncate(end)  # drops a record cut short by a crash
+        else:
+            self._segment = self.seq
+            self._file = open(segment_path(self.directory, self.seq), 'ab')
+
+    def _append(self, kind, payload):
+        offset = self._file.tell()
+        when = time.time()
+        try:
+            self._file.write(RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload), when) + payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception:
+            self._file.truncate(offset)
+            raise
+        self.seq, self.last_event_time = self.seq + 1, when
+
+    @contextmanager
+    def _applying(self):
+        """Cuts the event logged inside the block off the journal again if applying it raises,
+        so a restart does not replay a write that never took effect."""
+        offset, seq, when = self._file.tell(), self.seq, self.last_event_time
+        try:
+            yield
+        except Exception:
+            if self.seq != seq:
+                self._file.truncate(offset)
+                self.seq, self.last_event_time = seq, when
+            raise
+
+    # --- Writes ---
+    # Events are encoded (which coerces every value) and validated before they
+    # are appended; applying them in memory comes last.
+
+    def add_products(self, products):
+        with self._applying():
+            start = super().add_products(products)
+        self._maybe_snapshot()
+        return start
+
+    def record_sales(self, sales):
+        with self._applying():
+            super().record_sales(sales)
+        self._maybe_snapshot()
+
+    def save_bill(self, bill_record, sales):
+        with self._applying():
+            super().save_bill(bill_record, sales)
+        self._maybe_snapshot()
+
+    def _write_products(self, products):
+        self._append(PRODUCTS, encode_products(products))
+
+    def _write_sales(self, sales, positions, totals):
+        self._append(SALES, encode_sales(sales, self.stock))
+        super()._write_sales(sales, positions, totals)
+
+    def _write_bill(self, bill_record, sales, positions, totals):
+        # The ID is settled before the event is logged, so replaying it cannot fail
+        next_id = self.bills.next_id()
+        if bill_record.get('bill_id') is None:
+            bill_record['bill_id'] = next_id
+        elif bill_record['bill_id'] < next_id:
+            raise ValueError(f"Bill ID {bill_record['bill_id']} is not greater than the last bill ID {next_id - 1}.")
+        self._append(BILL, encode_bill(bill_record, sales, self.stock))
+        super()._write_bill(bill_record, sales, positions, totals)
+
+    # --- Snapshots ---
+
+    def _maybe_snapshot(self):
+        due = self.seq - self._snapshot_seq >= self.snapshot_events
+        if due and (self._snapshot_thread is None or not self._snapshot_thread.is_alive()):
+            self.snapshot(wait=False)
+
+    def snapshot(self, wait=True):
+        """Captures the current state, starts a new journal segment and writes the snapshot (in the background unless `wait`).
+
+        The caller must hold off writes while the state is captured (the shop's lock does).
+        """
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self.seq == self._snapshot_seq:
+            return
+        # The captured totals become the base the next totals are computed from
+        self._base, self._base_rows = self._sum_totals(), len(self.sales)
+        arrays, meta = capture(self, self.seq, self.last_event_time, self._base)
+        self._snapshot_seq = self.seq
+        if self._segment != self.seq:
+            self._file.close()
+            self._segment = self.seq
+            self._file = open(segment_path(self.directory, self.seq), 'ab')
+        self._snapshot_thread = threading.Thread(target=self._write_snapshot, args=(arrays, meta),
+                                                 name='sellsathi-snapshot')
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
+
+    def _write_snapshot(self, arrays, meta):
+        try:
+            write_snapshot(self.directory, arrays, meta, self.fsync, self.keep_history)
+            self.snapshot_error = None
+        except Exception as e:
+            # The journal still holds every event, so the next start just replays more of it
+            self.snapshot_error = f"{type(e).__name__}: {e}"
+
+    # --- Reads ---
+
+    def _sum_totals(self, tables=tuple(TOTALS)):
+        """{table: {column: array}} per TOTALS: the base totals plus the sales recorded after them.
+
+        Only the chunks holding those sales are read, and rows are grouped by
+        integer keys, so the cost follows the number of new sales and of
+        (date, product) cells rather than the length of the history.
+        """
+        product_count = len(self.sales.categories['Product Name'].values)
+        totals = {}
+        for table in tables:
+            keys, columns = TOTALS[table]
+            values = {col: self.sales.codes(col, self._base_rows) for col in keys + list(columns)}
+            if self._base is not None:
+                values = {col: np.concatenate([self._base[table][col], values[col]]) for col in values}
+            key = values['Date'].astype(np.int64)
+            if 'Product Name' in keys:
+                key = key * product_count + values['Product Name']
+            unique, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+            totals[table] = {col: values[col][first] for col in keys}
+            for col in columns:
+                totals[table][col] = np.bincount(inverse, weights=values[col], minlength=len(unique)).astype(np.int64)
+        return totals
+
+    def daily_totals(self):
+        return pd.DataFrame(self._sum_totals(['daily_totals'])['daily_totals'])
+
+    def daily_product_totals(self):
+        totals = self._sum_totals(['product_totals'])['product_totals']
+        totals['Product Name'] = pd.Categorical.from_codes(totals['Product Name'],
+                                                           categories=self.sales.categories['Product Name'].values)
+        return pd.DataFrame(totals)
+
+    def events(self, start=0):
+        """Yields (sequence number, time, event type name, summary) for the journal from `start` on."""
+        self._file.flush()
+        for seq, when, kind, payload in read_events(self.directory, start):
+            yield seq, when, EVENT_NAMES.get(kind, str(kind)), describe_event(kind, payload)
+
+    def stats(self):
+        return {'events': self.seq, 'since_snapshot': self.seq - self._snapshot_seq,
+                'snapshots': len(list_snapshots(self.directory)), 'segments': len(list_segments(self.directory)),
+                'snapshot_error': self.snapshot_error}
+
+    def close(self):
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self._file.close()
+        super().close()
+
+
+def journal_path(business_name):
+    return os.path.join(os.environ.get('SELLSATHI_DATA_DIR', 'data'), f"{business_slug(business_name)}.journal")
+
+
+def journal_from_env(business_name):
+    """Opens a business's journal, with the snapshot interval from SELLSATHI_SNAPSHOT_EVENTS,
+    fsync on every event if SELLSATHI_JOURNAL_FSYNC is '1' and every segment kept for audits
+    if SELLSATHI_JOURNAL_KEEP_HISTORY is '1'."""
+    return JournalStorage(journal_path(business_name),
+                          int(os.environ.get('SELLSATHI_SNAPSHOT_EVENTS', DEFAULT_SNAPSHOT_EVENTS)),
+                          os.environ.get('SELLSATHI_JOURNAL_FSYNC') == '1',
+                          os.environ.get('SELLSATHI_JOURNAL_KEEP_HISTORY') == '1')
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from profiling import FRAME_COPIES, ROWS_SCANNED, count
+from schema import CATEGORY, coerce_column
+
+# Rows per column chunk. Appends never copy existing chunks, they only allocate a new one.
+CHUNK_SIZE = 4096
+
+
+class Categories:
+    """Append-only dictionary for a categorical column: each distinct value gets an int32 code."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, values):
+        """Returns the codes for `values`, assigning new codes to unseen values."""
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.values)
+                self.values.append(value)
+            codes[i] = code
+        return codes
+
+    def decode(self, codes):
+        return np.asarray(self.values, dtype=object)[codes]
+
+
+class Ledger:
+    """Append-optimized columnar table made of fixed-size, typed column chunks.
+
+    Appending a row writes into the current chunk (amortized O(1)); a pandas
+    DataFrame is only built when someone reads it and is cached until the next write.
+    Every insert is coerced to the schema dtypes; categorical columns are kept
+    as int32 codes into a per-column Categories dictionary.
+    """
+
+    def __init__(self, schema, chunk_size=CHUNK_SIZE):
+        self.schema = dict(schema)
+        self.columns = list(self.schema)
+        self.chunk_size = chunk_size
+        self.categories = {col: Categories() for col, dtype in self.schema.items() if dtype == CATEGORY}
+        self._chunks = {col: [] for col in self.columns}
+        self._size = 0
+        self._frame = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def empty(self):
+        return self._size == 0
+
+    def _storage_dtype(self, col):
+        return np.int32 if col in self.categories else self.schema[col]
+
+    def _encode(self, col, values):
+        """Coerces values to the column's storage representation."""
+        values = coerce_column(values, self.schema[col])
+        if col in self.categories:
+            return self.categories[col].encode(values)
+        return values
+
+    def _decode(self, col, values):
+        if col in self.categories:
+            return self.categories[col].decode(values)
+        return values
+
+    def _ensure_capacity(self, size):
+        """Allocates new chunks until `size` rows fit."""
+        needed = -(-size // self.chunk_size)
+        while len(self._chunks[self.columns[0]]) < needed:
+            for col in self.columns:
+                self._chunks[col].append(np.empty(self.chunk_size, dtype=self._storage_dtype(col)))
+
+    def append(self, row):
+        """Appends one row (dict keyed by column name) and returns its position."""
+        pos = self._size
+        self.extend({col: [row[col]] for col in self.columns})
+        return pos
+
+    def extend(self, columns):
+        """Appends a batch of rows given as {column: array-like}, all of equal length."""
+        values = {col: self._encode(col, columns[col]) for col in self.columns}
+        count = len(values[self.columns[0]])
+        if count == 0:
+            return
+        start = self._size
+        self._ensure_capacity(start + count)
+        written = 0
+        while written < count:
+            chunk, offset = divmod(start + written, self.chunk_size)
+            step = min(self.chunk_size - offset, count - written)
+            for col in self.columns:
+                self._chunks[col][chunk][offset:offset + step] = values[col][written:written + step]
+            written += step
+        self._size += count
+        self._frame = None
+
+    def load(self, codes, categories=None):
+        """Fills an empty ledger from columns in storage representation plus each categorical column's values.
+
+        Full chunks are views of the given arrays, so memory-mapped columns are
+        only read from disk as they are used; the partial last chunk is copied
+        so appends can continue. Views may be read-only: only append-only
+        ledgers should be loaded this way.
+        """
+        if self._size:
+            raise ValueError("Only an empty ledger can be loaded.")
+        for col, values in (categories or {}).items():
+            self.categories[col].encode(values)
+        size = len(codes[self.columns[0]])
+        full, rest = divmod(size, self.chunk_size)
+        for col in self.columns:
+            values = codes[col]
+            self._chunks[col] = [values[i * self.chunk_size:(i + 1) * self.chunk_size] for i in range(full)]
+            if rest:
+                chunk = np.empty(self.chunk_size, dtype=self._storage_dtype(col))
+                chunk[:rest] = values[full * self.chunk_size:]
+                self._chunks[col].append(chunk)
+        self._size = size
+        self._frame = None
+
+    def get(self, pos, col):
+        """Returns a single cell."""
+        chunk, offset = divmod(pos, self.chunk_size)
+        value = self._chunks[col][chunk][offset]
+        return self.categories[col].values[value] if col in self.categories else value
+
+    def set(self, pos, col, value):
+        """Overwrites a single cell in place."""
+        chunk, offset = divmod(pos, self.chunk_size)
+        self._chunks[col][chunk][offset] = self._encode(col, [value])[0]
+        self._frame = None
+
+    def take(self, col, positions):
+        """Gathers the cells at `positions` (any order, repeats allowed) into one array."""
+        positions = np.asarray(positions, dtype=np.int64)
+        chunks, offsets = np.divmod(positions, self.chunk_size)
+        out = np.empty(len(positions), dtype=self._storage_dtype(col))
+        for chunk in np.unique(chunks):
+            selected = chunks == chunk
+            out[selected] = self._chunks[col][chunk][offsets[selected]]
+        return self._decode(col, out)
+
+    def add_at(self, col, positions, deltas):
+        """Adds `deltas` to the cells at `positions` in place (repeated positions accumulate)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        deltas = np.broadcast_to(coerce_column(deltas, self.schema[col]), positions.shape)
+        chunks, offsets = np.divmod(positions, self.chunk_size)
+        for chunk in np.unique(chunks):
+            selected = chunks == chunk
+            np.add.at(self._chunks[col][chunk], offsets[selected], deltas[selected])
+        self._frame = None
+
+    def codes(self, col, start=0):
+        """Returns one column from row `start` on in its storage representation (codes for categorical columns)."""
+        if start >= self._size:
+            return np.empty(0, dtype=self._storage_dtype(col))
+        first = start // self.chunk_size
+        full, rest = divmod(self._size, self.chunk_size)
+        parts = self._chunks[col][first:full]
+        if rest:
+            parts = parts + [self._chunks[col][full][:rest]]
+        return np.concatenate(parts)[start - first * self.chunk_size:]
+
+    def column(self, col):
+        """Returns one column as a contiguous numpy array of values."""
+        return self._decode(col, self.codes(col))
+
+    def frame(self):
+        """Returns the table as a DataFrame with a positional RangeIndex (cached until the next write)."""
+        if self._frame is None:
+            count(FRAME_COPIES)
+            count(ROWS_SCANNED, self._size)
+            data = {}
+            for col in self.columns:
+                if col in self.categories:
+                    data[col] = pd.Categorical.from_codes(self.codes(col), categories=self.categories[col].values)
+                else:
+                    data[col] = self.codes(col)
+            self._frame = pd.DataFrame(data)
+        return self._frame
@@ -0,0 +1,109 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from profiling import ROWS_SCANNED, count, profiled
+from schema import day_keys
+
+# Batches up to this many rows are added row by row instead of grouped through pandas.
+SMALL_BATCH_ROWS = 64
+
+# Order of the running totals kept per day / month bucket.
+TOTAL_COLUMNS = ('Sale Price', 'Profit', 'Buy Price')
+
+
+@profiled('metrics.calculate_metrics')
+def calculate_metrics(df_sales, today=None):
+    """Calculates sales and profit metrics (in paise) for today and the current month (full scan)."""
+    count(ROWS_SCANNED, len(df_sales))
+    today = pd.Timestamp(today or datetime.date.today())
+    dates = df_sales['Date']
+
+    # Filter for today's sales
+    today_sales = df_sales[dates == today]
+
+    # Filter for monthly sales
+    month_start = today.replace(day=1)
+    monthly_sales = df_sales[(dates >= month_start) & (dates < month_start + pd.offsets.MonthBegin(1))]
+
+    metrics = {
+        'Today Sales': int(today_sales['Sale Price'].sum()),
+        'Today Profit': int(today_sales['Profit'].sum()),
+        'Today Expenditure': int(today_sales['Buy Price'].sum()),
+        'Monthly Sales': int(monthly_sales['Sale Price'].sum()),
+        'Monthly Profit': int(monthly_sales['Profit'].sum()),
+        'Monthly Expenditure': int(monthly_sales['Buy Price'].sum()),
+    }
+    return metrics
+
+
+class MetricsAggregator:
+    """Running sales, profit and expenditure totals (integer paise) per day and per month.
+
+    Every write path calls `add`, so reading the dashboard metrics is O(1)
+    regardless of how much sales history exists.
+    """
+
+    def __init__(self):
+        self.daily = {}
+        self.monthly = {}
+
+    def add(self, date, sale_price, buy_price, profit):
+        """Adds one sale (line totals, not unit prices) to its day and month buckets."""
+        self._add_day(str(day_keys([date])[0]), sale_price, buy_price, profit)
+
+    def _add_day(self, date, sale_price, buy_price, profit):
+        for bucket, key in ((self.daily, date), (self.monthly, date[:7])):
+            totals = bucket.get(key)
+            if totals is None:
+                totals = bucket[key] = [0, 0, 0]
+            totals[0] += int(sale_price)
+            totals[1] += int(profit)
+            totals[2] += int(buy_price)
+
+    def add_batch(self, sales):
+        """Adds a batch of sale rows ({column: array}), grouped by date so each bucket is touched once."""
+        if len(sales['Date']) <= SMALL_BATCH_ROWS:
+            columns = [np.asarray(sales[col], dtype=np.int64).tolist() for col in ('Sale Price', 'Buy Price', 'Profit')]
+            for date, sale_price, buy_price, profit in zip(day_keys(sales['Date']).tolist(), *columns):
+                self._add_day(date, sale_price, buy_price, profit)
+            return
+        frame = pd.DataFrame({col: np.asarray(sales[col], dtype=np.int64) for col in TOTAL_COLUMNS})
+        grouped = frame.groupby(day_keys(sales['Date']))[list(TOTAL_COLUMNS)].sum()
+        for date, (sale_price, profit, buy_price) in zip(grouped.index, grouped.to_numpy()):
+            self._add_day(date, sale_price, buy_price, profit)
+
+    @profiled('metrics.read')
+    def metrics(self, today=None):
+        """Returns the same dict as `calculate_metrics`, read straight from the buckets."""
+        today = today or datetime.date.today()
+        day = self.daily.get(today.strftime('%Y-%m-%d'), (0, 0, 0))
+        month = self.monthly.get(today.strftime('%Y-%m'), (0, 0, 0))
+        return {
+            'Today Sales': day[0],
+            'Today Profit': day[1],
+            'Today Expenditure': day[2],
+            'Monthly Sales': month[0],
+            'Monthly Profit': month[1],
+            'Monthly Expenditure': month[2],
+        }
+
+    @classmethod
+    def from_frame(cls, df_sales):
+        """Rebuilds the aggregator from a sales frame or per-date totals (e.g. after a reload)."""
+        aggregator = cls()
+        if df_sales.empty:
+            return aggregator
+        dates = pd.Series(day_keys(df_sales['Date']), index=df_sales.index)
+        for bucket, keys in ((aggregator.daily, dates), (aggregator.monthly, dates.str[:7])):
+            grouped = df_sales[list(TOTAL_COLUMNS)].astype(np.int64).groupby(keys.to_numpy()).sum()
+            for key, row in zip(grouped.index, grouped.to_numpy()):
+                bucket[key] = [int(value) for value in row]
+        return aggregator
+
+    def check(self, df_sales, today=None):
+        """Compares the running totals with a full scan; returns the metric names that disagree."""
+        expected = calculate_metrics(df_sales, today)
+        actual = self.metrics(today)
+        return [name for name, value in expected.items() if actual[name] != value]
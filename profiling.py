@@ -0,0 +1,173 @@
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Counter names used by the instrumented code paths.
+ROWS_SCANNED = 'rows_scanned'
+FRAME_COPIES = 'frame_copies'
+
+# Set to a file path to append one JSON line per profiled rerun.
+PROFILE_LOG_ENV = 'SELLSATHI_PROFILE_LOG'
+# Set to '1' to profile every rerun without ticking the debug checkbox.
+PROFILE_ENV = 'SELLSATHI_PROFILE'
+
+# Each Streamlit session runs its script in its own thread, so the active profile is thread-local.
+_local = threading.local()
+
+
+class RunProfile:
+    """Timings and counters collected during one script rerun.
+
+    Timings are inclusive: a span that calls another profiled function also
+    contains the callee's time.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.timings = {}  # name -> [calls, seconds]
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = [0, 0.0]
+        timing[0] += 1
+        timing[1] += seconds
+
+    def add_count(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def record(self, session_state=None):
+        """Returns the run as a JSON-serializable dict."""
+        record = {
+            'ts': round(self.started, 3),
+            'label': self.label,
+            'total_ms': round((time.perf_counter() - self._start) * 1000, 3),
+            'timings': {name: {'calls': calls, 'ms': round(seconds * 1000, 3)}
+                        for name, (calls, seconds) in sorted(self.timings.items(), key=lambda item: -item[1][1])},
+            'counters': dict(self.counters),
+        }
+        if session_state is not None:
+            record['session_bytes'] = session_memory(session_state)
+        return record
+
+
+def current():
+    """The profile of the rerun running in this thread, or None when profiling is off."""
+    return getattr(_local, 'profile', None)
+
+
+def start_run(label):
+    _local.profile = RunProfile(label)
+    return _local.profile
+
+
+def finish_run(session_state=None, log_path=None):
+    """Ends this thread's profile and returns its record, appending it to `log_path` (or $SELLSATHI_PROFILE_LOG)."""
+    profile = current()
+    if profile is None:
+        return None
+    _local.profile = None
+    record = profile.record(session_state)
+    log_path = log_path or os.environ.get(PROFILE_LOG_ENV)
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+    return record
+
+
+@contextmanager
+def timed(name):
+    """Times the enclosed block under `name` (no-op when profiling is off)."""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(name, time.perf_counter() - start)
+
+
+def profiled(name):
+    """Decorator form of `timed`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Adds `n` to a counter of the current rerun (no-op when profiling is off)."""
+    profile = current()
+    if profile is not None:
+        profile.add_count(name, n)
+
+
+def _items_size(items, total, seen, sample):
+    """Size of the items of a container; with `sample`, measures the first `sample` and extrapolates."""
+    if sample is None or total <= sample:
+        return sum(deep_size(item, seen, sample) for item in items)
+    measured = sum(deep_size(item, seen, sample) for _, item in zip(range(sample), items))
+    return int(measured * total / sample)
+
+
+def deep_size(obj, seen=None, sample=None):
+    """Approximate memory held by `obj`, following containers, arrays, frames and object attributes.
+
+    With `sample`, containers larger than that are estimated from their first
+    `sample` items, which keeps the walk cheap for very large objects.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += _items_size(obj.ravel(), obj.size, seen, sample)
+        return size
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + _items_size(itertools.chain.from_iterable(obj.items()), 2 * len(obj), seen, sample)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + _items_size(obj, len(obj), seen, sample)
+    if hasattr(obj, '__dict__'):
+        return size + deep_size(vars(obj), seen, sample)
+    return size
+
+
+def session_memory(session_state):
+    """Bytes held by each session-state key, largest first."""
+    sizes = {str(key): deep_size(session_state[key]) for key in list(session_state.keys())}
+    return dict(sorted(sizes.items(), key=lambda item: -item[1]))
+
+
+def profiling_requested(session_state):
+    return bool(session_state.get('debug_profile')) or os.environ.get(PROFILE_ENV) == '1'
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shop import open_shop
+from storage import business_slug
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# A session that has not rerun for this long no longer keeps its business in memory.
+DEFAULT_LEASE_TTL = 30 * 60
+# How often tenants' memory footprints are re-measured, the items sampled per
+# container when measuring (a full walk of a large shop takes seconds), and the
+# walks tried before a tenant keeps its previous size.
+SIZE_REFRESH_SECONDS = 30
+SIZE_SAMPLE = 1024
+SIZE_ATTEMPTS = 3
+
+
+class Tenant:
+    """One business loaded in memory and the sessions currently using it."""
+
+    def __init__(self, business_name):
+        self.business_name = business_name
+        self.shop = None
+        self.lock = threading.Lock()  # held while the shop is being opened
+        self.leases = {}  # session id -> last time the session used the shop
+        self.last_used = time.monotonic()
+        self.nbytes = 0
+        self.measured = None  # cache versions at the last measurement
+
+    def active(self, now, ttl):
+        self.leases = {session: seen for session, seen in self.leases.items() if now - seen < ttl}
+        return bool(self.leases)
+
+
+class ShopRegistry:
+    """Process-wide map from a business to the one Shop all of its sessions share.
+
+    Sessions `acquire` the shop on every rerun, which keeps their lease fresh,
+    and `release` it on logout. Shops stay loaded after their last session goes
+    so a returning cashier finds them warm, but not for longer than
+    `lease_ttl`: a shop nobody has acquired for that long is closed, which
+    also frees its store for cli.py. Before that, once the total footprint
+    exceeds `max_bytes`, idle tenants (no live lease) are closed least recently
+    used first. Only durable backends are evicted: a memory-backed shop would
+    lose its data, so it stays until the process exits.
+
+    Footprints are measured off the request path, by a background thread that
+    runs while any durable shop is loaded: every `refresh_seconds` (or sooner
+    when `acquire` opens a shop) it re-measures the tenants whose data changed
+    and then evicts.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, lease_ttl=DEFAULT_LEASE_TTL, opener=open_shop,
+                 refresh_seconds=SIZE_REFRESH_SECONDS):
+        self.max_bytes = max_bytes
+        self.lease_ttl = lease_ttl
+        self.opener = opener
+        self.refresh_seconds = refresh_seconds
+        self.evictions = 0
+        self._tenants = OrderedDict()  # slug -> Tenant, least recently used first
+        self._lock = threading.Lock()
+        self._upkeep = None  # the background sizing and eviction thread, while it runs
+        self._wake = threading.Event()
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def acquire(self, business_name, session_id):
+        """Returns the shared shop for a business, opening it if needed, and renews the session's lease."""
+        key = business_slug(business_name)
+        now = time.monotonic()
+        with self._lock:
+            tenant = self._tenants.get(key)
+            if tenant is None:
+                tenant = self._tenants[key] = Tenant(business_name)
+            self._tenants.move_to_end(key)
+            tenant.leases[session_id] = tenant.last_used = now
+        if tenant.shop is None:
+            # Opened outside the registry lock, so loading one business does not stall the others
+            with tenant.lock:
+                if tenant.shop is None:
+                    tenant.shop = self.opener(business_name)
+        self._schedule_sizing(now)
+        return tenant.shop
+
+    def peek(self, business_name):
+        """The business's shop if it is loaded, else None; unlike `acquire` it neither opens it nor renews a lease."""
+        with self._lock:
+            tenant = self._tenants.get(business_slug(business_name))
+        return None if tenant is None else tenant.shop
+
+    def release(self, business_name, session_id):
+        """Drops a session's lease (e.g. on logout); the shop stays loaded until evicted."""
+        with self._lock:
+            tenant = self._tenants.get(business_slug(business_name))
+            if tenant is not None:
+                tenant.leases.pop(session_id, None)
+
+    def _schedule_sizing(self, now):
+        """Starts the upkeep thread if it is not running, and wakes it if a shop has not been measured yet."""
+        with self._lock:
+            if any(tenant.shop is not None and tenant.measured is None for tenant in self._tenants.values()):
+                self._wake.set()
+            if self._upkeep is None:
+                self._upkeep = threading.Thread(target=self._run_upkeep, name='registry-upkeep', daemon=True)
+                self._upkeep.start()
+
+    def _run_upkeep(self):
+        while True:
+            with self._lock:
+                loaded = [tenant for tenant in self._tenants.values() if tenant.shop is not None]
+                if not any(tenant.shop.storage.durable for tenant in loaded):
+                    # Nothing left to evict; the next acquire starts a new thread
+                    self._upkeep = None
+                    return
+            self._wake.clear()
+            for tenant in loaded:
+                self._measure(tenant)
+            self._enforce_budget(time.monotonic())
+            self._wake.wait(self.refresh_seconds)
+
+    def _measure(self, tenant):
+        """Re-measures a tenant whose data changed since its last measurement; a failed walk keeps the previous size."""
+        shop = tenant.shop
+        versions = tuple(shop.cache.versions.values())
+        if tenant.measured == versions:
+            return
+        tenant.measured = versions
+        for _ in range(SIZE_ATTEMPTS):
+            try:
+                tenant.nbytes = shop.footprint(SIZE_SAMPLE)
+                return
+            except Exception:
+                # e.g. a reader's structure changed mid-walk, or the shop was closed meanwhile
+                continue
+
+    def _enforce_budget(self, now):
+        """Closes durable shops unused for `lease_ttl`, then idle ones, least recently used first, while over budget."""
+        with self._lock:
+            loaded = [(key, tenant) for key, tenant in self._tenants.items() if tenant.shop is not None]
+            total = sum(tenant.nbytes for _, tenant in loaded)
+            for key, tenant in loaded:
+                if not tenant.shop.storage.durable:
+                    continue
+                expired = now - tenant.last_used >= self.lease_ttl
+                if not expired and (total <= self.max_bytes or tenant.active(now, self.lease_ttl)):
+                    continue
+                del self._tenants[key]
+                total -= tenant.nbytes
+                self.evictions += 1
+                tenant.shop.close()
+
+    def stats(self):
+        """One row per loaded business, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [{'business': tenant.business_name, 'sessions': len(tenant.leases), 'bytes': tenant.nbytes,
+                     'idle_s': round(now - tenant.last_used, 1)}
+                    for tenant in self._tenants.values() if tenant.shop is not None]
+
+    def close(self):
+        with self._lock:
+            tenants, self._tenants = list(self._tenants.values()), OrderedDict()
+        self._wake.set()  # the upkeep thread finds nothing loaded and stops
+        for tenant in tenants:
+            if tenant.shop is not None:
+                tenant.shop.close()
+
+
+def registry_from_env():
+    """Builds a registry sized by SELLSATHI_REGISTRY_MB and SELLSATHI_LEASE_TTL (seconds), if set."""
+    max_mb = os.environ.get('SELLSATHI_REGISTRY_MB')
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    lease_ttl = float(os.environ.get('SELLSATHI_LEASE_TTL', DEFAULT_LEASE_TTL))
+    return ShopRegistry(max_bytes, lease_ttl)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry():
+    """The process-wide registry, built from the environment on first use.
+
+    Streamlit reruns re-execute the app script but not the modules it imports,
+    so every session of the server process gets this same instance.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = registry_from_env()
+        return _shared
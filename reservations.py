@@ -0,0 +1,185 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+
+# Seconds an untouched hold lasts (override with SELLSATHI_RESERVATION_TTL); open bills renew theirs on every rerun.
+DEFAULT_TTL = 15 * 60
+# Products are spread over this many locks, so checkouts of different products rarely contend.
+LOCK_STRIPES = 64
+
+
+class StockReservations:
+    """Time-limited holds on stock for bills that are still being built.
+
+    A hold takes units out of what other counters can sell until it is
+    committed by the bill's finalization, released, or expires. Each product
+    maps to one of a fixed set of striped locks: reserving only locks that
+    product's stripe, and a write locks the stripes of the products it sells
+    (in a fixed order), so the free-stock check and the decrement cannot
+    interleave with a reservation of the same product while unrelated products
+    proceed in parallel.
+    """
+
+    def __init__(self, stock, ttl=DEFAULT_TTL, stripes=LOCK_STRIPES):
+        self.stock = stock
+        self.ttl = ttl
+        self._locks = [threading.RLock() for _ in range(stripes)]
+        self._holds = {}  # stock position -> {hold id: [owner, qty, expires]}
+        self._owners = {}  # owner -> {hold id: stock position}
+        self._owners_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _lock(self, pos):
+        return self._locks[pos % len(self._locks)]
+
+    @contextmanager
+    def locked(self, positions=None):
+        """Holds the stripe locks of `positions`, or of every product if None.
+
+        Stripes are acquired in order, so writers cannot deadlock; they are
+        re-entrant, so a locked section may call `reserve` or `check`.
+        """
+        stripes = range(len(self._locks)) if positions is None else sorted({int(pos) % len(self._locks) for pos in positions})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._locks[stripe])
+            yield
+
+    def _live(self, pos, now):
+        """The product's unexpired holds; expired ones are dropped on the way. Caller holds the stripe lock."""
+        holds = self._holds.get(pos)
+        if not holds:
+            return {}
+        expired = [hold_id for hold_id, (_, _, expires) in holds.items() if expires <= now]
+        for hold_id in expired:
+            owner = holds.pop(hold_id)[0]
+            with self._owners_lock:
+                owned = self._owners.get(owner)
+                if owned is not None:
+                    owned.pop(hold_id, None)
+                    if not owned:
+                        del self._owners[owner]
+        return holds
+
+    def _held(self, pos, now, owner=None):
+        """Units of a product held by everyone except `owner`. Caller holds the stripe lock."""
+        return sum(qty for hold_owner, qty, _ in self._live(pos, now).values() if hold_owner != owner)
+
+    def available(self, name, owner=None):
+        """Units of `name` that `owner` can still take: stock on hand minus everyone else's holds."""
+        pos = self.stock.position(name)
+        if pos is None:
+            return 0
+        with self._lock(pos):
+            return int(self.stock.get(pos, 'Quantity')) - self._held(pos, time.monotonic(), owner)
+
+    def held(self, owner):
+        """Units held by `owner` per product name."""
+        with self._owners_lock:
+            holds = list(self._owners.get(owner, {}).items())
+        totals = {}
+        for hold_id, pos in holds:
+            with self._lock(pos):
+                hold = self._holds.get(pos, {}).get(hold_id)
+            if hold is not None:
+                name = self.stock.get(pos, 'Product Name')
+                totals[name] = totals.get(name, 0) + hold[1]
+        return totals
+
+    def reserve(self, owner, name, qty):
+        """Holds `qty` units of `name` for `owner`; returns the hold id.
+
+        Raises KeyError for unknown products and ValueError if fewer than `qty`
+        units are free (in stock and not held by another owner).
+        """
+        if qty <= 0:
+            raise ValueError("Reserved quantities must be positive.")
+        pos = self.stock.position(name)
+        if pos is None:
+            raise KeyError(f"Product '{name}' is not in stock.")
+        now = time.monotonic()
+        with self._lock(pos):
+            free = int(self.stock.get(pos, 'Quantity')) - self._held(pos, now)
+            if qty > free:
+                raise ValueError(f"Only {max(free, 0)} units of '{name}' are free.")
+            hold_id = next(self._ids)
+            self._holds.setdefault(pos, {})[hold_id] = [owner, qty, now + self.ttl]
+            # Registered before the stripe is let go, so a release that follows the check cannot miss it
+            with self._owners_lock:
+                self._owners.setdefault(owner, {})[hold_id] = pos
+        return hold_id
+
+    def renew(self, owner):
+        """Pushes back the expiry of all of `owner`'s holds (e.g. on every rerun of an open bill)."""
+        with self._owners_lock:
+            holds = list(self._owners.get(owner, {}).items())
+        expires = time.monotonic() + self.ttl
+        for hold_id, pos in holds:
+            with self._lock(pos):
+                hold = self._holds.get(pos, {}).get(hold_id)
+                if hold is not None:
+                    hold[2] = expires
+
+    def release(self, owner, positions=None):
+        """Drops all of `owner`'s holds (bill finalized or abandoned), or only those on `positions`.
+
+        Each hold's stripe is locked after the owners lock is let go. A caller
+        already holding stripes should pass the positions it holds them for,
+        so no stripe is taken out of order.
+        """
+        with self._owners_lock:
+            if positions is None:
+                holds = self._owners.pop(owner, {})
+            else:
+                owned, wanted = self._owners.get(owner, {}), {int(pos) for pos in positions}
+                holds = {hold_id: pos for hold_id, pos in owned.items() if pos in wanted}
+                for hold_id in holds:
+                    del owned[hold_id]
+                if not owned:
+                    self._owners.pop(owner, None)
+        for hold_id, pos in holds.items():
+            with self._lock(pos):
+                self._holds.get(pos, {}).pop(hold_id, None)
+
+    def held_units(self, positions, owner=None):
+        """Units held by owners other than `owner` for each of `positions` (repeats allowed)."""
+        now = time.monotonic()
+        unique, inverse = np.unique(np.asarray(positions, dtype=np.int64), return_inverse=True)
+        held = np.zeros(len(unique), dtype=np.int64)
+        for i, pos in enumerate(unique.tolist()):
+            if pos in self._holds:
+                with self._lock(pos):
+                    held[i] = self._held(pos, now, owner)
+        return held[inverse]
+
+    def check(self, positions, totals, owner=None):
+        """Raises ValueError unless each product has `totals` units free for `owner`.
+
+        `positions` are unique stock positions. The caller must hold their
+        stripes (see `locked`) until the sale is written.
+        """
+        free = self.stock.take('Quantity', positions) - self.held_units(positions, owner)
+        short = totals > free
+        if short.any():
+            details = ', '.join(f"'{name}' ({max(have, 0)} free, {want} needed)" for name, have, want in zip(
+                self.stock.take('Product Name', positions[short]), free[short], totals[short]))
+            raise ValueError(f"Not enough unreserved stock for {details}.")
+
+    def stats(self):
+        now = time.monotonic()
+        holds = units = 0
+        for pos in list(self._holds):
+            with self._lock(pos):
+                live = self._live(pos, now)
+                holds += len(live)
+                units += sum(qty for _, qty, _ in live.values())
+        return {'holds': holds, 'units': units, 'owners': len(self._owners)}
+
+
+def reservations_from_env(stock):
+    """Builds the reservations for a stock table, with the TTL from SELLSATHI_RESERVATION_TTL (seconds) if set."""
+    return StockReservations(stock, float(os.environ.get('SELLSATHI_RESERVATION_TTL', DEFAULT_TTL)))
@@ -0,0 +1,127 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+from schema import to_days
+
+# Totals kept per period, in order (paise).
+ROLLUP_COLUMNS = ('Revenue', 'Profit', 'Expenditure')
+RESOLUTIONS = ('day', 'week', 'month')
+
+# The automatic resolution is the finest one that shows at most this many points.
+MAX_CHART_POINTS = 180
+
+# Batches up to this many rows are added row by row instead of through numpy grouping.
+SMALL_BATCH_ROWS = 64
+
+
+def period_starts(days, resolution):
+    """Maps day numbers (days since 1970-01-01) to the first day of their period.
+
+    Weeks start on Monday (1970-01-01 was a Thursday).
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        return days - (days + 3) % 7
+    if resolution == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    raise ValueError(f"Unknown resolution '{resolution}'.")
+
+
+def period_count(start, end, resolution):
+    """Number of periods of `resolution` that overlap [start, end]."""
+    first, last = period_starts(to_days([start, end]).astype(np.int64), resolution)
+    if resolution == 'day':
+        return int(last - first) + 1
+    if resolution == 'week':
+        return int(last - first) // 7 + 1
+    months = to_days([start, end]).astype('datetime64[M]').astype(np.int64)
+    return int(months[1] - months[0]) + 1
+
+
+class SalesRollups:
+    """Revenue, profit and expenditure totals per day, week and month.
+
+    Each sale is added to its three periods as it is recorded, and each
+    resolution keeps its period starts sorted, so a chart over any date range
+    reads only the periods it plots, however many sales they cover.
+    """
+
+    def __init__(self):
+        self.totals = {resolution: {} for resolution in RESOLUTIONS}  # period start day -> [revenue, profit, expenditure]
+        self._keys = {resolution: [] for resolution in RESOLUTIONS}  # sorted period start days
+
+    @property
+    def empty(self):
+        return not self._keys['day']
+
+    def bounds(self):
+        """(first, last) day with sales as datetime.date, or None."""
+        days = self._keys['day']
+        if not days:
+            return None
+        first, last = np.array([days[0], days[-1]], dtype='datetime64[D]').tolist()
+        return first, last
+
+    def _add(self, resolution, period, revenue, profit, expenditure):
+        totals = self.totals[resolution].get(period)
+        if totals is None:
+            totals = self.totals[resolution][period] = [0, 0, 0]
+            insort(self._keys[resolution], period)
+        totals[0] += revenue
+        totals[1] += profit
+        totals[2] += expenditure
+
+    @profiled('rollups.add_batch')
+    def add_batch(self, sales):
+        """Adds a batch of sale rows ({column: array} with line totals in paise) to every resolution."""
+        days = to_days(sales['Date']).astype(np.int64)
+        revenue = np.asarray(sales['Sale Price'], dtype=np.int64)
+        profit = np.asarray(sales['Profit'], dtype=np.int64)
+        expenditure = np.asarray(sales['Buy Price'], dtype=np.int64)
+        for resolution in RESOLUTIONS:
+            periods = period_starts(days, resolution)
+            if len(periods) <= SMALL_BATCH_ROWS:
+                for row in zip(periods.tolist(), revenue.tolist(), profit.tolist(), expenditure.tolist()):
+                    self._add(resolution, *row)
+                continue
+            unique, inverse = np.unique(periods, return_inverse=True)
+            sums = [np.bincount(inverse, weights=values, minlength=len(unique)).astype(np.int64)
+                    for values in (revenue, profit, expenditure)]
+            for row in zip(unique.tolist(), *(column.tolist() for column in sums)):
+                self._add(resolution, *row)
+
+    @classmethod
+    def from_frame(cls, df_sales):
+        """Rebuilds the rollups from sales rows or per-date totals (Date, Sale Price, Profit, Buy Price)."""
+        rollups = cls()
+        if not df_sales.empty:
+            rollups.add_batch({col: df_sales[col].to_numpy() for col in ('Date', 'Sale Price', 'Profit', 'Buy Price')})
+        return rollups
+
+    def pick_resolution(self, start, end, max_points=MAX_CHART_POINTS):
+        """The finest resolution that shows [start, end] in at most `max_points` periods."""
+        for resolution in RESOLUTIONS[:-1]:
+            if period_count(start, end, resolution) <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    @profiled('rollups.series')
+    def series(self, start, end, resolution=None):
+        """Totals per period overlapping [start, end] as a DataFrame indexed by period start date.
+
+        Periods with no sales are left out. The first and last week or month
+        are whole periods, so they may include sales just outside the range.
+        """
+        resolution = resolution or self.pick_resolution(start, end)
+        first, last = period_starts(to_days([start, end]).astype(np.int64), resolution).tolist()
+        keys = self._keys[resolution]
+        periods = keys[bisect_left(keys, first):bisect_right(keys, last)]
+        totals = self.totals[resolution]
+        df = pd.DataFrame([totals[period] for period in periods], columns=list(ROLLUP_COLUMNS), dtype=np.int64)
+        df.index = pd.DatetimeIndex(np.array(periods, dtype='datetime64[D]'), name='Date')
+        return df
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from profiling import FRAME_COPIES, count
+
+# --- COLUMN SCHEMAS ---
+# Money is stored as integer paise (1 ₹ = 100 paise), dates as datetime64 days,
+# and repeated product names in sales as categorical codes.
+
+CATEGORY = 'category'
+DATE = 'datetime64[D]'
+
+STOCK_SCHEMA = {
+    'Product Name': object,
+    'Buy Price': np.int64,
+    'Sell Price': np.int64,
+    'Quantity': np.int32,
+    'Sales Count': np.int64,
+}
+
+SALES_SCHEMA = {
+    'Date': DATE,
+    'Product Name': CATEGORY,
+    'Quantity Sold': np.int32,
+    'Sale Price': np.int64,
+    'Buy Price': np.int64,
+    'Profit': np.int64,
+}
+
+# Bill headers; each bill's items are the 'Item Count' rows of BILL_ITEM_SCHEMA from 'First Item'
+BILL_SCHEMA = {
+    'Bill ID': np.int64,
+    'Date': DATE,
+    'Customer': object,
+    'Bill Total': np.int64,
+    'First Item': np.int64,
+    'Item Count': np.int32,
+}
+
+BILL_ITEM_SCHEMA = {
+    'Product': CATEGORY,
+    'Qty': np.int32,
+    'Unit Price': np.int64,
+    'Line Total': np.int64,
+}
+
+MONEY_COLUMNS = ('Buy Price', 'Sell Price', 'Sale Price', 'Profit')
+
+
+# --- CONVERSIONS ---
+
+def to_paise(rupees):
+    """Converts rupee amounts (scalar or array) to integer paise, rounding to the nearest paisa."""
+    paise = np.rint(np.asarray(rupees, dtype=np.float64) * 100).astype(np.int64)
+    return int(paise) if paise.ndim == 0 else paise
+
+
+def to_rupees(paise):
+    """Converts integer paise (scalar, array or Series) to rupees for display and export."""
+    return paise / 100
+
+
+def to_days(values):
+    """Converts dates (ISO strings, date objects, Timestamps or datetime64) to a datetime64[D] array."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype(DATE)
+    try:
+        # ISO strings and date objects convert directly, without a pandas round trip
+        return values.astype(DATE)
+    except (TypeError, ValueError):
+        return pd.to_datetime(values.ravel()).to_numpy().astype(DATE).reshape(values.shape)
+
+
+def day_keys(values):
+    """Returns dates as 'YYYY-MM-DD' strings (the key used by the running aggregates)."""
+    return np.datetime_as_string(to_days(values), unit='D')
+
+
+def coerce_column(values, dtype):
+    """Converts values to a column's storage dtype, refusing lossy conversions.
+
+    Raises ValueError if a float that is not a whole number (or out of range)
+    is written to an integer column.
+    """
+    if dtype is object or dtype == CATEGORY:
+        return np.asarray(values, dtype=object)
+    if dtype == DATE:
+        return to_days(values)
+    values = np.asarray(values)
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu' and values.dtype.kind not in 'iub':
+        values = values.astype(np.float64)
+        info = np.iinfo(dtype)
+        if not (np.all(values == np.rint(values)) and np.all(values >= info.min) and np.all(values <= info.max)):
+            raise ValueError(f"Values must be whole numbers that fit in {dtype}.")
+    return values.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Casts a DataFrame read from outside (SQL, files) to the in-memory frame dtypes of `schema`."""
+    count(FRAME_COPIES)
+    casts = {}
+    for col in df.columns:
+        dtype = schema.get(col)
+        if dtype == DATE:
+            casts[col] = 'datetime64[s]'
+        elif dtype == CATEGORY:
+            casts[col] = 'category'
+        elif dtype is not None:
+            casts[col] = dtype
+    if 'Date' in casts and df['Date'].dtype.kind != 'M':
+        df = df.assign(Date=pd.to_datetime(df['Date']))
+    return df.astype(casts)
@@ -0,0 +1,139 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+
+from profiling import ROWS_SCANNED, count, profiled
+
+# Default number of matches returned to a typeahead picker.
+DEFAULT_LIMIT = 20
+
+WORD_START = re.compile(r'\b\w')
+
+
+def fold(text):
+    """Case-folds and trims text for matching."""
+    return str(text).casefold().strip()
+
+
+def trigrams(text):
+    """Returns the set of 3-character substrings of already-folded text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductSearchIndex:
+    """Incremental, case-insensitive product name search.
+
+    Substring queries of 3+ characters go through a trigram index (posting
+    lists of product ids, intersected smallest-first, then verified). Shorter
+    queries match name and word prefixes through a sorted key list, and fall
+    back to scanning every name only when the prefixes do not fill the
+    requested number of results. Results are
+    ranked: exact match, name prefix, word prefix, other substring; then
+    shorter names first.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._folded = {}
+        self._grams = {}
+        self._prefixes = []  # sorted (folded key, is_word, id)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _prefix_keys(self, folded, product_id):
+        keys = [(folded, False, product_id)]
+        keys.extend((folded[m.start():], True, product_id) for m in WORD_START.finditer(folded) if m.start())
+        return keys
+
+    def add(self, name, product_id):
+        """Indexes one product name under `product_id` (e.g. its stock row position)."""
+        folded = fold(name)
+        self._names[product_id] = name
+        self._folded[product_id] = folded
+        for gram in trigrams(folded):
+            self._grams.setdefault(gram, []).append(product_id)
+        for key in self._prefix_keys(folded, product_id):
+            insort(self._prefixes, key)
+
+    def extend(self, names, start_id=0):
+        """Indexes many names with consecutive ids, sorting the prefix list once."""
+        keys = []
+        for product_id, name in enumerate(names, start_id):
+            folded = fold(name)
+            self._names[product_id] = name
+            self._folded[product_id] = folded
+            for gram in trigrams(folded):
+                self._grams.setdefault(gram, []).append(product_id)
+            keys.extend(self._prefix_keys(folded, product_id))
+        self._prefixes.extend(keys)
+        self._prefixes.sort()
+
+    def _rank(self, query, product_id):
+        folded = self._folded[product_id]
+        if folded == query:
+            category = 0
+        elif folded.startswith(query):
+            category = 1
+        elif any(folded.startswith(query, m.start()) for m in WORD_START.finditer(folded)):
+            category = 2
+        else:
+            category = 3
+        return (category, len(folded), folded, product_id)
+
+    def _prefix_candidates(self, query):
+        """Returns {id: category} for names or words starting with `query`."""
+        candidates = {}
+        i = bisect_left(self._prefixes, (query,))
+        while i < len(self._prefixes) and self._prefixes[i][0].startswith(query):
+            key, is_word, product_id = self._prefixes[i]
+            category = 2 if is_word else 0 if key == query else 1
+            candidates[product_id] = min(category, candidates.get(product_id, 3))
+            i += 1
+        return candidates
+
+    def _substring_candidates(self, query):
+        postings = []
+        for gram in trigrams(query):
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                break
+        return {product_id for product_id in candidates if query in self._folded[product_id]}
+
+    @profiled('search.search_ids')
+    def search_ids(self, query, limit=DEFAULT_LIMIT):
+        """Returns ranked product ids matching `query` (at most `limit`, or all if limit is None).
+
+        An empty query returns products in alphabetical order.
+        """
+        query = fold(query)
+        if not query:
+            ids = (product_id for _, is_word, product_id in self._prefixes if not is_word)
+            return list(ids) if limit is None else [product_id for _, product_id in zip(range(limit), ids)]
+        if len(query) < 3:
+            folded = self._folded
+            candidates = self._prefix_candidates(query)
+            if limit is None or len(candidates) < limit:
+                # Too short for trigrams: other substring matches rank last, so the scan is only needed to fill up
+                for product_id, name in list(folded.items()):
+                    if product_id not in candidates and query in name:
+                        candidates[product_id] = 3
+            ranked = ((category, len(folded[product_id]), folded[product_id], product_id)
+                      for product_id, category in candidates.items())
+        else:
+            candidates = self._substring_candidates(query)
+            ranked = (self._rank(query, product_id) for product_id in candidates)
+        count(ROWS_SCANNED, len(candidates))
+        ranked = sorted(ranked) if limit is None else heapq.nsmallest(limit, ranked)
+        return [key[-1] for key in ranked]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Returns ranked product names matching `query`."""
+        return [self._names[product_id] for product_id in self.search_ids(query, limit)]
@@ -0,0 +1,209 @@
+import threading
+
+import numpy as np
+
+from analytics import SalesCube
+from cache import cache_from_env
+from forecast import SalesVelocity
+from schema import SALES_SCHEMA
+from metrics import MetricsAggregator
+from profiling import deep_size, profiled
+from reservations import reservations_from_env
+from rollups import SalesRollups
+from search import ProductSearchIndex
+from storage import open_storage
+
+
+class Shop:
+    """One business's data: its storage backend plus the in-memory aggregates derived from it.
+
+    All writes go through the shop so the storage and every aggregate stay in step.
+    A shop may be shared by several sessions (see registry.py). A sale or bill
+    holds the stripe locks of its products (see reservations.py) from the
+    stock check until its decrement is in place, so checkouts of different
+    products only queue for `lock`, which serializes the storage writes
+    themselves, and for the aggregate updates that follow. Stock held for
+    open bills (`reservations`) cannot be sold to anyone else until it is
+    released or expires.
+    """
+
+    def __init__(self, storage, cache=None):
+        self.storage = storage
+        self.lock = threading.RLock()  # the storage's single writer
+        self._track_lock = threading.Lock()  # the running aggregates
+        self._rebuild_lock = threading.Lock()
+        self._writes = 0  # sale batches written so far, numbered in write order
+        self._pending = None  # (write number, sales) tracked while a rebuild is in progress
+        # Derived results reused across reruns until a write touches their datasets
+        self.cache = cache if cache is not None else cache_from_env()
+        self.stock = storage.stock
+        self.reservations = reservations_from_env(self.stock)
+        daily_totals = storage.daily_totals()
+        self.metrics = MetricsAggregator.from_frame(daily_totals)
+        self.rollups = SalesRollups.from_frame(daily_totals)
+        product_totals = storage.daily_product_totals()
+        self.analytics = SalesCube.from_frame(product_totals)
+        self.velocity = SalesVelocity.from_frame(self.stock, product_totals)
+        # Product ids in the search index are stock row positions
+        self.search = ProductSearchIndex()
+        self.search.extend(self.stock.column('Product Name'))
+
+    @profiled('shop.add_product')
+    def add_product(self, row):
+        """Adds a product to stock and the search index. Raises ValueError if the name already exists."""
+        with self.lock:
+            pos = self.storage.add_product(row)
+            self.search.add(row['Product Name'], pos)
+            self.cache.bump('stock')
+        return pos
+
+    @profiled('shop.add_products')
+    def add_products(self, products):
+        """Adds a batch of products ({column: array}) in one transaction and indexes them for search."""
+        with self.lock:
+            start = self.storage.add_products(products)
+            self.search.extend(products['Product Name'], start_id=start)
+            self.cache.bump('stock')
+        return start
+
+    def record_sale(self, sale, owner=None):
+        """Records a single sale (line totals in paise) and decrements stock."""
+        self.record_sales({col: [sale[col]] for col in SALES_SCHEMA}, owner)
+
+    @profiled('shop.record_sales')
+    def record_sales(self, sales, owner=None):
+        """Records a batch of sale rows ({column: array}); the whole batch succeeds or fails together.
+
+        Units reserved by anyone but `owner` are not available to the sale.
+        """
+        positions, totals = self._demand(sales['Product Name'], sales['Quantity Sold'])
+        with self.reservations.locked(positions):
+            self.reservations.check(positions, totals, owner)
+            write = self._write(self.storage.record_sales, sales)
+        self._track(sales, write)
+        self.cache.bump('stock', 'sales')
+
+    @profiled('shop.finalize_bill')
+    def finalize_bill(self, bill_record, owner=None):
+        """Saves a bill as one batched, all-or-nothing operation.
+
+        The storage assigns the next bill ID to `bill_record['bill_id']` unless
+        one is given. Each line becomes a sale row costed at the product's stock buy price;
+        quantities are aggregated per product and checked against stock in a
+        single vectorized pass before anything is written. The stock `owner`
+        reserved for the bill turns into the sale: its holds count as free for
+        this bill and are released once it is saved.
+        """
+        items = bill_record['items']
+        names = [item['name'] for item in items]
+        quantities = np.fromiter((item['qty'] for item in items), dtype=np.int64, count=len(items))
+        totals = np.fromiter((item['total'] for item in items), dtype=np.int64, count=len(items))
+        buy_prices = self.stock.take('Buy Price', self.stock.positions(names)) * quantities
+        sales = {
+            'Date': np.full(len(items), np.datetime64(str(bill_record['date']), 'D')),
+            'Product Name': np.array(names, dtype=object),
+            'Quantity Sold': quantities,
+            'Sale Price': totals,
+            'Buy Price': buy_prices,
+            'Profit': totals - buy_prices,
+        }
+        positions, totals = self._demand(sales['Product Name'], quantities)
+        with self.reservations.locked(positions):
+            self.reservations.check(positions, totals, owner)
+            write = self._write(self.storage.save_bill, bill_record, sales)
+            if owner is not None:
+                self.reservations.release(owner, positions)
+        if owner is not None:
+            self.reservations.release(owner)  # holds on products the bill no longer lists
+        self._track(sales, write)
+        self.cache.bump('stock', 'sales', 'bills')
+        return sales
+
+    def _demand(self, names, quantities):
+        """(unique stock positions, units per position) of a batch. Raises KeyError for unknown products."""
+        positions, inverse = np.unique(self.stock.positions(names), return_inverse=True)
+        totals = np.zeros(len(positions), dtype=np.int64)
+        np.add.at(totals, inverse, np.asarray(quantities, dtype=np.int64))
+        return positions, totals
+
+    def _write(self, write, *args):
+        """Runs one storage write (which also decrements the in-memory stock) and returns its write number."""
+        with self.lock:
+            write(*args)
+            self._writes += 1
+            return self._writes
+
+    def _track(self, sales, write):
+        """Feeds freshly written sales into the running aggregates."""
+        with self._track_lock:
+            self.metrics.add_batch(sales)
+            self.analytics.add_batch(sales)
+            self.rollups.add_batch(sales)
+            self.velocity.add_batch(sales)
+            if self._pending is not None:
+                self._pending.append((write, sales))
+
+    @profiled('shop.rebuild_aggregates')
+    def rebuild_aggregates(self, progress=None):
+        """Recomputes the metrics, analytics cube, rollups and sales velocity from storage and swaps them in.
+
+        The storage totals are read under the write lock, so they are a
+        consistent cut; the aggregates are then built without it and the sales
+        written after the cut are replayed before the swap, so checkouts
+        carry on during the rebuild. `progress(step, steps)` is called between
+        steps and may raise to abandon the rebuild.
+        """
+        with self._rebuild_lock:
+            try:
+                # Collecting starts before the cut: a batch is tracked after it is written, and
+                # batches written up to the cut (already in the totals) are skipped on replay
+                with self._track_lock:
+                    self._pending = []
+                with self.lock:
+                    daily_totals = self.storage.daily_totals()
+                    product_totals = self.storage.daily_product_totals()
+                    cut = self._writes
+                if progress:
+                    progress(1, 4)
+                metrics = MetricsAggregator.from_frame(daily_totals)
+                rollups = SalesRollups.from_frame(daily_totals)
+                if progress:
+                    progress(2, 4)
+                analytics = SalesCube.from_frame(product_totals)
+                velocity = SalesVelocity.from_frame(self.stock, product_totals)
+                if progress:
+                    progress(3, 4)
+                with self._track_lock:
+                    for write, sales in self._pending:
+                        if write > cut:
+                            metrics.add_batch(sales)
+                            analytics.add_batch(sales)
+                            rollups.add_batch(sales)
+                            velocity.add_batch(sales)
+                    self.metrics, self.analytics, self.rollups, self.velocity = metrics, analytics, rollups, velocity
+                    self._pending = None
+                self.cache.bump('sales')
+            finally:
+                with self._track_lock:
+                    self._pending = None
+
+    def footprint(self, sample=None):
+        """Approximate bytes the shop holds in memory (see profiling.deep_size).
+
+        Walks the shop while holding every stock stripe, the writer lock and
+        the aggregate lock, in the order writes take them, so no checkout
+        changes what is being walked; the cache is not walked but counts its
+        own bytes. Readers' structures (e.g. connection pools) may still change
+        and make the walk raise RuntimeError; the caller may retry.
+        """
+        with self.reservations.locked(), self.lock, self._track_lock:
+            return deep_size(self, {id(self.cache)}, sample) + self.cache.nbytes
+
+    def close(self):
+        self.cache.clear()
+        self.storage.close()
+
+
+def open_shop(business_name, read_only=False):
+    """Opens the configured storage for a business (see open_storage) and builds its aggregates."""
+    return Shop(open_storage(business_name, read_only))
@@ -0,0 +1,74 @@
+import numpy as np
+
+from ledger import Ledger, CHUNK_SIZE
+from schema import STOCK_SCHEMA
+
+
+class StockTable(Ledger):
+    """Stock ledger with hash indexes from key columns to row positions.
+
+    Rows are never moved once appended, so the indexes only have to be
+    maintained on insert; lookups and in-place updates are O(1).
+    """
+
+    # Columns that get a value -> row position index (e.g. a SKU column once stock has one).
+    KEY_COLUMNS = ('Product Name',)
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        super().__init__(STOCK_SCHEMA, chunk_size)
+        self._indexes = {col: {} for col in self.KEY_COLUMNS}
+
+    def __contains__(self, name):
+        return name in self._indexes['Product Name']
+
+    def position(self, value, col='Product Name'):
+        """Returns the row position for a key value, or None if it is not in stock."""
+        return self._indexes[col].get(value)
+
+    def positions(self, names):
+        """Returns the row positions of `names` as an array. Raises KeyError listing unknown products."""
+        index = self._indexes['Product Name']
+        missing = [name for name in names if name not in index]
+        if missing:
+            raise KeyError(f"Products not in stock: {', '.join(map(str, missing))}")
+        return np.fromiter((index[name] for name in names), dtype=np.int64, count=len(names))
+
+    def lookup(self, names, missing=-1):
+        """Returns the row positions of `names` as an array, with `missing` for unknown products."""
+        index = self._indexes['Product Name']
+        return np.fromiter((index.get(name, missing) for name in names), dtype=np.int64, count=len(names))
+
+    def row(self, name):
+        """Returns the product's row as a dict. Raises KeyError for unknown products."""
+        pos = self._indexes['Product Name'][name]
+        return {col: self.get(pos, col) for col in self.columns}
+
+    def append(self, row):
+        """Adds a product; raises ValueError if any key value is already indexed."""
+        for col in self.KEY_COLUMNS:
+            if row[col] in self._indexes[col]:
+                raise ValueError(f"{col} '{row[col]}' already exists in stock.")
+        pos = super().append(row)
+        for col in self.KEY_COLUMNS:
+            self._indexes[col][row[col]] = pos
+        return pos
+
+    def extend(self, columns):
+        """Adds a batch of products; the whole batch is rejected if any key is a duplicate."""
+        for col in self.KEY_COLUMNS:
+            keys = list(columns[col])
+            if len(set(keys)) != len(keys) or any(key in self._indexes[col] for key in keys):
+                raise ValueError(f"Duplicate {col} values in batch.")
+        start = len(self)
+        super().extend(columns)
+        for col in self.KEY_COLUMNS:
+            index = self._indexes[col]
+            for offset, key in enumerate(columns[col]):
+                index[key] = start + offset
+
+    def record_sale(self, name, quantity):
+        """Decrements the product's quantity and bumps its sales count in place."""
+        pos = self._indexes['Product Name'][name]
+        self.set(pos, 'Quantity', self.get(pos, 'Quantity') - quantity)
+        self.set(pos, 'Sales Count', self.get(pos, 'Sales Count') + quantity)
+        return pos
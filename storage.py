@@ -0,0 +1,644 @@
+import hashlib
+import os
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+from bills import BILL_COLUMNS, BILL_LINE_COLUMNS, BILL_PAGE_SIZE, BillHistory
+from ledger import Ledger
+from profiling import ROWS_SCANNED, count, profiled
+from schema import SALES_SCHEMA, STOCK_SCHEMA, apply_schema, day_keys
+from stock import StockTable
+
+# Display column name -> SQL column name
+STOCK_SQL_COLUMNS = {
+    'Product Name': 'name',
+    'Buy Price': 'buy_price',
+    'Sell Price': 'sell_price',
+    'Quantity': 'quantity',
+    'Sales Count': 'sales_count',
+}
+SALES_SQL_COLUMNS = {
+    'Date': 'date',
+    'Product Name': 'product_name',
+    'Quantity Sold': 'quantity_sold',
+    'Sale Price': 'sale_price',
+    'Buy Price': 'buy_price',
+    'Profit': 'profit',
+}
+BILL_SQL_COLUMNS = {
+    'Bill ID': 'bill_id',
+    'Date': 'date',
+    'Customer': 'customer',
+    'Bill Total': 'total',
+}
+TOTAL_COLUMNS = ['Sale Price', 'Buy Price', 'Profit']
+
+# Rows per chunk when streaming sales or bill lines out of storage.
+EXPORT_CHUNK_ROWS = 50000
+
+# Read connections kept per SQLite database (override with SELLSATHI_SQLITE_POOL).
+DEFAULT_POOL_SIZE = 4
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    name TEXT PRIMARY KEY,
+    buy_price INTEGER NOT NULL,
+    sell_price INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    sales_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    quantity_sold INTEGER NOT NULL,
+    sale_price INTEGER NOT NULL,
+    buy_price INTEGER NOT NULL,
+    profit INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date);
+CREATE INDEX IF NOT EXISTS idx_sales_product_name ON sales (product_name);
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY,
+    bill_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    customer TEXT NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bills_date ON bills (date);
+CREATE INDEX IF NOT EXISTS idx_bills_customer ON bills (customer, bill_id);
+CREATE TABLE IF NOT EXISTS bill_items (
+    bill_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bill_items_bill_id ON bill_items (bill_id);
+"""
+
+# Bill header columns as read back. Databases created before version 2 have REAL money
+# columns, so amounts are cast on the way out.
+BILL_HEADER_SQL = "bill_id, date, customer, CAST(total AS INTEGER)"
+
+# PRAGMA user_version of the current layout. Version 2 stores money as integer paise,
+# version 3 makes bill IDs unique.
+SQLITE_SCHEMA_VERSION = 3
+
+# Upgrades from the version before it (applied in order).
+SQLITE_MIGRATIONS = {
+    2: """
+UPDATE products SET buy_price = CAST(ROUND(buy_price * 100) AS INTEGER), sell_price = CAST(ROUND(sell_price * 100) AS INTEGER);
+UPDATE sales SET sale_price = CAST(ROUND(sale_price * 100) AS INTEGER), buy_price = CAST(ROUND(buy_price * 100) AS INTEGER),
+    profit = CAST(ROUND(profit * 100) AS INTEGER);
+UPDATE bills SET total = CAST(ROUND(total * 100) AS INTEGER);
+UPDATE bill_items SET price = CAST(ROUND(price * 100) AS INTEGER), total = CAST(ROUND(total * 100) AS INTEGER);
+""",
+    # Older bills used random IDs: every repeat of an ID after its first bill gets a new, unused one.
+    # Their items were saved under the shared ID and cannot be told apart, so they stay with the first bill.
+    3: """
+UPDATE bills SET bill_id = (SELECT MAX(bill_id) FROM bills) + id
+    WHERE id NOT IN (SELECT MIN(id) FROM bills GROUP BY bill_id);
+DROP INDEX IF EXISTS idx_bills_bill_id;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bills_bill_id_unique ON bills (bill_id);
+""",
+}
+
+
+class ConnectionPool:
+    """Reusable read connections to one SQLite database.
+
+    In WAL mode readers do not block each other or the writer, so sessions
+    sharing a shop each borrow their own connection for a query instead of
+    queueing on one. At most `size` connections are open; further readers wait
+    for one to be returned.
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of the block."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class StoreInUseError(RuntimeError):
+    """Raised when a business's durable store is already open in another process."""
+
+
+class StoreLock:
+    """Exclusive lock on a business's durable store, held for as long as it is open.
+
+    The app and cli.py each keep the stock in memory and check sales against
+    that copy, so two processes writing one store would both sell the same
+    units. The lock is an OS file lock on `<store>.lock`: it is released when
+    the store is closed or the process exits, however it exits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self._file.close()
+            raise StoreInUseError(f"The store is open in another process (e.g. the running app): {path}. "
+                                  "The app lets go of a business once no session has used it for "
+                                  "SELLSATHI_LEASE_TTL seconds; try again then, or stop it.") from None
+
+    def release(self):
+        self._file.close()
+
+
+class Storage:
+    """Base storage backend.
+
+    The stock table always lives in memory (it is the hot lookup path and is
+    kept in sync through its name index); sales and bills are kept by the
+    concrete backend. Writes are validated first, persisted by the backend's
+    `_write_*` hook, and only then applied to the in-memory stock.
+    """
+
+    # Whether the data survives the storage being closed (and so may be dropped from memory and reopened).
+    durable = False
+
+    def __init__(self):
+        self.stock = StockTable()
+        self.store_lock = None  # set by open_storage for durable backends
+
+    # --- Writes ---
+
+    def add_product(self, row):
+        """Adds a product to stock and returns its row position. Raises ValueError if the name already exists."""
+        if row['Product Name'] in self.stock:
+            raise ValueError(f"Product '{row['Product Name']}' already exists.")
+        return self.add_products({col: [row[col]] for col in STOCK_SCHEMA})
+
+    def add_products(self, products):
+        """Adds a batch of products ({column: array}) in one transaction; returns the first new row position.
+
+        Raises ValueError (and writes nothing) if any name is repeated or already in stock.
+        """
+        names = list(products['Product Name'])
+        if len(set(names)) != len(names) or any(name in self.stock for name in names):
+            raise ValueError("Product names must be new and unique.")
+        start = len(self.stock)
+        self._write_products(products)
+        self.stock.extend(products)
+        return start
+
+    def record_sales(self, sales):
+        """Records a batch of sale rows ({column: array}) and decrements stock, all or nothing."""
+        positions, totals = self._stock_updates(sales['Product Name'], sales['Quantity Sold'])
+        self._write_sales(sales, positions, totals)
+        self._apply_stock_updates(positions, totals)
+
+    def save_bill(self, bill_record, sales):
+        """Saves a finalized bill with its sale rows and stock decrements in one transaction.
+
+        Unless one is given, the backend allocates the next bill ID and stores it in `bill_record['bill_id']`.
+        """
+        positions, totals = self._stock_updates(sales['Product Name'], sales['Quantity Sold'])
+        self._write_bill(bill_record, sales, positions, totals)
+        self._apply_stock_updates(positions, totals)
+
+    @profiled('storage.stock_updates')
+    def _stock_updates(self, names, quantities):
+        """Aggregates sold quantities per product and checks them against stock in one vectorized pass.
+
+        Returns (unique stock positions, total quantity sold per position). Raises
+        KeyError for unknown products and ValueError if any product would go negative.
+        """
+        quantities = np.asarray(quantities, dtype=np.int64)
+        if (quantities <= 0).any():
+            raise ValueError("Sold quantities must be positive.")
+        positions, inverse = np.unique(self.stock.positions(names), return_inverse=True)
+        totals = np.zeros(len(positions), dtype=np.int64)
+        np.add.at(totals, inverse, quantities)
+        available = self.stock.take('Quantity', positions)
+        short = totals > available
+        if short.any():
+            details = ', '.join(f"'{name}' ({have} available, {want} needed)" for name, have, want in zip(
+                self.stock.take('Product Name', positions[short]), available[short], totals[short]))
+            raise ValueError(f"Not enough stock for {details}.")
+        return positions, totals
+
+    def _apply_stock_updates(self, positions, totals):
+        self.stock.add_at('Quantity', positions, -totals)
+        self.stock.add_at('Sales Count', positions, totals)
+
+    # --- Backend hooks ---
+
+    def _write_products(self, products):
+        raise NotImplementedError
+
+    def _write_sales(self, sales, positions, totals):
+        raise NotImplementedError
+
+    def _write_bill(self, bill_record, sales, positions, totals):
+        raise NotImplementedError
+
+    def sales_frame(self, columns=None, start=None, end=None):
+        """Returns sales rows (optionally only `columns`, and dates within [start, end])."""
+        raise NotImplementedError
+
+    def iter_sales(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yields sales within [start, end] as DataFrames of at most `chunk_rows` rows."""
+        raise NotImplementedError
+
+    def iter_bill_lines(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yields bill line items within [start, end], one row per line with its bill header columns."""
+        raise NotImplementedError
+
+    def iter_bills(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yields saved bills dated within [start, end] one at a time, each with its `items`."""
+        bill = None
+        for chunk in self.iter_bill_lines(start, end, chunk_rows):
+            for bill_id, date, customer, total, name, qty, price, line_total in chunk.itertuples(index=False):
+                if bill is None or bill['bill_id'] != bill_id:
+                    if bill is not None:
+                        yield bill
+                    bill = {'bill_id': bill_id, 'date': date, 'customer': customer, 'total': total, 'items': []}
+                bill['items'].append({'name': name, 'qty': qty, 'price': price, 'total': line_total})
+        if bill is not None:
+            yield bill
+
+    def daily_totals(self):
+        """Returns one row per date with the summed Sale Price, Buy Price and Profit."""
+        raise NotImplementedError
+
+    def daily_product_totals(self):
+        """Returns one row per (date, product) with the summed Quantity Sold, Sale Price and Profit."""
+        raise NotImplementedError
+
+    def bill_history(self):
+        """Returns saved bill headers (bill_id, date, customer, total) in bill ID order."""
+        raise NotImplementedError
+
+    def bill_items(self, bill_id):
+        """Returns the line items of a saved bill."""
+        raise NotImplementedError
+
+    def bill(self, bill_id):
+        """Returns a saved bill (header fields plus `items`), or None."""
+        raise NotImplementedError
+
+    def bill_page(self, page=0, page_size=BILL_PAGE_SIZE, customer=None, start=None, end=None, sort='Bill ID', ascending=False):
+        """Returns (one page of BILL_COLUMNS headers, number of matching bills); sorted by `sort`, newest first by default."""
+        raise NotImplementedError
+
+    def close(self):
+        if self.store_lock is not None:
+            self.store_lock.release()
+            self.store_lock = None
+
+
+class MemoryStorage(Storage):
+    """Session-only backend: sales in a columnar Ledger, bills in a BillHistory. Nothing survives a restart."""
+
+    def __init__(self):
+        super().__init__()
+        self.sales = Ledger(SALES_SCHEMA)
+        self.bills = BillHistory()
+
+    def _write_products(self, products):
+        pass
+
+    @profiled('storage.write_sales')
+    def _write_sales(self, sales, positions, totals):
+        self.sales.extend(sales)
+
+    @profiled('storage.write_bill')
+    def _write_bill(self, bill_record, sales, positions, totals):
+        self.bills.add(bill_record)
+        self.sales.extend(sales)
+
+    @profiled('storage.sales_frame')
+    def sales_frame(self, columns=None, start=None, end=None):
+        df = self.sales.frame()
+        if start is not None or end is not None:
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= df['Date'] >= pd.Timestamp(start)
+            if end is not None:
+                mask &= df['Date'] <= pd.Timestamp(end)
+            df = df[mask]
+        count(ROWS_SCANNED, len(self.sales))
+        return df[columns] if columns is not None else df
+
+    def iter_sales(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        df = self.sales_frame(start=start, end=end)
+        for offset in range(0, len(df), chunk_rows):
+            yield df.iloc[offset:offset + chunk_rows]
+
+    def iter_bill_lines(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        return self.bills.iter_lines(start, end, chunk_rows)
+
+    def daily_totals(self):
+        df = self.sales.frame()
+        return df.groupby('Date', as_index=False)[TOTAL_COLUMNS].sum()
+
+    def daily_product_totals(self):
+        df = self.sales.frame()
+        return df.groupby(['Date', 'Product Name'], as_index=False, observed=True)[['Quantity Sold', 'Sale Price', 'Profit']].sum()
+
+    def bill_history(self):
+        return self.bills.history()
+
+    def bill_items(self, bill_id):
+        return self.bills.bill_items(bill_id)
+
+    def bill(self, bill_id):
+        return self.bills.get(bill_id)
+
+    @profiled('storage.bill_page')
+    def bill_page(self, page=0, page_size=BILL_PAGE_SIZE, customer=None, start=None, end=None, sort='Bill ID', ascending=False):
+        return self.bills.page(page, page_size, customer, start, end, sort, ascending)
+
+
+class SQLiteStorage(Storage):
+    """Durable backend on a local SQLite database in WAL mode.
+
+    Stock is loaded once into the in-memory StockTable; sales and bills stay on
+    disk and are read back with only the requested columns and date range.
+    Writes use one connection (SQLite allows a single writer; the owning shop
+    serializes them), reads borrow a connection from a pool.
+    """
+
+    durable = True
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE, read_only=False):
+        super().__init__()
+        self.path = path
+        if read_only:
+            # A WAL reader: sees the last committed state and never blocks, or is blocked by, the writer
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No SQLite store at {path}.")
+            self._conn = sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA query_only = ON")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < SQLITE_SCHEMA_VERSION:
+                raise ValueError(f"{path} predates this version; open it for writing once to upgrade it.")
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SQLITE_SCHEMA)
+            self._migrate()
+        self._load_stock()
+        self._pool = ConnectionPool(path, pool_size)
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SQLITE_SCHEMA_VERSION:
+            return
+        with self._conn:
+            for target in range(version + 1, SQLITE_SCHEMA_VERSION + 1):
+                for statement in SQLITE_MIGRATIONS.get(target, '').split(';'):
+                    if statement.strip():
+                        self._conn.execute(statement)
+            self._conn.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+
+    def _load_stock(self):
+        sql_columns = ', '.join(STOCK_SQL_COLUMNS.values())
+        rows = self._conn.execute(f"SELECT {sql_columns} FROM products ORDER BY rowid").fetchall()
+        if rows:
+            values = list(zip(*rows))
+            self.stock.extend({col: values[i] for i, col in enumerate(STOCK_SCHEMA)})
+
+    def _write_products(self, products):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO products (name, buy_price, sell_price, quantity, sales_count) VALUES (?, ?, ?, ?, ?)",
+                zip(map(str, products['Product Name']),
+                    np.asarray(products['Buy Price'], dtype=np.int64).tolist(),
+                    np.asarray(products['Sell Price'], dtype=np.int64).tolist(),
+                    np.asarray(products['Quantity'], dtype=np.int64).tolist(),
+                    np.asarray(products['Sales Count'], dtype=np.int64).tolist()))
+
+    def _insert_sales(self, sales, positions, totals):
+        self._conn.executemany(
+            "INSERT INTO sales (date, product_name, quantity_sold, sale_price, buy_price, profit) VALUES (?, ?, ?, ?, ?, ?)",
+            zip(day_keys(sales['Date']).tolist(), map(str, sales['Product Name']),
+                np.asarray(sales['Quantity Sold'], dtype=np.int64).tolist(),
+                np.asarray(sales['Sale Price'], dtype=np.int64).tolist(),
+                np.asarray(sales['Buy Price'], dtype=np.int64).tolist(),
+                np.asarray(sales['Profit'], dtype=np.int64).tolist()))
+        self._conn.executemany(
+            "UPDATE products SET quantity = quantity - ?, sales_count = sales_count + ? WHERE name = ?",
+            zip(totals.tolist(), totals.tolist(), self.stock.take('Product Name', positions)))
+
+    @profiled('storage.write_sales')
+    def _write_sales(self, sales, positions, totals):
+        with self._conn:
+            self._insert_sales(sales, positions, totals)
+
+    @profiled('storage.write_bill')
+    def _write_bill(self, bill_record, sales, positions, totals):
+        with self._conn:
+            # A missing ID is allocated inside the write transaction, so concurrent writers cannot collide
+            bill_id = bill_record.get('bill_id')
+            cursor = self._conn.execute(
+                "INSERT INTO bills (bill_id, date, customer, total) "
+                "VALUES (COALESCE(?, (SELECT COALESCE(MAX(bill_id), 0) + 1 FROM bills)), ?, ?, ?)",
+                (None if bill_id is None else int(bill_id), str(bill_record['date']), bill_record['customer'],
+                 int(bill_record['total'])))
+            bill_record['bill_id'] = self._conn.execute(
+                "SELECT bill_id FROM bills WHERE id = ?", (cursor.lastrowid,)).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO bill_items (bill_id, name, qty, price, total) VALUES (?, ?, ?, ?, ?)",
+                [(int(bill_record['bill_id']), item['name'], int(item['qty']), int(item['price']), int(item['total']))
+                 for item in bill_record['items']])
+            self._insert_sales(sales, positions, totals)
+
+    @profiled('storage.sales_frame')
+    def sales_frame(self, columns=None, start=None, end=None):
+        columns = list(columns) if columns is not None else list(SALES_SQL_COLUMNS)
+        select = ', '.join(f'{SALES_SQL_COLUMNS[col]} AS "{col}"' for col in columns)
+        where, params = date_range_clause('date', start, end)
+        with self._pool.connection() as conn:
+            df = pd.read_sql_query(f"SELECT {select} FROM sales{where} ORDER BY id", conn, params=params)
+        count(ROWS_SCANNED, len(df))
+        return apply_schema(df, SALES_SCHEMA)
+
+    def _iter_query(self, query, params, columns, chunk_rows):
+        with self._pool.connection() as conn:
+            cursor = conn.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    yield pd.DataFrame(rows, columns=columns)
+            finally:
+                cursor.close()
+
+    def iter_sales(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        where, params = date_range_clause('date', start, end)
+        query = f"SELECT {', '.join(SALES_SQL_COLUMNS.values())} FROM sales{where} ORDER BY id"
+        for chunk in self._iter_query(query, params, list(SALES_SQL_COLUMNS), chunk_rows):
+            yield apply_schema(chunk, SALES_SCHEMA)
+
+    def iter_bill_lines(self, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        where, params = date_range_clause('b.date', start, end)
+        query = ("SELECT b.bill_id, b.date, b.customer, CAST(b.total AS INTEGER), i.name, i.qty, "
+                 "CAST(i.price AS INTEGER), CAST(i.total AS INTEGER) "
+                 f"FROM bills b JOIN bill_items i ON i.bill_id = b.bill_id{where} ORDER BY b.id, i.rowid")
+        yield from self._iter_query(query, params, BILL_LINE_COLUMNS, chunk_rows)
+
+    def _fetch(self, query, params=()):
+        with self._pool.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _read_frame(self, query):
+        with self._pool.connection() as conn:
+            return pd.read_sql_query(query, conn)
+
+    def daily_totals(self):
+        return self._read_frame(
+            'SELECT date AS "Date", SUM(sale_price) AS "Sale Price", SUM(buy_price) AS "Buy Price", '
+            'SUM(profit) AS "Profit" FROM sales GROUP BY date ORDER BY date')
+
+    def daily_product_totals(self):
+        return self._read_frame(
+            'SELECT date AS "Date", product_name AS "Product Name", SUM(quantity_sold) AS "Quantity Sold", '
+            'SUM(sale_price) AS "Sale Price", SUM(profit) AS "Profit" FROM sales GROUP BY date, product_name')
+
+    def bill_history(self):
+        rows = self._fetch(f"SELECT {BILL_HEADER_SQL} FROM bills ORDER BY bill_id")
+        return [{'bill_id': r[0], 'date': r[1], 'customer': r[2], 'total': r[3]} for r in rows]
+
+    def bill_items(self, bill_id):
+        rows = self._fetch(
+            "SELECT name, qty, CAST(price AS INTEGER), CAST(total AS INTEGER) FROM bill_items WHERE bill_id = ? ORDER BY rowid", (int(bill_id),))
+        return [{'name': r[0], 'qty': r[1], 'price': r[2], 'total': r[3]} for r in rows]
+
+    def bill(self, bill_id):
+        rows = self._fetch(f"SELECT {BILL_HEADER_SQL} FROM bills WHERE bill_id = ?", (int(bill_id),))
+        row = rows[0] if rows else None
+        if row is None:
+            return None
+        return {'bill_id': row[0], 'date': row[1], 'customer': row[2], 'total': row[3], 'items': self.bill_items(bill_id)}
+
+    @profiled('storage.bill_page')
+    def bill_page(self, page=0, page_size=BILL_PAGE_SIZE, customer=None, start=None, end=None, sort='Bill ID', ascending=False):
+        where, params = date_range_clause('date', start, end)
+        if customer is not None:
+            where = (where + " AND" if where else " WHERE") + " customer = ?"
+            params.append(customer)
+        direction = "ASC" if ascending else "DESC"
+        with self._pool.connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM bills{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {BILL_HEADER_SQL} FROM bills{where} ORDER BY {BILL_SQL_COLUMNS[sort]} {direction}, bill_id {direction} "
+                "LIMIT ? OFFSET ?",
+                params + [page_size, page * page_size]).fetchall()
+        return pd.DataFrame(rows, columns=BILL_COLUMNS), total
+
+    def close(self):
+        self._pool.close()
+        self._conn.close()
+        super().close()
+
+
+def date_range_clause(column, start=None, end=None):
+    """Returns (' WHERE ...' or '', params) restricting an ISO date column to [start, end]."""
+    where, params = [], []
+    if start is not None:
+        where.append(f"{column} >= ?")
+        params.append(str(start))
+    if end is not None:
+        where.append(f"{column} <= ?")
+        params.append(str(end))
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+
+def business_slug(business_name):
+    """Turns a business name into a safe file name, e.g. 'Sharma General Store' -> 'sharma-general-store-1aeb846e'.
+
+    The suffix is a hash of the exact name, so names that read the same once
+    lowered and stripped ('Sharma Store', 'sharma-store', or any two
+    all-Devanagari names) still get separate files.
+    """
+    readable = re.sub(r'[^a-z0-9]+', '-', business_name.lower()).strip('-') or 'business'
+    return f"{readable}-{hashlib.sha256(business_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def open_storage(business_name, read_only=False):
+    """Opens the storage backend configured by SELLSATHI_STORAGE ('sqlite' by default, 'journal' or 'memory').
+
+    Durable stores are locked while open (see StoreLock); raises StoreInUseError
+    if another process has this business open. With `read_only` the store is
+    read without the lock, so exports can run while the app has the business
+    open: SQLite through a WAL reader, the journal as its newest snapshot plus
+    the events after it. A read-only storage must not be written to.
+    """
+    backend = os.environ.get('SELLSATHI_STORAGE', 'sqlite')
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend not in ('journal', 'sqlite'):
+        raise ValueError(f"Unknown storage backend '{backend}'.")
+    data_dir = os.environ.get('SELLSATHI_DATA_DIR', 'data')
+    pool_size = int(os.environ.get('SELLSATHI_SQLITE_POOL', DEFAULT_POOL_SIZE))
+    sqlite_path = os.path.join(data_dir, f"{business_slug(business_name)}.sqlite3")
+    if read_only:
+        if backend == 'journal':
+            from journal import journal_path, state_at
+            if not os.path.isdir(journal_path(business_name)):
+                raise FileNotFoundError(f"No journal at {journal_path(business_name)}.")
+            return state_at(journal_path(business_name))[0]
+        return SQLiteStorage(sqlite_path, pool_size, read_only=True)
+    os.makedirs(data_dir, exist_ok=True)
+    lock = StoreLock(os.path.join(data_dir, f"{business_slug(business_name)}.lock"))
+    try:
+        if backend == 'journal':
+            # journal.py builds on MemoryStorage, so it is imported here rather than at the top
+            from journal import journal_from_env
+            storage = journal_from_env(business_name)
+        else:
+            storage = SQLiteStorage(sqlite_path, pool_size)
+    except BaseException:
+        lock.release()
+        raise
+    storage.store_lock = lock
+    return storage
@@ -0,0 +1,49 @@
+import streamlit as st
+
+from profiling import timed
+
+PAGE_SIZES = (25, 50, 100, 250)
+
+
+def paged_table(key, fetch, sort_columns, default_sort=None, default_ascending=True, signature=None):
+    """Renders one page of a large table; sorting, filtering and slicing happen server-side.
+
+    `fetch(sort, ascending, page, page_size)` returns (page DataFrame, total rows),
+    so only the visible window is ever built and sent to the browser. Sort column,
+    order and page size live in session state under `key`, so they survive
+    reruns. The page goes back to 1 whenever the sort, the page size or the
+    caller's `signature` (e.g. the active filter) changes.
+    """
+    sort_key, order_key, size_key, page_key, sig_key = (f"{key}_sort", f"{key}_order", f"{key}_page_size",
+                                                          f"{key}_page", f"{key}_signature")
+    if sort_key not in st.session_state:
+        st.session_state[sort_key] = default_sort if default_sort is not None else sort_columns[0]
+        st.session_state[order_key] = "Ascending" if default_ascending else "Descending"
+        st.session_state[size_key] = PAGE_SIZES[0]
+
+    col_t1, col_t2, col_t3, col_t4 = st.columns([2, 2, 1, 1])
+    sort = col_t1.selectbox("Sort by", sort_columns, key=sort_key)
+    ascending = col_t2.radio("Order", ("Ascending", "Descending"), key=order_key, horizontal=True) == "Ascending"
+    page_size = col_t3.selectbox("Rows per page", PAGE_SIZES, key=size_key)
+
+    current = (sort, ascending, page_size, signature)
+    if st.session_state.get(sig_key) != current:
+        st.session_state[sig_key] = current
+        st.session_state[page_key] = 1
+    page = st.session_state.get(page_key, 1)
+
+    with timed(f"table.{key}.fetch"):
+        window, total = fetch(sort, ascending, page - 1, page_size)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # The table shrank (e.g. a new filter); clamp before the page widget is drawn
+        st.session_state[page_key] = page = pages
+        window, total = fetch(sort, ascending, page - 1, page_size)
+    col_t4.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+
+    if total:
+        with timed(f"table.{key}.render"):
+            st.dataframe(window, width='stretch', hide_index=True)
+        first = (page - 1) * page_size
+        st.caption(f"Rows {first + 1}–{first + len(window)} of {total}")
+    return total
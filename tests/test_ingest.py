@@ -0,0 +1,55 @@
+import datetime
+
+import numpy as np
+
+from ingest import ingest_records
+from shop import Shop
+from storage import MemoryStorage
+
+
+def _shop():
+    shop = Shop(MemoryStorage())
+    shop.add_products({
+        'Product Name': np.array(['Rice', 'Soap'], dtype=object),
+        'Buy Price': np.array([4000, 2000]),
+        'Sell Price': np.array([5000, 2500]),
+        'Quantity': np.array([10, 3], dtype=np.int32),
+        'Sales Count': np.zeros(2, dtype=np.int64),
+    })
+    return shop
+
+
+def test_rejected_rows_are_reported_with_their_reason():
+    shop = _shop()
+    records = [
+        {'Product Name': 'Rice', 'Quantity Sold': '4', 'Date': '2024-06-01'},
+        {'Product Name': 'Sugar', 'Quantity Sold': '1'},
+        {'Product Name': 'Rice', 'Quantity Sold': '1.5'},
+        {'Product Name': 'Rice', 'Quantity Sold': '1', 'Sale Price': '-3'},
+        {'Product Name': 'Rice', 'Quantity Sold': '1', 'Date': 'yesterday-ish'},
+        {'Product Name': 'Soap', 'Quantity Sold': '2'},
+        {'Product Name': 'Soap', 'Quantity Sold': '2'},  # only 1 Soap left by now
+        {'Product Name': 'Soap', 'Quantity Sold': '1'},  # a smaller sale still fits
+    ]
+    report = ingest_records(shop, records, chunk_rows=3, today=datetime.date(2024, 6, 2))
+
+    assert report.added == 3
+    assert report.rejected_frame().values.tolist() == [
+        [2, 'Sugar', "product not in stock"],
+        [3, 'Rice', "quantity sold must be a whole number >= 1"],
+        [4, 'Rice', "sale price must be at least 0.01"],
+        [5, 'Rice', "invalid date"],
+        [7, 'Soap', "not enough stock"],
+    ]
+    assert shop.stock.take('Quantity', np.array([0, 1])).tolist() == [6, 0]
+    assert shop.storage.sales_frame()['Quantity Sold'].sum() == 7
+    shop.close()
+
+
+def test_units_held_for_open_bills_cannot_be_ingested():
+    shop = _shop()
+    shop.reservations.reserve('counter-1', 'Soap', 2)
+    report = ingest_records(shop, [{'Product Name': 'Soap', 'Quantity Sold': '2'}])
+    assert report.added == 0
+    assert report.rejected == [(1, 'Soap', "not enough stock")]
+    shop.close()
@@ -0,0 +1,122 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from journal import JournalStorage, list_segments, state_at
+from shop import Shop
+
+PRODUCTS = 10
+
+
+def _fill(shop, rng, batches):
+    for batch in range(batches):
+        positions = rng.integers(0, PRODUCTS, 5)
+        quantities = rng.integers(1, 4, 5)
+        sell = shop.stock.take('Sell Price', positions) * quantities
+        buy = shop.stock.take('Buy Price', positions) * quantities
+        shop.record_sales({
+            'Date': np.datetime64(datetime.date.today(), 'D') - rng.integers(0, 10, 5),
+            'Product Name': shop.stock.take('Product Name', positions),
+            'Quantity Sold': quantities, 'Sale Price': sell, 'Buy Price': buy, 'Profit': sell - buy,
+        })
+        if batch % 3 == 0:
+            name = shop.stock.get(int(rng.integers(PRODUCTS)), 'Product Name')
+            shop.finalize_bill({'date': str(datetime.date.today()), 'customer': f"Customer {batch}",
+                                'total': 300, 'items': [{'name': name, 'qty': 2, 'price': 150, 'total': 300}]})
+
+
+def _state(storage):
+    return {
+        'stock': storage.stock.frame(),
+        'sales': storage.sales_frame(),
+        'bills': pd.DataFrame(storage.bill_history()),
+        'daily': storage.daily_totals(),
+        'products': storage.daily_product_totals().astype({'Product Name': str}),
+    }
+
+
+def _assert_same(a, b):
+    for name in a:
+        pd.testing.assert_frame_equal(a[name].reset_index(drop=True), b[name].reset_index(drop=True), check_dtype=False)
+
+
+def _open(directory, **kwargs):
+    shop = Shop(JournalStorage(str(directory), snapshot_events=7, **kwargs))
+    if not len(shop.stock):
+        shop.add_products({
+            'Product Name': np.array([f"Item {i}" for i in range(PRODUCTS)], dtype=object),
+            'Buy Price': np.full(PRODUCTS, 100), 'Sell Price': np.full(PRODUCTS, 150),
+            'Quantity': np.full(PRODUCTS, 10 ** 6, dtype=np.int32), 'Sales Count': np.zeros(PRODUCTS, dtype=np.int64),
+        })
+    return shop
+
+
+def test_restart_replays_to_the_same_state(tmp_path):
+    shop = _open(tmp_path)
+    _fill(shop, np.random.default_rng(0), 40)
+    before, events = _state(shop.storage), shop.storage.seq
+    shop.close()
+
+    reopened = _open(tmp_path)
+    assert reopened.storage.seq == events
+    _assert_same(before, _state(reopened.storage))
+    # Writes continue where the journal left off, and survive another restart
+    _fill(reopened, np.random.default_rng(1), 10)
+    after = _state(reopened.storage)
+    reopened.close()
+    again = _open(tmp_path)
+    _assert_same(after, _state(again.storage))
+    _assert_same(after, _state(state_at(str(tmp_path))[0]))
+    again.close()
+
+
+def test_a_record_cut_short_is_dropped_on_restart(tmp_path):
+    shop = _open(tmp_path)
+    _fill(shop, np.random.default_rng(0), 5)
+    before, events = _state(shop.storage), shop.storage.seq
+    shop.close()
+    with open(list_segments(str(tmp_path))[-1][1], 'ab') as f:
+        f.write(b'\x02\x40\x00\x00')  # a crash in the middle of a record header
+
+    reopened = _open(tmp_path)
+    assert reopened.storage.seq == events
+    _assert_same(before, _state(reopened.storage))
+    reopened.close()
+
+
+def test_an_event_that_fails_to_apply_is_not_replayed(tmp_path):
+    shop = _open(tmp_path)
+    _fill(shop, np.random.default_rng(0), 3)
+    before, events = _state(shop.storage), shop.storage.seq
+
+    def fail(sales):
+        raise RuntimeError("disk full")
+
+    shop.storage.sales.extend = fail
+    with pytest.raises(RuntimeError):
+        _fill(shop, np.random.default_rng(1), 1)
+    assert shop.storage.seq == events
+    shop.close()
+
+    reopened = _open(tmp_path)
+    assert reopened.storage.seq == events
+    _assert_same(before, _state(reopened.storage))
+    reopened.close()
+
+
+def test_covered_segments_are_pruned_unless_history_is_kept(tmp_path):
+    for keep_history, directory in ((False, tmp_path / 'pruned'), (True, tmp_path / 'kept')):
+        shop = _open(directory, keep_history=keep_history)
+        _fill(shop, np.random.default_rng(0), 40)
+        shop.storage.snapshot()
+        segments = list_segments(str(directory))
+        shop.close()
+        if keep_history:
+            assert segments[0][0] == 0
+            assert state_at(str(directory), seq=3)[1] == 3
+        else:
+            assert len(segments) <= 2
+            with pytest.raises(ValueError):
+                state_at(str(directory), seq=3)
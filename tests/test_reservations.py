@@ -0,0 +1,125 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from bench import stress_checkouts
+from shop import Shop
+from storage import MemoryStorage
+
+UNITS = 40
+
+
+def _shop(products=3, units=UNITS):
+    shop = Shop(MemoryStorage())
+    shop.add_products({
+        'Product Name': np.array([f"Item {i}" for i in range(products)], dtype=object),
+        'Buy Price': np.full(products, 100),
+        'Sell Price': np.full(products, 150),
+        'Quantity': np.full(products, units, dtype=np.int32),
+        'Sales Count': np.zeros(products, dtype=np.int64),
+    })
+    return shop
+
+
+def _assert_consistent(shop, units=UNITS):
+    stock = shop.stock.frame().set_index('Product Name')
+    sold = shop.storage.sales_frame().groupby('Product Name', observed=True)['Quantity Sold'].sum()
+    assert (stock['Quantity'] >= 0).all()
+    assert (stock['Quantity'] + stock['Sales Count'] == units).all()
+    assert (sold.reindex(stock.index, fill_value=0) == stock['Sales Count']).all()
+
+
+def test_concurrent_checkouts_never_oversell():
+    shop = _shop()
+    names = list(shop.stock.column('Product Name'))
+    outcomes = {'bills': 0, 'sales': 0, 'rejected': 0}
+    outcomes_lock = threading.Lock()
+    start = threading.Barrier(8)
+
+    def counter(index):
+        rng = np.random.default_rng(index)
+        owner = f"counter-{index}"
+        done = dict.fromkeys(outcomes, 0)
+        start.wait()
+        for checkout in range(60):
+            if checkout % 3 == 0:
+                name, qty = names[int(rng.integers(len(names)))], int(rng.integers(1, 4))
+                sale = {'Date': str(datetime.date.today()), 'Product Name': name, 'Quantity Sold': qty,
+                        'Sale Price': qty * 150, 'Buy Price': qty * 100, 'Profit': qty * 50}
+                try:
+                    shop.record_sale(sale)
+                    done['sales'] += 1
+                except ValueError:
+                    done['rejected'] += 1
+                continue
+            items = []
+            for _ in range(int(rng.integers(1, 4))):
+                name, qty = names[int(rng.integers(len(names)))], int(rng.integers(1, 4))
+                try:
+                    shop.reservations.reserve(owner, name, qty)
+                except ValueError:
+                    done['rejected'] += 1
+                    continue
+                items.append({'name': name, 'qty': qty, 'price': 150, 'total': qty * 150})
+            if not items:
+                continue
+            bill = {'date': str(datetime.date.today()), 'customer': owner,
+                    'total': sum(item['total'] for item in items), 'items': items}
+            try:
+                shop.finalize_bill(bill, owner)
+                done['bills'] += 1
+            except ValueError:
+                done['rejected'] += 1
+                shop.reservations.release(owner)
+        with outcomes_lock:
+            for key, value in done.items():
+                outcomes[key] += value
+
+    threads = [threading.Thread(target=counter, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 8 counters asking for far more than the 3 x 40 units on hand: some must be turned away
+    assert outcomes['rejected'] > 0
+    assert outcomes['bills'] + outcomes['sales'] > 0
+    _assert_consistent(shop)
+    assert shop.reservations.stats() == {'holds': 0, 'units': 0, 'owners': 0}
+    shop.close()
+
+
+def test_reservations_hold_stock_from_other_owners():
+    shop = _shop(products=1, units=5)
+    shop.reservations.reserve('a', 'Item 0', 4)
+    with pytest.raises(ValueError):
+        shop.reservations.reserve('b', 'Item 0', 2)
+    sale = {'Date': str(datetime.date.today()), 'Product Name': 'Item 0', 'Quantity Sold': 2,
+            'Sale Price': 300, 'Buy Price': 200, 'Profit': 100}
+    with pytest.raises(ValueError):
+        shop.record_sale(sale)
+    # The holder itself may sell what it reserved
+    shop.record_sale(sale, owner='a')
+    shop.reservations.release('a')
+    assert shop.reservations.available('Item 0', 'b') == 3
+    shop.close()
+
+
+def test_expired_holds_free_their_stock():
+    shop = _shop(products=1, units=5)
+    shop.reservations.ttl = 0.05
+    shop.reservations.reserve('a', 'Item 0', 5)
+    assert shop.reservations.available('Item 0', 'b') == 0
+    time.sleep(0.1)
+    assert shop.reservations.available('Item 0', 'b') == 5
+    assert shop.reservations.stats()['owners'] == 0
+    shop.close()
+
+
+def test_stress_with_scarce_stock_stays_consistent():
+    result = stress_checkouts(MemoryStorage(), counters=8, products=5, units=30, seconds=0.5, think_ms=0)
+    assert result['rejected'] + result['failed'] > 0
+    assert result['consistent']
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+from schema import MONEY_COLUMNS, STOCK_SCHEMA, coerce_column, to_rupees
+
+# Columns a stock import file must provide (Sales Count is optional and defaults to 0).
+IMPORT_COLUMNS = ['Product Name', 'Buy Price', 'Sell Price', 'Quantity']
+
+# Rows read, validated and committed per chunk during an import.
+IMPORT_CHUNK_ROWS = 10000
+
+EXPORT_DATASETS = ('stock', 'sales', 'bills')
+FORMATS = ('csv', 'parquet')
+
+# Money columns (stored as paise) that are written out in rupees.
+EXPORT_MONEY_COLUMNS = MONEY_COLUMNS + ('Bill Total', 'Unit Price', 'Line Total')
+
+
+def detect_format(file_name):
+    """Returns 'csv' or 'parquet' from a file name's extension."""
+    fmt = str(file_name).rsplit('.', 1)[-1].lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported file type '.{fmt}'. Use .csv or .parquet.")
+    return fmt
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet import/export needs the 'pyarrow' package.") from e
+    return pyarrow
+
+
+class ImportReport:
+    """Outcome of a bulk import: how many rows were added and which were rejected (with reasons)."""
+
+    def __init__(self):
+        self.added = 0
+        self.rejected = []  # (row number in file, product name, reason)
+
+    def reject(self, rows, names, reason):
+        self.rejected.extend((int(row), name, reason) for row, name in zip(rows, names))
+
+    def rejected_frame(self):
+        return pd.DataFrame(self.rejected, columns=['Row', 'Product Name', 'Reason']).sort_values('Row', ignore_index=True)
+
+
+def read_chunks(source, fmt, columns, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yields DataFrames of raw string values for `columns`, never holding the whole file."""
+    if fmt == 'csv':
+        yield from pd.read_csv(source, usecols=lambda col: col in columns, dtype=str,
+                               keep_default_na=False, chunksize=chunk_rows)
+    elif fmt == 'parquet':
+        pyarrow = _require_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(source)
+        present = [col for col in columns if col in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=present):
+            # Nulls become '' like blank CSV cells; astype(str) alone keeps them as NaN (or 'None'/'nan')
+            frame = batch.to_pandas()
+            yield frame.astype(object).where(frame.notna(), '').astype(str)
+    else:
+        raise ValueError(f"Unknown format '{fmt}'.")
+
+
+def _validate_stock_chunk(chunk, first_row, seen, stock, report):
+    """Coerces a raw chunk to the stock dtypes; returns the valid, new rows as {column: array}."""
+    missing = [col for col in IMPORT_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Import file is missing columns: {', '.join(missing)}")
+    rows = np.arange(first_row, first_row + len(chunk))
+    names = chunk['Product Name'].str.strip()
+    # Prices in the file are rupees; rounded to whole paise before validation
+    buy = (pd.to_numeric(chunk['Buy Price'], errors='coerce') * 100).round()
+    sell = (pd.to_numeric(chunk['Sell Price'], errors='coerce') * 100).round()
+    quantity = pd.to_numeric(chunk['Quantity'], errors='coerce')
+    sales_count = pd.to_numeric(chunk['Sales Count'], errors='coerce') if 'Sales Count' in chunk else pd.Series(0, index=chunk.index)
+
+    checks = [
+        (names == '', "missing product name"),
+        (~(buy > 0), "buy price must be at least 0.01"),
+        (~(sell > 0), "sell price must be at least 0.01"),
+        (~((quantity >= 0) & (quantity % 1 == 0) & (quantity <= np.iinfo(STOCK_SCHEMA['Quantity']).max)),
+         "quantity must be a whole number >= 0"),
+        (~((sales_count >= 0) & (sales_count % 1 == 0)), "sales count must be a whole number >= 0"),
+    ]
+    valid = pd.Series(True, index=chunk.index)
+    for failed, reason in checks:
+        failed &= valid
+        report.reject(rows[failed.to_numpy()], names[failed], reason)
+        valid &= ~failed
+
+    # Duplicates against existing stock, earlier chunks, and earlier rows of this chunk
+    duplicate = valid & (names.map(lambda name: name in stock or name in seen) | names.duplicated())
+    report.reject(rows[duplicate.to_numpy()], names[duplicate], "duplicate product name")
+    valid &= ~duplicate
+    seen.update(names[valid])
+
+    columns = {'Product Name': names, 'Buy Price': buy, 'Sell Price': sell,
+               'Quantity': quantity, 'Sales Count': sales_count}
+    return {col: coerce_column(values[valid].to_numpy(), STOCK_SCHEMA[col]) for col, values in columns.items()}
+
+
+def import_stock(shop, source, fmt, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Bulk-imports products from a CSV or Parquet file, chunk by chunk.
+
+    Each chunk is coerced to the stock dtypes, validated row by row and
+    committed as one batch; invalid rows and names that already exist (in stock
+    or earlier in the file) are reported instead of imported.
+    """
+    report = ImportReport()
+    seen = set()
+    first_row = 1
+    for chunk in read_chunks(source, fmt, IMPORT_COLUMNS + ['Sales Count'], chunk_rows):
+        products = _validate_stock_chunk(chunk.reset_index(drop=True), first_row, seen, shop.stock, report)
+        if len(products['Product Name']):
+            shop.add_products(products)
+            report.added += len(products['Product Name'])
+        first_row += len(chunk)
+    return report
+
+
+def _stock_chunks(shop, chunk_rows):
+    stock_df = shop.stock.frame()
+    for offset in range(0, len(stock_df), chunk_rows):
+        yield stock_df.iloc[offset:offset + chunk_rows]
+
+
+def _export_chunk(chunk):
+    """Converts a stored chunk to its file representation: rupee amounts and plain string names."""
+    casts = {col: to_rupees(chunk[col]) for col in chunk.columns if col in EXPORT_MONEY_COLUMNS}
+    if 'Product Name' in chunk and isinstance(chunk['Product Name'].dtype, pd.CategoricalDtype):
+        casts['Product Name'] = chunk['Product Name'].astype(object)
+    return chunk.assign(**casts)
+
+
+def iter_export(shop, dataset, start=None, end=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yields the chunks of an export dataset ('stock', 'sales' or 'bills'); dates apply to sales and bills."""
+    if dataset == 'stock':
+        chunks = _stock_chunks(shop, chunk_rows)
+    elif dataset == 'sales':
+        chunks = shop.storage.iter_sales(start, end, chunk_rows)
+    elif dataset == 'bills':
+        chunks = shop.storage.iter_bill_lines(start, end, chunk_rows)
+    else:
+        raise ValueError(f"Unknown export dataset '{dataset}'.")
+    return (_export_chunk(chunk) for chunk in chunks)
+
+
+def export_data(shop, dataset, dest, fmt, start=None, end=None, chunk_rows=IMPORT_CHUNK_ROWS, progress=None):
+    """Streams a dataset to `dest` (path or binary file) as CSV or Parquet; returns the row count.
+
+    Chunks are written as they are read, so memory stays bounded by `chunk_rows`.
+    `progress(rows written)` is called after each chunk.
+    """
+    rows = 0
+    if fmt == 'csv':
+        header = True
+        for chunk in iter_export(shop, dataset, start, end, chunk_rows):
+            chunk.to_csv(dest, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+    elif fmt == 'parquet':
+        pyarrow = _require_pyarrow()
+        writer = None
+        try:
+            for chunk in iter_export(shop, dataset, start, end, chunk_rows):
+                table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(dest, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(chunk)
+                if progress:
+                    progress(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Unknown format '{fmt}'.")
+    return rows